@@ -0,0 +1,94 @@
+"""
+AVA Single Unique Process
+© AVA, 2025
+
+Compares the launch latency of python commands started cold (a new interpreter) and forked from a warm template:
+    python benchmarks/bench_warmstart.py -n 20 -m json decimal asyncio
+"""
+import os
+import sys
+import time
+import logging
+import shlex
+import argparse
+import tempfile
+import statistics
+
+from suproc.suproc import run_single_instance_proc, start_warm_template, kill_proc, WARM_PROC
+from suproc.forkserver import cold_command
+from suproc.utils.printer import TablePrinter
+
+TEMPLATE = 'bench'
+
+
+def _write_payload(path, modules):
+    with open(path, 'w') as f:
+        for module in modules:
+            f.write(f'import {module}\n')
+        f.write("print('ok')\n")
+
+
+def _measure(n, name, payload, pid_dir, log_dir, logger, warm=None):
+    if warm is None:
+        payload = shlex.join(cold_command(payload))
+    times = []
+    for _ in range(n):
+        start = time.perf_counter()
+        returncode = run_single_instance_proc(name, cmds=[payload], pid_dir=pid_dir, log_dir=log_dir,
+                                              logger=logger, warm=warm)
+        times.append(time.perf_counter() - start)
+        assert returncode == 0, f'returncode={returncode}'
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser('bench-warmstart')
+    parser.add_argument('-n', type=int, default=20,
+                        help='Number of launches of each mode')
+    parser.add_argument('-m', '--preload', nargs='+', default=['json', 'decimal', 'asyncio', 'email.mime.text'],
+                        help='Modules imported by the payload and preloaded by the template')
+    args = parser.parse_args()
+
+    logger = logging.getLogger('bench-warmstart')
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pid_dir = os.path.join(tmp, 'pid')
+        log_dir = os.path.join(tmp, 'log')
+        payload = os.path.join(tmp, 'payload.py')
+        _write_payload(payload, args.preload)
+
+        if start_warm_template(TEMPLATE, preload=args.preload, pid_dir=pid_dir, log_dir=log_dir, logger=logger) < 0:
+            print('Failed to start the template', file=sys.stderr)
+            return 1
+        socket_path = os.path.join(pid_dir, f'{WARM_PROC}.{TEMPLATE}.sock')
+        for _ in range(100):
+            if os.path.exists(socket_path):
+                break
+            time.sleep(0.05)
+
+        try:
+            results = {
+                'cold': _measure(args.n, 'bench-cold', payload, pid_dir, log_dir, logger),
+                'warm': _measure(args.n, 'bench-warm', payload, pid_dir, log_dir, logger, warm=TEMPLATE),
+            }
+        finally:
+            kill_proc(f'{WARM_PROC}.{TEMPLATE}', pid_dir=pid_dir, log_dir=log_dir, killer_proc=None, logger=logger)
+
+    print(f"preload: {' '.join(args.preload)}, launches: {args.n}")
+    table = TablePrinter("|  Mode  |   mean, ms   |    p50, ms   |    p95, ms   |    min, ms   |")
+    table.print_special('outer')
+    table.print_special('header')
+    table.print_special('inner')
+    for mode, times in results.items():
+        times_ms = sorted(t * 1000 for t in times)
+        p95 = times_ms[min(len(times_ms) - 1, int(round(0.95 * (len(times_ms) - 1))))]
+        table.print_row((mode, f'{statistics.mean(times_ms):.1f}', f'{statistics.median(times_ms):.1f}',
+                         f'{p95:.1f}', f'{times_ms[0]:.1f}'))
+    table.print_special('outer')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,407 @@
+"""
+AVA Single Unique Process
+© AVA, 2025
+"""
+import os
+import io
+import sys
+import json
+import errno
+import shlex
+import signal
+import socket
+import struct
+import argparse
+import importlib
+import selectors
+import subprocess
+import traceback
+
+from suproc.utils.limits import ResourceLimits
+
+_HEADER = struct.Struct('!I')
+_MAX_REQUEST = 16 * 1024 * 1024
+_CONNECT_TIMEOUT = 5.0
+
+
+def split_entry(cmd) -> list:
+    """
+    Splits a warm command into tokens. The first token is the entry point: 'module:function', a path to a python
+    script or '-m module'.
+    """
+    args = shlex.split(cmd) if isinstance(cmd, str) else list(cmd)
+    if not args:
+        raise ValueError('Empty command')
+    if args[0] == '-m' and len(args) < 2:
+        raise ValueError("'-m' requires a module name")
+    return args
+
+
+def cold_command(cmd, executable=sys.executable) -> list:
+    """
+    Returns the command that starts the same python entry point in a new interpreter.
+    """
+    args = split_entry(cmd)
+    entry, argv = args[0], args[1:]
+    if entry == '-m' or entry.endswith('.py') or os.path.sep in entry:
+        return [executable] + args
+    module, _, function = entry.partition(':')
+    code = (f'import sys, {module}; sys.argv[0] = {entry!r}; '
+            f'sys.exit({module}.{function}() if {bool(function)} else None)')
+    return [executable, '-c', code] + argv
+
+
+def _run_entry(args: list):
+    entry, argv = args[0], args[1:]
+    if entry == '-m':
+        import runpy
+        sys.argv = [argv[0]] + argv[1:]
+        runpy.run_module(argv[0], run_name='__main__', alter_sys=True)
+    elif entry.endswith('.py') or os.path.sep in entry:
+        import runpy
+        sys.argv = [entry] + argv
+        sys.path.insert(0, os.path.dirname(os.path.abspath(entry)))
+        runpy.run_path(entry, run_name='__main__')
+    else:
+        module, _, function = entry.partition(':')
+        sys.argv = [entry] + argv
+        module = importlib.import_module(module)
+        if function:
+            sys.exit(getattr(module, function)())
+
+
+def _exit_code(e: SystemExit) -> int:
+    if e.code is None:
+        return 0
+    if isinstance(e.code, int):
+        return e.code
+    print(e.code, file=sys.stderr)
+    return 1
+
+
+def _child_main(request: dict, fds: list) -> int:
+    # The forked child of the template: becomes the requested command
+    for i, fd in enumerate(fds):
+        if fd != i:
+            os.dup2(fd, i)
+    for fd in fds:
+        if fd > 2 and fd not in fds[:fds.index(fd)]:
+            os.close(fd)
+    sys.stdin = io.TextIOWrapper(io.FileIO(0, 'r', closefd=False))
+    sys.stdout = io.TextIOWrapper(io.FileIO(1, 'w', closefd=False), line_buffering=True)
+    sys.stderr = io.TextIOWrapper(io.FileIO(2, 'w', closefd=False), line_buffering=True)
+
+    if request.get('cwd'):
+        os.chdir(request['cwd'])
+    if request.get('env') is not None:
+        os.environ.clear()
+        os.environ.update(request['env'])
+
+    code = 0
+    try:
+        limits = ResourceLimits.from_dict(request.get('limits'))
+        if limits:
+            limits.apply()
+        _run_entry(request['args'])
+    except SystemExit as e:
+        code = _exit_code(e)
+    except KeyboardInterrupt:
+        code = -signal.SIGINT
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    finally:
+        for stream in (sys.stdout, sys.stderr):
+            try:
+                stream.flush()
+            except Exception:
+                pass
+
+    # Die of SIGINT as a cold interpreter would:
+    if code == -signal.SIGINT:
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        os.kill(os.getpid(), signal.SIGINT)
+    return code & 0xff
+
+
+def _recv_request(conn):
+    data, fds, _, _ = socket.recv_fds(conn, 64 * 1024, 3)
+    if len(data) < _HEADER.size or len(fds) != 3:
+        for fd in fds:
+            os.close(fd)
+        raise ValueError('Invalid request')
+    size = _HEADER.unpack_from(data)[0]
+    if size > _MAX_REQUEST:
+        raise ValueError('Request is too large')
+    data = data[_HEADER.size:]
+    while len(data) < size:
+        chunk = conn.recv(size - len(data))
+        if not chunk:
+            raise ValueError('Incomplete request')
+        data += chunk
+    return json.loads(data), fds
+
+
+def _send(conn, message: dict):
+    try:
+        conn.sendall(json.dumps(message).encode() + b'\n')
+    except OSError:
+        pass
+
+
+def serve(socket_path: str, preload: list = ()):
+    """
+    Runs a template process: imports the 'preload' modules once and forks a child for each request that arrives
+    on the unix socket. The client gets the PID of the child and then its return code.
+    """
+    for module in preload:
+        importlib.import_module(module)
+        print(f'preloaded: {module}')
+
+    try:
+        os.remove(socket_path)
+    except FileNotFoundError:
+        pass
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o177)
+    try:
+        server.bind(socket_path)
+    finally:
+        os.umask(old_umask)
+    server.listen(64)
+    print(f'listening: {socket_path}', flush=True)
+
+    # Wake up the loop on signals instead of polling:
+    wakeup_r, wakeup_w = os.pipe()
+    os.set_blocking(wakeup_r, False)
+    os.set_blocking(wakeup_w, False)
+    signal.set_wakeup_fd(wakeup_w)
+    stopping = []
+    signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+    signal.signal(signal.SIGINT, lambda signum, frame: stopping.append(signum))
+
+    selector = selectors.DefaultSelector()
+    selector.register(server, selectors.EVENT_READ)
+    selector.register(wakeup_r, selectors.EVENT_READ)
+    children = {}           # pid -> connection of its client
+    uid = os.getuid()
+
+    def reap():
+        while children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            conn = children.pop(pid, None)
+            if conn is not None:
+                _send(conn, {'returncode': os.waitstatus_to_exitcode(status)})
+                if conn.fileno() in selector.get_map():
+                    selector.unregister(conn)
+                conn.close()
+
+    try:
+        while not stopping:
+            for key, _ in selector.select():
+                if key.fileobj is server:
+                    conn, _ = server.accept()
+                    try:
+                        conn.settimeout(_CONNECT_TIMEOUT)
+                        creds = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+                        if struct.unpack('3i', creds)[1] not in (uid, 0):
+                            raise PermissionError('Peer is not allowed')
+                        request, fds = _recv_request(conn)
+                    except Exception as e:
+                        _send(conn, {'error': str(e)})
+                        conn.close()
+                        continue
+
+                    pid = os.fork()
+                    if pid == 0:
+                        code = 1
+                        try:
+                            signal.set_wakeup_fd(-1)
+                            for signum in (signal.SIGCHLD, signal.SIGTERM):
+                                signal.signal(signum, signal.SIG_DFL)
+                            signal.signal(signal.SIGINT, signal.default_int_handler)
+                            selector.close()
+                            server.close()
+                            conn.close()
+                            for other in children.values():
+                                other.close()
+                            os.close(wakeup_r)
+                            os.close(wakeup_w)
+                            code = _child_main(request, fds)
+                        finally:
+                            os._exit(code)
+
+                    for fd in fds:
+                        os.close(fd)
+                    conn.settimeout(None)
+                    children[pid] = conn
+                    selector.register(conn, selectors.EVENT_READ, pid)
+                    _send(conn, {'pid': pid})
+                elif key.fileobj == wakeup_r:
+                    try:
+                        while os.read(wakeup_r, 512):
+                            pass
+                    except BlockingIOError:
+                        pass
+                else:
+                    # The client has gone: its child must not outlive it
+                    if not key.fileobj.recv(1):
+                        selector.unregister(key.fileobj)
+                        try:
+                            os.kill(key.data, signal.SIGTERM)
+                        except ProcessLookupError:
+                            pass
+            reap()
+    finally:
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        while children:
+            try:
+                pid, status = os.waitpid(-1, 0)
+            except ChildProcessError:
+                break
+            conn = children.pop(pid, None)
+            if conn is not None:
+                _send(conn, {'returncode': os.waitstatus_to_exitcode(status)})
+                conn.close()
+        server.close()
+        try:
+            os.remove(socket_path)
+        except FileNotFoundError:
+            pass
+    return 0
+
+
+class WarmProcess:
+    """
+    A command forked from a template process. Provides the part of the subprocess.Popen interface used by suproc.
+    """
+    def __init__(self, socket_path: str, cmd, env: dict = None, cwd: str = None,
+                 stdin=None, stdout=None, stderr=None, limits: ResourceLimits = None):
+        self.args = split_entry(cmd)
+        self.returncode = None
+        self.stdin = self.stdout = self.stderr = None
+        self._buffer = b''
+
+        child_fds, close_fds = [], []
+        try:
+            # stdin:
+            if stdin == subprocess.PIPE:
+                r, w = os.pipe()
+                self.stdin = os.fdopen(w, 'wb')
+                child_fds.append(r)
+                close_fds.append(r)
+            elif stdin == subprocess.DEVNULL:
+                child_fds.append(os.open(os.devnull, os.O_RDONLY))
+                close_fds.append(child_fds[-1])
+            else:
+                child_fds.append(0 if stdin is None else stdin)
+
+            # stdout and stderr:
+            for stream, name in ((stdout, 'stdout'), (stderr, 'stderr')):
+                if stream == subprocess.PIPE:
+                    r, w = os.pipe()
+                    setattr(self, name, os.fdopen(r, 'rb'))
+                    child_fds.append(w)
+                    close_fds.append(w)
+                elif stream == subprocess.DEVNULL:
+                    child_fds.append(os.open(os.devnull, os.O_WRONLY))
+                    close_fds.append(child_fds[-1])
+                elif stream == subprocess.STDOUT and name == 'stderr':
+                    child_fds.append(child_fds[1])
+                else:
+                    child_fds.append(len(child_fds) if stream is None else stream)
+
+            request = json.dumps({'args': self.args, 'env': env, 'cwd': cwd or os.getcwd(),
+                                  'limits': limits.to_dict() if limits else None}).encode()
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._sock.settimeout(_CONNECT_TIMEOUT)
+            self._sock.connect(socket_path)
+            socket.send_fds(self._sock, [_HEADER.pack(len(request)) + request], child_fds)
+        finally:
+            for fd in close_fds:
+                os.close(fd)
+
+        reply = self._read_message(block=True)
+        if reply is None or 'pid' not in reply:
+            self._sock.close()
+            message = reply.get('error') if reply else 'connection closed'
+            raise OSError(errno.ECHILD, f"Template '{socket_path}' failed to start the command: {message}")
+        self.pid = reply['pid']
+        self._sock.settimeout(None)
+
+    def _read_message(self, block: bool):
+        while b'\n' not in self._buffer:
+            try:
+                self._sock.setblocking(block)
+                chunk = self._sock.recv(4096)
+            except BlockingIOError:
+                return None
+            if not chunk:
+                return {}
+            self._buffer += chunk
+        line, self._buffer = self._buffer.split(b'\n', 1)
+        return json.loads(line)
+
+    def _update(self, block: bool):
+        if self.returncode is not None:
+            return self.returncode
+        message = self._read_message(block)
+        if message is None:
+            return None
+        # The template has gone without reporting the status:
+        self.returncode = message.get('returncode', -signal.SIGKILL)
+        self._sock.close()
+        return self.returncode
+
+    def poll(self):
+        return self._update(block=False)
+
+    def wait(self, timeout=None):
+        if timeout is not None and self.returncode is None:
+            self._sock.settimeout(timeout)
+            try:
+                return self._update(block=True)
+            except socket.timeout:
+                raise subprocess.TimeoutExpired(self.args, timeout)
+            finally:
+                if self.returncode is None:
+                    self._sock.settimeout(None)
+        return self._update(block=True)
+
+    def send_signal(self, sig):
+        if self.returncode is None:
+            try:
+                os.kill(self.pid, sig)
+            except ProcessLookupError:
+                pass
+
+    def terminate(self):
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self):
+        self.send_signal(signal.SIGKILL)
+
+
+def main():
+    parser = argparse.ArgumentParser('suproc-forkserver',
+                                     description='Template process that forks preloaded python entry points')
+    parser.add_argument('socket', type=str,
+                        help='Unix socket path to listen on')
+    parser.add_argument('-m', '--preload', nargs='*', default=[],
+                        help='Modules to import before forking')
+    args = parser.parse_args()
+    sys.exit(serve(args.socket, args.preload))
+
+
+if __name__ == '__main__':
+    main()
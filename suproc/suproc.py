@@ -3,17 +3,43 @@ AVA Single Unique Process
 © AVA, 2025
 """
 import os
+import sys
+import logging
 import pidlockfile
 import shlex
 import subprocess
 import argparse
 import signal
 import time
+import json
+import sqlite3
+import re
+import random
 from datetime import datetime
 
 from suproc.utils.logger import Logger
 from suproc.utils.printer import TablePrinter
 from suproc.utils.utils import ask_user_yes_no
+from suproc.utils.timeindex import LineClock, TimeIndex, FLAG_SESSION, parse_time, iter_range
+from suproc.utils.relay import OutputRelay, LogSink, KillTimer, signal_group
+from suproc.utils.limits import ResourceLimits
+from suproc.utils.probes import wait_ready, parse_probe
+from suproc.utils.metrics import ProcessMetrics, MetricsStore, serve_metrics
+from suproc.utils.timings import PhaseTimings
+from suproc.utils.ratelimit import OutputLimiter, parse_rate_limit
+from suproc.utils.ring import LOG_FILE, LOG_NONE, RingWriter, RingFile, parse_log_mode, ring_path, active_ring
+from suproc.utils.pipes import PIPELINE_VALUES, fifo_path, open_fifo
+from suproc.utils.history import SessionHistory, HistoryQuery, rebase_log
+from suproc.utils.retention import scan_logs, plan_retention, trim_head, delete_log, parse_size, format_size
+from suproc.utils.search import select_logs, search_logs
+from suproc.utils.submissions import SubmissionQueue, QUEUE_DEPTH, SESSION_KEYS
+from suproc.utils.shipping import ShipHandler, parse_ship, spill_path
+from suproc.utils.schedule import Schedule, parse_interval, schedule_path, load_schedule, save_schedule, \
+    OVERLAP_SKIP, OVERLAP_QUEUE, OVERLAP_REPLACE, OVERLAP_VALUES, CATCH_UP_SKIP, CATCH_UP_ONE, CATCH_UP_ALL, \
+    CATCH_UP_VALUES, MAX_CATCH_UP, MISS_GRACE
+from suproc.utils.watch import Dashboard, REFRESH_INTERVAL
+from suproc.utils.registry import StatusRegistry, STATE_RUNNING, STATE_EXITED, STATE_CRASHED
+from suproc.forkserver import WarmProcess, cold_command
 from suproc import __version__
 
 PKJ_NAME = 'suproc'
@@ -22,13 +48,31 @@ CMD_STOP = 'stop'
 CMD_LOG = 'log'
 CMD_RUNS = 'runs'
 CMD_LOGS = 'logs'
+CMD_WARM = 'warm'
+CMD_METRICS = 'metrics'
+CMD_HISTORY = 'history'
+CMD_WATCH = 'watch'
+CMD_GREP = 'grep'
+CMD_SCHEDULE = 'schedule'
 CMD_INIT = f'{PKJ_NAME}-init'
 PID_HEADER = '=== PID:'
+READY_TIMEOUT = 30.0
+RC_READY_TIMEOUT = -11
+RC_READY_EXITED = -12
+EXIT_TIMEOUT = 124              # as timeout(1): a command stopped by '--timeout'/'--deadline', a ready timeout
+RC_QUEUED = -13                 # the run was queued for the running instance ('--queue')
+RC_RETRY = -14                  # the running instance exited while the run was being queued
+QUEUE_RETRIES = 3
+START_TIMEOUT = 30.0            # seconds the scheduler waits for the first catch-up run to hold its PID file
+INFO_EXT = '.info'
 LOCK_PROC = '__lock'
 KILLER_PROC = '__killer'
+WARM_PROC = '__warm'
+SCHED_PROC = '__sched'
 PID_DIR = '/var/run/ava/'
 LOG_DIR = '/var/log/ava/'
 CONF_FILE ='/usr/lib/tmpfiles.d/ava.conf'
+METRICS_DIR = os.environ.get('SUPROC_METRICS_DIR')     # metrics are disabled if None
 STDOUT = 'pipe'
 STDERR = 'pipe'
 STDOUT_VALUES = {
@@ -49,24 +93,31 @@ def get_logger(name: str = None, log_dir=LOG_DIR) -> Logger:
         return Logger.get_logger(f'{PKJ_NAME}.{name}', os.path.join(log_dir, name + '.log'))
 
 
-def _print_proc_output(process, logger, stdout, stderr):
-    # Print stdout / stderr:
-    while True:
-        output = stdout.readline()
+def _get_log_stream(logger):
+    """
+    Returns the stream of the first log file handler of the logger or None if the logger does not write to a file.
+    """
+    for handler in logger.handlers:
+        if isinstance(handler, logging.FileHandler):
+            return handler.stream
+    return None
 
-        if output == '' and process.poll() is not None:
-            break
-        if output:
-            logger.debug(output.strip())  # Print and remove trailing newline
 
-    # Handle any remaining output after the process finishes
-    for line in stdout.readlines():
-        logger.debug(line.strip())
+def _print_proc_output(process, logger, clock: LineClock = None, index: TimeIndex = None,
+                       metrics: ProcessMetrics = None, tee_fd: int = None, limiter: OutputLimiter = None,
+                       timer: KillTimer = None):
+    # Relay stdout to the log (and to the FIFO for '--stdout=tee') and keep stderr:
+    relay = OutputRelay(LogSink(logger, clock=clock, index=index), metrics=metrics, tee_fd=tee_fd, limiter=limiter)
+    relay.run(process, timer=timer)
+    if relay.tee_error is not None:
+        logger.warning(f'Stopped writing to the FIFO: {relay.tee_error}')
 
     # Check for errors
     if process.returncode != 0:
-        for line in stderr.readlines():
-            logger.error(f"{line.strip()}")
+        if relay.stderr_dropped:
+            logger.warning(f'{relay.stderr_dropped} earlier lines of stderr were dropped')
+        for line in relay.stderr_lines():
+            logger.error(line)
 
 
 def _clear_global_lockfile(lockfile, returncode=0):
@@ -89,14 +140,17 @@ def _detach_process():
         # # Set the process as the leader of that session (set as a daemon):
         # os.setsid()
 
+        start = time.perf_counter()
         process = subprocess.Popen(shlex.split(cmd), start_new_session=False,
                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, stdin=subprocess.DEVNULL)
+        spawned = time.perf_counter()
 
         # Check that the process started successfully:
         for i in range(40):
             pid = read_pid_from_pidfile(pidfile)
             if pid is not None and abs(pid) == process.pid:
-                print(f"process started successfully with pid={pid}")
+                print(f"process started successfully with pid={pid}"
+                      f" spawn={spawned - start:.6f} confirm={time.perf_counter() - spawned:.6f}")
                 sys.exit(0)
             time.sleep(0.025)
     except Exception as e:
@@ -136,8 +190,304 @@ def read_pid_from_pidfile(pidfile_path, logger: Logger or None=None):
         return None
 
 
+def _write_proc_info(pid_dir, name, info: dict):
+    path = os.path.join(pid_dir, name + INFO_EXT)
+    try:
+        with open(path + '.tmp', 'w') as f:
+            json.dump(info, f)
+        os.replace(path + '.tmp', path)
+    except OSError:
+        pass
+
+
+def read_proc_info(name, pid_dir=PID_DIR) -> dict:
+    """
+    Returns the info saved by the last run of the process 'name' (e.g. its resource limits) or an empty dict.
+    """
+    try:
+        with open(os.path.join(pid_dir, name + INFO_EXT), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def get_warm_socket(template, pid_dir=PID_DIR) -> str:
+    return str(os.path.join(pid_dir, f'{WARM_PROC}.{template}.sock'))
+
+
+def start_warm_template(template, preload: list = None, force=False, pid_dir=PID_DIR, log_dir=LOG_DIR, logger=None):
+    """
+    Starts a warm template daemon named '__warm.<template>' that imports the 'preload' modules once. Commands run
+    with 'warm=<template>' are then forked from it instead of starting a new interpreter.
+    """
+    cmd = f'{sys.executable} -m suproc.forkserver {get_warm_socket(template, pid_dir)}'
+    if preload:
+        cmd += ' --preload ' + ' '.join(preload)
+    return run_single_instance_proc(f'{WARM_PROC}.{template}', cmds=[cmd], force=force, daemon=True,
+                                    pid_dir=pid_dir, log_dir=log_dir, logger=logger)
+
+
+def start_scheduler(name, cmds: list, every: str = None, cron: str = None, overlap=OVERLAP_SKIP, jitter: str = None,
+                    catch_up=CATCH_UP_SKIP, shell=False, timeout: float = None, deadline: float = None, force=False,
+                    pid_dir=PID_DIR, log_dir=LOG_DIR, metrics_dir=METRICS_DIR, logger=None):
+    """
+    Starts a resident scheduler daemon named '__sched.<name>' that runs the commands as the single instance process
+    'name' every 'every' (e.g. '60s', '5m') or at the times of the 'cron' expression (e.g. '*/5 * * * *'). Each run
+    is forked from the scheduler, so no interpreter is started per run (see run_scheduler()).
+
+    'overlap' tells what happens when the previous run is still running: 'skip' it, 'queue' it for the running one
+    (see 'run --queue', equal pending runs are coalesced) or 'replace' the running one. 'jitter' delays every run
+    by a random time up to this interval. 'catch_up' tells what happens with the runs missed while the scheduler
+    was stopped or the host was suspended: 'skip' them, run 'one' for all of them or run 'all' (at most
+    MAX_CATCH_UP) one after another.
+
+    The schedule is kept in '<pid_dir>/<name>.schedule' with the time of the last run, so a restarted scheduler
+    knows which runs it has missed. A running scheduler is restarted with a new schedule only with 'force'.
+    """
+    if logger is None:
+        logger = Logger.get_logger(PKJ_NAME)
+    try:
+        schedule = Schedule(every=parse_interval(every) if every is not None else None, cron=cron)
+        jitter = parse_interval(jitter) if jitter else 0.0
+        for option, value in (('timeout', timeout), ('deadline', deadline)):
+            if value is not None and value <= 0:
+                raise ValueError(f"Invalid {option}: {value}. The value must be positive")
+    except ValueError as e:
+        logger.error(e)
+        return -9
+    if overlap not in OVERLAP_VALUES or catch_up not in CATCH_UP_VALUES:
+        logger.error(f"Invalid overlap policy '{overlap}' or catch-up rule '{catch_up}'")
+        return -9
+    if not cmds:
+        logger.error('No commands to schedule')
+        return -9
+    if not force and _pidfile_locked(f'{SCHED_PROC}.{name}', pid_dir=pid_dir):
+        logger.error(f"The scheduler of '{name}' is running. Use '--force' to restart it with the new schedule")
+        return -1
+
+    try:
+        os.makedirs(pid_dir, exist_ok=True)
+    except PermissionError:
+        logger.error(f"Permission denied: '{pid_dir}'. Try running '{CMD_INIT}' first")
+        return -8
+    path = schedule_path(pid_dir, name)
+    last_run = (load_schedule(path) or {}).get('last_run')
+    save_schedule(path, {'every': schedule.every, 'cron': cron, 'cmds': list(cmds), 'shell': shell,
+                         'overlap': overlap, 'jitter': jitter, 'catch_up': catch_up, 'timeout': timeout,
+                         'deadline': deadline, 'metrics_dir': metrics_dir, 'last_run': last_run})
+    logger.info(f"Scheduling '{name}' {schedule}")
+
+    cmd = f'{PKJ_NAME} {CMD_SCHEDULE} {name} --foreground -pd={pid_dir} -ld={log_dir}'
+    return run_single_instance_proc(f'{SCHED_PROC}.{name}', cmds=[cmd], force=force, daemon=True,
+                                    pid_dir=pid_dir, log_dir=log_dir, logger=logger)
+
+
+def _fork_run(name, spec: dict, pid_dir, log_dir, overlap, coalesce=True) -> int:
+    # Runs the scheduled commands in a child of the scheduler as a daemon session of 'name':
+    pid = os.fork()
+    if pid != 0:
+        return pid
+    returncode = None
+    try:
+        # Detach from the output of the scheduler, the run logs to its own log:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        devnull = os.open(os.devnull, os.O_RDWR)
+        for fd in (0, 1, 2):
+            os.dup2(devnull, fd)
+        scheduler_logger = logging.getLogger(PKJ_NAME)
+        for handler in list(scheduler_logger.handlers):
+            scheduler_logger.removeHandler(handler)
+        returncode = run_single_instance_proc(
+            name, cmds=spec['cmds'], shell=spec['shell'], parent=os.getppid(), force=overlap == OVERLAP_REPLACE,
+            queue_depth=QUEUE_DEPTH if overlap == OVERLAP_QUEUE else None, coalesce=coalesce,
+            timeout=spec['timeout'], deadline=spec['deadline'], pid_dir=pid_dir, log_dir=log_dir,
+            metrics_dir=spec['metrics_dir']
+        )
+    finally:
+        os._exit(0 if returncode in (0, RC_QUEUED) else 1)
+
+
+def run_scheduler(name, pid_dir=PID_DIR, log_dir=LOG_DIR, logger=None) -> int:
+    """
+    Runs the schedule of the process 'name' (see start_scheduler()) until SIGINT or SIGTERM. Runs that are not
+    started (overlapping or missed) are logged and counted in the metrics as 'skipped_runs_total'.
+    """
+    if logger is None:
+        logger = Logger.get_logger(PKJ_NAME)
+    path = schedule_path(pid_dir, name)
+    spec = load_schedule(path)
+    if spec is None:
+        logger.error(f"No schedule of '{name}': '{path}'")
+        return -2
+    try:
+        schedule = Schedule(every=spec['every'], cron=spec['cron'])
+    except ValueError as e:
+        logger.error(e)
+        return -9
+    metrics = ProcessMetrics(name, spec['metrics_dir']) if spec['metrics_dir'] else None
+    overlap, jitter, catch_up = spec['overlap'], spec['jitter'], spec['catch_up']
+
+    def _stop(signum, frame):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, _stop)
+
+    def _skip(reason, count=1):
+        if metrics is not None:
+            metrics.inc('skipped_runs_total', count, reason=reason)
+            metrics.flush()
+
+    children = set()
+
+    def _wait_held(pid):
+        # Wait until the run 'pid' holds the PID file (or has exited), so the runs queued after it find it held:
+        until = time.time() + START_TIMEOUT
+        while not _pidfile_locked(name, pid_dir=pid_dir) and time.time() < until:
+            if os.waitpid(pid, os.WNOHANG)[0] != 0:
+                children.discard(pid)
+                break
+            time.sleep(0.05)
+
+    last = spec['last_run'] or time.time()
+    logger.info(f"= Scheduler of '{name}' started: {schedule}, overlap: {overlap}, catch-up: {catch_up}")
+    try:
+        while True:
+            tick = schedule.next_after(last)
+            if tick is None:
+                logger.warning('= The schedule has no more runs')
+                break
+            if tick <= last:
+                # Never fire again for a time already passed, it would start runs without end:
+                logger.error(f"= Invalid time of the next run: {tick} is not after the last run {last}")
+                return -4
+            fire_at = tick + random.uniform(0, jitter) if jitter else tick
+
+            # Sleep in short steps to reap the runs and to notice a suspend of the host:
+            while True:
+                while children:
+                    pid, _ = os.waitpid(-1, os.WNOHANG)
+                    if pid == 0:
+                        break
+                    children.discard(pid)
+                delay = fire_at - time.time()
+                if delay <= 0:
+                    break
+                time.sleep(min(delay, 1.0 if children else 30.0))
+
+            now = time.time()
+            if now - fire_at <= MISS_GRACE:
+                if overlap == OVERLAP_SKIP and _pidfile_locked(name, pid_dir=pid_dir):
+                    logger.info(f"= Skipped the run of {datetime.fromtimestamp(tick).isoformat(timespec='seconds')}:"
+                                f" '{name}' is still running")
+                    _skip('overlap')
+                else:
+                    children.add(_fork_run(name, spec, pid_dir, log_dir, overlap))
+                last = tick
+            else:
+                # Woken up late: the scheduler was stopped or the host was suspended:
+                missed = schedule.count(last, now, MAX_CATCH_UP + 1)
+                runs = {CATCH_UP_SKIP: 0, CATCH_UP_ONE: 1, CATCH_UP_ALL: min(missed, MAX_CATCH_UP)}[catch_up]
+                if runs and overlap == OVERLAP_SKIP and _pidfile_locked(name, pid_dir=pid_dir):
+                    _skip('overlap', runs)
+                    runs = 0
+                logger.warning(f"= Missed {missed}{'+' if missed > MAX_CATCH_UP else ''} runs since "
+                               f"{datetime.fromtimestamp(last).isoformat(timespec='seconds')}, starting {runs}")
+                for i in range(runs):
+                    # Only the first run follows the overlap policy, the others are queued after it:
+                    pid = _fork_run(name, spec, pid_dir, log_dir, overlap if i == 0 else OVERLAP_QUEUE,
+                                    coalesce=catch_up != CATCH_UP_ALL)
+                    children.add(pid)
+                    if i == 0 and runs > 1:
+                        _wait_held(pid)
+                if missed > runs:
+                    _skip('missed', missed - runs)
+                last = now
+
+            spec['last_run'] = last
+            save_schedule(path, spec)
+    except KeyboardInterrupt:
+        logger.info(f"= Scheduler of '{name}' stopped")
+    return 0
+
+
 def run_single_instance_proc(name, cmds: list = None, force=False, daemon=False, parent=None, logger=None, shell=False,
-                             pid_dir=PID_DIR, log_dir=LOG_DIR, stdout=STDOUT, stderr=STDERR):
+                             pid_dir=PID_DIR, log_dir=LOG_DIR, stdout=STDOUT, stderr=STDERR, stdin_from=None,
+                             timestamps=False, warm=None, limits: ResourceLimits = None, ready: list = None,
+                             ready_timeout=READY_TIMEOUT, metrics_dir=METRICS_DIR, timings: PhaseTimings = None,
+                             log_timings=False, rate_limit: str = None, dedupe=False, log=LOG_FILE,
+                             timeout: float = None, deadline: float = None, queue_depth: int = None, coalesce=False,
+                             ship: str = None):
+    """
+    Runs a sequence of commands as a single instance process 'name'. If 'timings' is given, it is filled in with
+    the durations of the phases of the run (see PhaseTimings). If 'log_timings' is set, the timings of a daemon
+    session are also appended to its log as one JSON line.
+
+    With 'stdout' set to 'fifo' (or 'tee' to also keep it in the log), the output of the commands goes to the FIFO
+    '<pid_dir>/<name>.fifo' that is read by the process run with 'stdin_from=<name>'.
+
+    'rate_limit' (e.g. 'lines=1000,bytes=1M', see parse_rate_limit) bounds the output written to the log and
+    'dedupe' collapses runs of identical lines; the suppressed lines are counted in 'runs' and the metrics.
+
+    With 'log' set to 'ring:SIZE' (e.g. 'ring:64M'), a daemon writes its log into a ring buffer of that size in
+    shared memory instead of '<log_dir>/<name>.log' (see RingWriter), so the log takes no disk space or disk I/O.
+
+    'timeout' limits the time of every command and 'deadline' the time of the whole session, in seconds. A command
+    over its limit gets SIGTERM (sent to its process group), then SIGKILL, and ends with the return code EXIT_TIMEOUT,
+    so the commands after it are not run.
+
+    With 'queue_depth', a run of a process that is already running is not refused (-1) but appended to the queue
+    '<log_dir>/<name>.queue' of at most 'queue_depth' pending runs, and RC_QUEUED is returned at once. The running
+    instance runs the queued commands after its session, in the order they were queued, as new sessions of its
+    own (a daemon logs them to its log). A submission brings its commands, 'shell', 'timeout' and 'deadline';
+    the other options are those of the running instance. With 'coalesce', a run equal to a pending one is not
+    queued again.
+
+    With 'ship' (e.g. 'unixgram:/dev/log' or 'unix:/run/vector.sock,format=json', see parse_ship), the log is also
+    sent to a local collector as it is written, in syslog or JSON records (see ShipHandler). The records wait in a
+    bounded memory buffer and then in '<log_dir>/<name>.spill' while the collector is slow or down. With 'log' set
+    to 'none', a daemon writes no log file and the log is only shipped.
+    """
+    metrics = ProcessMetrics(name, metrics_dir) if metrics_dir else None
+    history = SessionHistory(log_dir) if not name.startswith('__') else None     # internal processes are skipped
+    returncode = None
+    with StatusRegistry(pid_dir) as registry:
+        try:
+            # Retry if the running instance exits while the run is being queued:
+            for _ in range(QUEUE_RETRIES):
+                returncode = _run_single_instance_proc(
+                    name, cmds=cmds, force=force, daemon=daemon, parent=parent, logger=logger, shell=shell,
+                    pid_dir=pid_dir, log_dir=log_dir, stdout=stdout, stderr=stderr, stdin_from=stdin_from,
+                    timestamps=timestamps, warm=warm, limits=limits, ready=ready, ready_timeout=ready_timeout,
+                    metrics=metrics, timings=timings if timings is not None else PhaseTimings(),
+                    log_timings=log_timings, registry=registry, history=history, rate_limit=rate_limit,
+                    dedupe=dedupe, log=log, timeout=timeout, deadline=deadline, queue_depth=queue_depth,
+                    coalesce=coalesce, ship=ship
+                )
+                if returncode != RC_RETRY:
+                    break
+        finally:
+            # Only the session that registered itself as running changes the record:
+            registry.exited(name, os.getpid(), returncode if returncode is not None else -10)
+            if history is not None:
+                history.end(returncode if returncode is not None else -10)
+
+    # Count failures by return code (a daemon launcher returns the PID on success):
+    if metrics is not None:
+        if returncode == RC_QUEUED:
+            metrics.inc('queued_total')
+        elif returncode is None or (returncode < 0 if daemon else returncode != 0):
+            metrics.inc('failures_total', returncode=returncode)
+        metrics.flush()
+    return returncode
+
+
+def _run_single_instance_proc(name, cmds: list = None, force=False, daemon=False, parent=None, logger=None,
+                              shell=False, pid_dir=PID_DIR, log_dir=LOG_DIR, stdout=STDOUT, stderr=STDERR,
+                              stdin_from=None, timestamps=False, warm=None, limits: ResourceLimits = None,
+                              ready: list = None, ready_timeout=READY_TIMEOUT, metrics: ProcessMetrics = None,
+                              timings: PhaseTimings = None, log_timings=False, registry: StatusRegistry = None,
+                              history: SessionHistory = None, rate_limit: str = None, dedupe=False, log=LOG_FILE,
+                              timeout: float = None, deadline: float = None, queue_depth: int = None,
+                              coalesce=False, ship: str = None):
     if cmds is None:
         cmds = ['true']            # dummy command for NONE
 
@@ -153,12 +503,48 @@ def run_single_instance_proc(name, cmds: list = None, force=False, daemon=False,
         logger.error(f"Permission denied: '{pid_dir}' or '{log_dir}'. Try running '{CMD_INIT}' first")
         return -8
 
-    # If the process is not a daemon, then write the log to stdout/stderr, otherwise - to a file:
+    # Check the log mode:
+    try:
+        ring_size = parse_log_mode(log)
+    except ValueError as e:
+        (logger or Logger.get_logger(PKJ_NAME)).error(e)
+        return -9
+
+    # Check the log shipping target:
+    try:
+        ship_config = parse_ship(ship) if ship else None
+        if log == LOG_NONE and ship_config is None:
+            raise ValueError(f"The log mode '{LOG_NONE}' requires '--ship', the log would be lost")
+    except ValueError as e:
+        (logger or Logger.get_logger(PKJ_NAME)).error(e)
+        return -9
+
+    # If the process is not a daemon, then write the log to stdout/stderr, otherwise - to a file or a ring buffer
+    # (or only ship it):
+    ring_error = None
+    ship_handler = None
     if logger is None:
         if parent is None:
             logger = Logger.get_logger(PKJ_NAME)
+        elif log == LOG_NONE:
+            ship_handler = ShipHandler(name, ship_config, spill_path(log_dir, name), metrics=metrics)
+            logger = Logger.get_logger(f'{PKJ_NAME}.{name}', handler=ship_handler)
         else:
-            logger = Logger.get_logger(f'{PKJ_NAME}.{name}', os.path.join(log_dir, name + '.log'))
+            ring = None
+            if ring_size:
+                try:
+                    ring = RingWriter(ring_path(log_dir, name), ring_size)
+                except (OSError, ValueError) as e:
+                    ring_error = e
+            if ring is not None:
+                logger = Logger.get_logger(f'{PKJ_NAME}.{name}', ring.path, stream=ring)
+            else:
+                logger = Logger.get_logger(f'{PKJ_NAME}.{name}', os.path.join(log_dir, name + '.log'))
+    if ring_error is not None:
+        logger.warning(f'The ring buffer cannot be created ({ring_error}), the log file is used instead!')
+    elif ring_size and not daemon and parent is None:
+        logger.warning('The ring buffer log is used only for daemons and will be ignored!')
+    timings.mark('prepare')
 
     # Paths to pids:
     _lockfile = str(os.path.join(pid_dir, LOCK_PROC + '.pid'))
@@ -166,21 +552,84 @@ def run_single_instance_proc(name, cmds: list = None, force=False, daemon=False,
 
     # Kill the process if it is running:
     if force:
-        kill_proc(name, pid_dir=pid_dir)
+        running = is_running(name, pid_dir=pid_dir)
+        if kill_proc(name, pid_dir=pid_dir, metrics_dir=metrics.store.metrics_dir if metrics else None) == 0 \
+                and running:
+            if registry is not None:
+                registry.restarted(name)
+            if metrics is not None:
+                metrics.inc('restarts_total')
+        timings.mark('force_stop')
+
+    # Check the output rate limit:
+    try:
+        rate_limit_spec = rate_limit
+        rate_limit = parse_rate_limit(rate_limit) if rate_limit else None
+    except ValueError as e:
+        logger.error(e)
+        return -9
+
+    # Check the time limits:
+    for option, value in (('timeout', timeout), ('deadline', deadline)):
+        if value is not None and value <= 0:
+            logger.error(f"Invalid {option}: {value}. The value must be positive")
+            return -9
+    if queue_depth is not None and queue_depth <= 0:
+        logger.error(f"Invalid queue depth: {queue_depth}. The value must be positive")
+        return -9
+
+    # Check readiness probes:
+    if ready:
+        try:
+            for spec in ready:
+                kind, _ = parse_probe(spec)
+                # A log probe reads the log file, which a ring buffer or the shipping alone does not write:
+                if kind == 'log' and (ring_size or log == LOG_NONE):
+                    raise ValueError(f"The readiness probe '{spec}' cannot be used with the log mode '{log}'")
+        except ValueError as e:
+            logger.error(e)
+            return -9
+        if not daemon:
+            logger.warning('Readiness probes are used only for daemons and will be ignored!')
 
     # Create a daemon:
     if daemon:
+        log_path = os.path.join(log_dir, name + '.log')
+        log_offset = os.path.getsize(log_path) if os.path.exists(log_path) else 0
         cmd_list = '" "'.join(cmd for cmd in cmds)
         cmd = (f'{PKJ_NAME} {CMD_RUN} {name} --pdir={pid_dir} --ldir={log_dir} --parent={os.getpid()}'
                f' --stdout={stdout} --stderr={stderr}'
+               f' {f"--stdin-from={stdin_from}" if stdin_from else ""}'
                f' {"--shell" if shell else ""}'
+               f' {"--timestamps" if timestamps else ""}'
+               f' {f"--warm={warm}" if warm else ""}'
+               f' {limits.to_args() if limits else ""}'
+               f' {f"--rate-limit={rate_limit_spec}" if rate_limit else ""}'
+               f' {"--dedupe" if dedupe else ""}'
+               f' {f"--log={log}" if log != LOG_FILE else ""}'
+               f' {f"--ship={ship}" if ship else ""}'
+               f' {f"--timeout={timeout}" if timeout else ""}'
+               f' {f"--deadline={deadline}" if deadline else ""}'
+               f' {f"--queue={queue_depth}" if queue_depth else ""}'
+               f' {"--coalesce" if coalesce else ""}'
+               f' {f"--mdir={metrics.store.metrics_dir}" if metrics else ""}'
+               f' {"--timings" if log_timings else ""}'
                f' --cmds "{cmd_list}"')
+        timings.mark('prepare_daemon')
         try:
             with pidlockfile.PIDLockFile(_lockfile, timeout=0.1):       # global lock
+                timings.mark('global_lock')
+
                 # Check the pidfile of the process being created::
                 if os.path.exists(pidfile) and pidlockfile.PIDLockFile(pidfile).is_locked():
-                    logger.error(f"Could not acquire lock on {pidfile}. Another instance might be running!")
-                    return _clear_global_lockfile(_lockfile, -1)
+                    if not queue_depth:
+                        logger.error(f"Could not acquire lock on {pidfile}. Another instance might be running!")
+                        return _clear_global_lockfile(_lockfile, -1)
+                    returncode = _submit(name, cmds, shell, timeout, deadline, pidfile, log_dir, queue_depth,
+                                         coalesce, logger)
+                    if returncode != RC_RETRY:
+                        return _clear_global_lockfile(_lockfile, returncode)
+                timings.mark('pidfile_check')
 
                 # Run detached process:
                 cmd = f"suproc-detach --cmd='{cmd}' --pidfile={pidfile}"
@@ -188,6 +637,8 @@ def run_single_instance_proc(name, cmds: list = None, force=False, daemon=False,
                                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
                                            stdin=subprocess.DEVNULL)
                 stdout, stderr = process.communicate()
+                timings.mark('detach')
+                timings.split_detach(stdout)
                 if process.returncode == 0:
                     # Read PID:
                     try:
@@ -197,7 +648,10 @@ def run_single_instance_proc(name, cmds: list = None, force=False, daemon=False,
                         logger.error(e)
                         logger.error(f"Failed to read PID from: '{pidfile}'!")
                     logger.info(f"Daemon '{name}' with PID:{pid} successfully created")
-                    return _clear_global_lockfile(_lockfile, abs(pid))
+                    _clear_global_lockfile(_lockfile)
+                    timings.mark('read_pid')
+                    if not ready:
+                        return abs(pid)
                 else:
                     logger.error(f'stdout: {stdout}')
                     logger.error(f'stderr: {stderr}')
@@ -223,6 +677,26 @@ def run_single_instance_proc(name, cmds: list = None, force=False, daemon=False,
             logger.error(f"An error occurred while attempting to lock '{_lockfile}'!")
             return -4
 
+        # Wait until the daemon is ready (outside the global lock):
+        status, pending = wait_ready(ready, ready_timeout, log_path=log_path, log_offset=log_offset, pid=abs(pid))
+        timings.mark('ready')
+        if status == 'ready':
+            logger.info(f"Daemon '{name}' with PID:{abs(pid)} is ready")
+            return abs(pid)
+        elif status == 'exited':
+            logger.error(f"Daemon '{name}' with PID:{abs(pid)} exited before it was ready!")
+            return RC_READY_EXITED
+        logger.error(f"Daemon '{name}' with PID:{abs(pid)} is not ready after {ready_timeout}s: {', '.join(pending)}")
+        return RC_READY_TIMEOUT
+
+    # Named pipelines: the output goes to the FIFO of this process (directly or also to the log):
+    pipeline = stdout if stdout in PIPELINE_VALUES else None
+    if pipeline is not None:
+        stdout = 'pipe' if pipeline == 'tee' else 'devnull'      # 'fifo' is replaced by the FIFO below
+    if stdin_from is not None and stdin_from == name:
+        logger.error(f"The process '{name}' cannot read its own output!")
+        return -9
+
     # Parse and check stdout and stderr arguments:
     if stdout in STDOUT_VALUES:
         stdout = STDOUT_VALUES.get(stdout)
@@ -235,9 +709,26 @@ def run_single_instance_proc(name, cmds: list = None, force=False, daemon=False,
         logger.warning(f"'--stderr' cannot be '{stderr}', 'subprocess.DEVNULL' will be used instead!")
         stderr = subprocess.DEVNULL
 
+    # Check that the cgroup accepts processes:
+    if limits and not limits.check_cgroup():
+        logger.warning(f"The cgroup is not writable and will not be used!")
+
+    # Per-line timestamps and the sparse time index of the log:
+    clock = LineClock() if timestamps else None
+    index = None
+    timings.mark('prepare_run')
+
+    # Ship the log to the collector:
+    if ship_config is not None and ship_handler is None:
+        ship_handler = ShipHandler(name, ship_config, spill_path(log_dir, name), metrics=metrics)
+        logger.addHandler(ship_handler)
+
     # Run a sequence of commands:
+    pipeline_fds = []
+    queue = None
     try:
         with pidlockfile.PIDLockFile(pidfile, timeout=0.1):
+            timings.mark('pidfile_lock')
             returncode = None
             stdin = subprocess.DEVNULL
 
@@ -250,82 +741,280 @@ def run_single_instance_proc(name, cmds: list = None, force=False, daemon=False,
             else:
                 # Set the process as the leader of that session (set as a daemon):
                 os.setsid()
+                log_stream = _get_log_stream(logger)
+                if history is not None:
+                    history.begin(name, os.getpid(), daemon=True,
+                                  log_path=log_stream.name if log_stream is not None else None)
+                if log_stream is not None:
+                    index = TimeIndex(TimeIndex.path_for(log_stream.name))
+                    index.mark(time.time(), log_stream, flags=FLAG_SESSION)
                 t = datetime.now().isoformat(timespec='seconds')
                 logger.info(f'{PID_HEADER}{os.getpid()}, commands:{len(cmds)}, time:{t} ===')
 
-            # Run the attached process and execute a sequence of commands:
-            for i, cmd in enumerate(cmds):
-                if parent is not None or len(cmds) > 1:
-                    logger.info(f'= Executing #{i+1}: "{cmd}"')
-                try:
-                    cmd = cmd if shell else shlex.split(cmd)
-
-                    # Adjust environment variables:
-                    my_env = os.environ.copy()
-                    my_env['PYTHONUNBUFFERED'] = '1'                               # to flush python output buffer
-
-                    process = subprocess.Popen(cmd, env=my_env, bufsize=-1, text=True, shell=shell,
-                                               stdout=stdout, stderr=stderr, stdin=stdin)
-                    try:
-                        _print_proc_output(process, logger, stdout=process.stdout, stderr=process.stderr)
-                    except KeyboardInterrupt:
-                        logger.warning('Process interrupted: received SIGINT')
-                        process.terminate()
+            if metrics is not None:
+                metrics.inc('launches_total')
+            if registry is not None:
+                registry.started(name, os.getpid(), daemon=parent is not None)
+            if history is not None and not history.started:
+                history.begin(name, os.getpid(), daemon=False)
+
+            # Save the run info shown by 'runs':
+            _write_proc_info(pid_dir, name, {'limits': limits.to_dict() if limits else None})
+            timings.mark('session_start')
+
+            # Open the FIFOs of the pipeline (blocks until the other side opens them, as a pipe does):
+            tee_fd = None
+
+            # Bound the output written to the log and count what is suppressed:
+            def _report_suppressed(lines, size, repeated):
+                if registry is not None:
+                    registry.suppressed(name, os.getpid(), lines + repeated)
+                if metrics is not None and lines:
+                    metrics.inc('suppressed_lines_total', lines)
+                    metrics.inc('suppressed_bytes_total', size)
+                if metrics is not None and repeated:
+                    metrics.inc('repeated_lines_total', repeated)
+            limiter = OutputLimiter.create(rate_limit, dedupe=dedupe, report=_report_suppressed)
+            try:
+                if stdin_from is not None:
+                    if parent is not None:
+                        logger.info(f"= Waiting for the output of '{stdin_from}'...")
+                    stdin = open_fifo(fifo_path(pid_dir, stdin_from), os.O_RDONLY)
+                    pipeline_fds.append(stdin)
+                if pipeline is not None:
+                    fifo_fd = open_fifo(fifo_path(pid_dir, name), os.O_WRONLY)
+                    pipeline_fds.append(fifo_fd)
+                    if pipeline == 'fifo':
+                        stdout = fifo_fd
                     else:
-                        process.wait()
+                        tee_fd = fifo_fd
+            except OSError as e:
+                logger.error(e)
+                logger.error('Failed to open the FIFO of the pipeline!')
+                return -4
+            except KeyboardInterrupt:
+                logger.warning('Process interrupted: received SIGINT')
+                return -10
+            timings.mark('pipeline')
+
+            # Run the commands, then the submissions queued while they ran ('--queue'), a session each:
+            queue = SubmissionQueue(log_dir, name)
+            submission = None
+            while True:
+                # Run the attached process and execute a sequence of commands:
+                session_deadline = time.monotonic() + deadline if deadline else None
+                for i, cmd in enumerate(cmds):
+                    if session_deadline is not None and time.monotonic() >= session_deadline:
+                        logger.warning(f'= Aborted! The session deadline of {deadline}s has passed before #{i+1}')
+                        returncode = EXIT_TIMEOUT
+                        break
+                    if parent is not None or len(cmds) > 1:
+                        logger.info(f'= Executing #{i+1}: "{cmd}"')
+                    try:
+                        if history is not None:
+                            history.command_started()
+
+                        # Adjust environment variables:
+                        my_env = os.environ.copy()
+                        my_env['PYTHONUNBUFFERED'] = '1'                               # to flush python output buffer
+                        timings.mark(f'env#{i+1}')
+
+                        # Fork a python entry point from the warm template or start the command:
+                        process = None
+                        if warm is not None:
+                            try:
+                                process = WarmProcess(get_warm_socket(warm, pid_dir), cmd, env=my_env,
+                                                      stdout=stdout, stderr=stderr, stdin=stdin, limits=limits)
+                            except (FileNotFoundError, ConnectionRefusedError):
+                                logger.warning(f"Warm template '{warm}' is not running, starting cold")
+                            cmd = cold_command(cmd)
+                        else:
+                            cmd = cmd if shell else shlex.split(cmd)
+                        if process is None:
+                            # A command with a time limit leads its own process group to be stopped with all its children:
+                            # While the log is shipped by a thread, the limits are applied by a wrapper before
+                            # exec, 'preexec_fn' is not safe with threads:
+                            popen_cmd, popen_shell, preexec_fn = cmd, shell and warm is None, limits and limits.apply
+                            if limits and ship_handler is not None:
+                                popen_cmd = limits.wrap(['/bin/sh', '-c', cmd] if popen_shell else cmd)
+                                popen_shell, preexec_fn = False, None
+                            process = subprocess.Popen(popen_cmd, env=my_env, shell=popen_shell,
+                                                       stdout=stdout, stderr=stderr, stdin=stdin, preexec_fn=preexec_fn,
+                                                       start_new_session=bool(timeout or deadline))
+                        timings.mark(f'spawn#{i+1}')
+
+                        # The time limit of the command: its timeout or the rest of the session deadline:
+                        timer = None
+                        cmd_deadline = time.monotonic() + timeout if timeout else None
+                        if cmd_deadline is not None or session_deadline is not None:
+                            timer = KillTimer(min(t for t in (cmd_deadline, session_deadline) if t is not None))
+                        try:
+                            _print_proc_output(process, logger, clock=clock, index=index, metrics=metrics, tee_fd=tee_fd,
+                                               limiter=limiter, timer=timer)
+                        except KeyboardInterrupt:
+                            logger.warning('Process interrupted: received SIGINT')
+                            signal_group(process, signal.SIGTERM)
+                        else:
+                            process.wait()
+
+                        returncode = process.returncode
+                        if timer is not None and timer.expired:
+                            returncode = EXIT_TIMEOUT
+                            limit = (f'its timeout of {timeout}s' if cmd_deadline is not None and
+                                     (session_deadline is None or cmd_deadline <= session_deadline)
+                                     else f'the session deadline of {deadline}s')
+                            logger.warning(f'= #{i+1} was stopped after {limit}'
+                                           f'{" (SIGKILL)" if timer.killed else ""}')
+                            if metrics is not None:
+                                metrics.inc('timeouts_total')
+                        timings.mark(f'run#{i+1}')
+                        if history is not None:
+                            history.command_finished(cmds[i], returncode)
+                        if parent is not None:
+                            logger.info(f'= #{i+1} finished with exit code: {returncode}')
+
+                        # log_path = os.path.join(log_dir, name + '.log')
+                        # with open(log_path, 'a') as stdout_f:
+                        #     # Adjust environment variables:
+                        #     my_env = os.environ.copy() | {'PYTHONUNBUFFERED': '1'}
+                        #     my_env['PYTHONUNBUFFERED'] = '1'                              # to flush python output buffer
+                        #     my_env['AWS_REQUEST_CHECKSUM_CALCULATION']= 'when_required'   # for awscli
+                        #
+                        #     cmd = cmd if shell else shlex.split(cmd)
+                        #     process = subprocess.Popen(cmd, env=my_env, bufsize=1, text=True, universal_newlines=True, shell=shell,
+                        #                                stdout=stdout_f, stderr=stdout_f, stdin=stdin)     # subprocess.PIPE
+                        #     # try:
+                        #     #     with open(log_path, 'r') as read_f:
+                        #     #         _print_proc_output(process, logger, stdout=stdout_f, stderr=stdout_f)
+                        #     # except Exception as e:
+                        #     #     logger.error(f'EXEPTION!!! {e}')
+                        #     returncode = process.wait()
+                        #     #returncode = process.returncode
+                        #     if parent is not None:
+                        #         logger.info(f'= cmd #{i+1} finished with exit code: {returncode}')
 
-                    returncode = process.returncode
-                    if parent is not None:
-                        logger.info(f'= #{i+1} finished with exit code: {returncode}')
-
-                    # log_path = os.path.join(log_dir, name + '.log')
-                    # with open(log_path, 'a') as stdout_f:
-                    #     # Adjust environment variables:
-                    #     my_env = os.environ.copy() | {'PYTHONUNBUFFERED': '1'}
-                    #     my_env['PYTHONUNBUFFERED'] = '1'                              # to flush python output buffer
-                    #     my_env['AWS_REQUEST_CHECKSUM_CALCULATION']= 'when_required'   # for awscli
-                    #
-                    #     cmd = cmd if shell else shlex.split(cmd)
-                    #     process = subprocess.Popen(cmd, env=my_env, bufsize=1, text=True, universal_newlines=True, shell=shell,
-                    #                                stdout=stdout_f, stderr=stdout_f, stdin=stdin)     # subprocess.PIPE
-                    #     # try:
-                    #     #     with open(log_path, 'r') as read_f:
-                    #     #         _print_proc_output(process, logger, stdout=stdout_f, stderr=stdout_f)
-                    #     # except Exception as e:
-                    #     #     logger.error(f'EXEPTION!!! {e}')
-                    #     returncode = process.wait()
-                    #     #returncode = process.returncode
-                    #     if parent is not None:
-                    #         logger.info(f'= cmd #{i+1} finished with exit code: {returncode}')
+                    except Exception as e:
+                        # End the session, the submissions queued after it still run:
+                        logger.error(e)
+                        logger.error(f"Failed to execute: '{cmd}'")
+                        returncode = -4
+                        break
 
-                except Exception as e:
-                    logger.error(e)
-                    logger.error(f"Failed to execute: '{cmd}'")
-                    return -4
+                    if returncode != 0:
+                        if i+1 < len(cmds):
+                            logger.info(f'= Aborted! The last command completed with a non-zero returncode!')
+                        break
 
-                if returncode != 0:
-                    if i+1 < len(cmds):
-                        logger.info(f'= Aborted! The last command completed with a non-zero returncode!')
+                if submission is not None:
+                    queue.remove(submission['id'])
+
+                # Take the next submission. The queue stays locked when empty until the pidfile is released:
+                submission = queue.lock_empty()
+                if submission is None:
                     break
+                if parent is not None or len(cmds) > 1:
+                    logger.info(f'= Execution completed.')
+                if registry is not None:
+                    registry.exited(name, os.getpid(), returncode)
+                if history is not None:
+                    history.end(returncode)
+
+                # Start the session of the submission:
+                cmds, shell, timeout, deadline = (submission[key] for key in SESSION_KEYS)
+                returncode = None
+                if parent is not None:
+                    if history is not None:
+                        history.begin(name, os.getpid(), daemon=True,
+                                      log_path=log_stream.name if log_stream is not None else None)
+                    if index is not None:
+                        index.mark(time.time(), log_stream, flags=FLAG_SESSION)
+                    t = datetime.now().isoformat(timespec='seconds')
+                    logger.info(f'{PID_HEADER}{os.getpid()}, commands:{len(cmds)}, time:{t} ===')
+                elif history is not None:
+                    history.begin(name, os.getpid(), daemon=False)
+                logger.info(f"= Running the submission queued at "
+                            f"{datetime.fromtimestamp(submission['time']).isoformat(timespec='seconds')}")
+                if metrics is not None:
+                    metrics.inc('launches_total')
+                if registry is not None:
+                    registry.started(name, os.getpid(), daemon=parent is not None)
 
         if parent is not None or len(cmds) > 1:
             logger.info(f'= Execution completed.')
+        if log_timings and parent is not None:
+            logger.info(f'= Timings: {timings.to_json()}')
 
         return returncode if returncode is not None else -10
 
     except pidlockfile.LockTimeout:
+        if queue_depth:
+            return _submit(name, cmds, shell, timeout, deadline, pidfile, log_dir, queue_depth, coalesce, logger)
         logger.error(f"Could not acquire lock on {pidfile}. Another instance might be running.")
         return -1
     except Exception as e:
         logger.error(e)
         logger.error(f"An error occurred while attempting to lock '{pidfile}'!")
         return -4
+    finally:
+        # The readers of the FIFO get EOF when the session ends:
+        for fd in pipeline_fds:
+            os.close(fd)
+        # Submitters can append again now that the pidfile is released:
+        if queue is not None:
+            queue.release()
+        # Send the rest of the log, what cannot be sent is kept in the spill file for the next session:
+        if ship_handler is not None:
+            logger.removeHandler(ship_handler)
+            ship_handler.close()
+            shipper = ship_handler.shipper
+            if shipper.dropped or shipper.backlog:
+                logger.warning(f'= Log shipping: {shipper.dropped} records dropped, {shipper.backlog} records left in '
+                               f"'{shipper.spill_file}'{f' ({shipper.error})' if shipper.error else ''}")
+
+
+def _submit(name, cmds, shell, timeout, deadline, pidfile, log_dir, queue_depth, coalesce, logger) -> int:
+    # Queue the run for the instance holding the pidfile:
+    def _is_held():
+        return _pid_path_locked(pidfile)
+
+    queue = SubmissionQueue(log_dir, name)
+    submission = {'cmds': list(cmds), 'shell': shell, 'timeout': timeout, 'deadline': deadline}
+    try:
+        position, added = queue.push(submission, _is_held, max_depth=queue_depth, coalesce=coalesce)
+    except OSError as e:
+        logger.error(e)
+        logger.error(f"Failed to queue the run of '{name}'!")
+        return -4
+    if position is None:
+        logger.error(f"Could not acquire lock on {pidfile} and the queue of '{name}' is full ({queue_depth} runs)")
+        return -1
+    if position == 0:
+        return RC_RETRY
+    if added:
+        logger.info(f"'{name}' is running, the run is queued at position {position}")
+    else:
+        logger.info(f"'{name}' is running, the run is coalesced with the queued one at position {position}")
+    return RC_QUEUED
+
+
+def _observe_stop(name, metrics_dir, seconds):
+    if metrics_dir:
+        metrics = ProcessMetrics(name, metrics_dir)
+        metrics.observe('stop_seconds', seconds)
+        metrics.flush()
 
 
 def kill_proc(name, force=False, kill=False, pid_dir=PID_DIR, log_dir=LOG_DIR,
-              killer_proc: None | str = KILLER_PROC, purge=False, logger=None):
+              killer_proc: None | str = KILLER_PROC, purge=False, logger=None, metrics_dir=METRICS_DIR,
+              timings: PhaseTimings = None, log_timings=False):
+    """
+    Stops the single instance process 'name'. If 'timings' is given, it is filled in with the durations of the
+    phases of the stop (see PhaseTimings). If 'log_timings' is set, the killer process prints its own timings.
+    """
     if logger is None:
         logger = Logger.get_logger(PKJ_NAME)
+    if timings is None:
+        timings = PhaseTimings()
 
     pidfile = str(os.path.join(pid_dir, name + '.pid'))
 
@@ -340,9 +1029,14 @@ def kill_proc(name, force=False, kill=False, pid_dir=PID_DIR, log_dir=LOG_DIR,
             cmd += ' --force'
         if purge:
             cmd += ' --purge'
+        if metrics_dir:
+            cmd += f' --mdir={metrics_dir}'
+        if log_timings:
+            cmd += ' --timings'
 
-        if run_single_instance_proc(name=killer_proc, pid_dir=pid_dir, cmds=[cmd]) < 0:
+        if run_single_instance_proc(name=killer_proc, pid_dir=pid_dir, cmds=[cmd], metrics_dir=metrics_dir) < 0:
             return -6
+        timings.mark('killer_proc')
 
         # Remove the PID file of the killed process:
         if (purge and os.path.exists(pidfile)
@@ -352,10 +1046,16 @@ def kill_proc(name, force=False, kill=False, pid_dir=PID_DIR, log_dir=LOG_DIR,
                 if os.path.exists(pidfile) and not pidlockfile.PIDLockFile(pidfile).is_locked():
                     try:
                         os.remove(pidfile)
+                        for path in (os.path.join(pid_dir, name + INFO_EXT), fifo_path(pid_dir, name)):
+                            if os.path.exists(path):
+                                os.remove(path)
+                        with StatusRegistry(pid_dir) as registry:
+                            registry.remove(name)
                         logger.info(f'PID file deleted: {pidfile}')
                     except Exception as e:
                         logger.error(e)
                 _clear_global_lockfile(_lockfile)
+            timings.mark('purge_pid')
 
         # Remove the LOG file of the killed process:
         log_file = os.path.join(log_dir, name + '.log')
@@ -365,13 +1065,26 @@ def kill_proc(name, force=False, kill=False, pid_dir=PID_DIR, log_dir=LOG_DIR,
             with pidlockfile.PIDLockFile(_lockfile, timeout=1):  # global lock
                 try:
                     os.remove(log_file)
+                    TimeIndex(TimeIndex.path_for(log_file)).remove()
                     logger.info(f'LOG file deleted: {log_file}')
                 except Exception as e:
                     logger.error(e)
                 _clear_global_lockfile(_lockfile)
+            timings.mark('purge_log')
+
+        # Remove the ring buffer of the log ('--log=ring:SIZE'):
+        ring = ring_path(log_dir, name)
+        if (purge and os.path.exists(ring)
+                and ask_user_yes_no(f"Delete '{name}' ring buffer {ring}? (yes/no): ", logger)):
+            try:
+                os.remove(ring)
+                logger.info(f'Ring buffer deleted: {ring}')
+            except Exception as e:
+                logger.error(e)
     else:
         # Kill process via os.kill:
         pid = read_pid_from_pidfile(pidfile, logger=logger)
+        timings.mark('read_pid')
 
         if pid is None:
             return -2
@@ -385,15 +1098,21 @@ def kill_proc(name, force=False, kill=False, pid_dir=PID_DIR, log_dir=LOG_DIR,
                 return -3
 
             # Send SIGINT:
+            timings.mark('check_alive')
             if not kill:
                 os.kill(abs(pid), signal.SIGINT)
+                timings.mark('signal')
                 try:
                     for i in range(10):
                         os.kill(abs(pid), 0)
                         time.sleep(0.1)
                 except ProcessLookupError:
                     logger.info(f"Process stopped: '{name}:{abs(pid)}'")
+                    _observe_stop(name, metrics_dir, timings.mark('wait_exit'))
+                    with StatusRegistry(pid_dir) as registry:
+                        registry.stopped(name, abs(pid))
                 else:
+                    timings.mark('wait_exit')
                     logger.warning(f"Failed to stop process: '{name}:{abs(pid)}'! Use --kill to send SIGTERM")
                     return -5
 
@@ -404,6 +1123,9 @@ def kill_proc(name, force=False, kill=False, pid_dir=PID_DIR, log_dir=LOG_DIR,
                     os.kill(abs(pid), 0)
                 except ProcessLookupError:
                     logger.info(f"Process killed: '{name}:{abs(pid)}'")
+                    _observe_stop(name, metrics_dir, timings.mark('signal'))
+                    with StatusRegistry(pid_dir) as registry:
+                        registry.stopped(name, abs(pid))
                 else:
                     logger.warning(f"Failed to kill process: '{name}:{abs(pid)}'!")
                     return -5
@@ -416,7 +1138,17 @@ def kill_proc(name, force=False, kill=False, pid_dir=PID_DIR, log_dir=LOG_DIR,
     return 0
 
 
-def print_log(name,  log_dir=LOG_DIR, follow=False, last_n=10, session=None, remove=False, clear=False):
+def _follow_log(file, logger):
+    while True:
+        line = file.readline()
+        if not line:
+            time.sleep(0.1)  # wait a bit if no new lines
+            continue
+        logger.debug(line if not line.endswith('\n') else line[:-1])
+
+
+def print_log(name,  log_dir=LOG_DIR, follow=False, last_n=10, session=None, remove=False, clear=False,
+              since=None, until=None):
     """
     Prints logs of running processes.
 
@@ -430,28 +1162,64 @@ def print_log(name,  log_dir=LOG_DIR, follow=False, last_n=10, session=None, rem
         remove (bool): Remove the log file.
         clear (bool): Clear the log file according to the session number. If the session is None, the entire log
                       will be cleared. Otherwise, the log will be cleared up to the session number.
+        since (str or float): Prints only the lines written since this time (see parse_time for the formats).
+        until (str or float): Prints only the lines written until this time.
 
+    The log of a daemon run with '--log=ring:SIZE' is read from its ring buffer if it is newer than the log file.
     """
     logger = Logger.get_logger(PKJ_NAME)
 
     # Log file path:
     path = os.path.join(log_dir, name + '.log')
+    index = TimeIndex(TimeIndex.path_for(path))
+    ring = ring_path(log_dir, name)
+    use_ring = active_ring(log_dir, name) is not None
 
     # Remove the log file and exit:
     if remove:
+        if use_ring:
+            path = ring
         if not os.path.exists(path):
             logger.error(f"No such file: '{path}'")
         else:
             if ask_user_yes_no(f"Remove log file {path}? (yes/no): ", logger):
                 try:
                     os.remove(path)
+                    index.remove()
                 except Exception as e:
                     logger.error(e)
         return
 
+    if use_ring and (clear or since is not None or until is not None):
+        logger.error(f"The log of '{name}' is a ring buffer: '--clear', '--since' and '--until' are not supported")
+        return
+
+    # Print the lines of the time range [since, until] and follow the log if the range is open:
+    if since is not None or until is not None:
+        try:
+            since = parse_time(since) if isinstance(since, str) else since
+            until = parse_time(until) if isinstance(until, str) else until
+        except ValueError as e:
+            logger.error(e)
+            return
+        try:
+            with open(path, 'r') as file:
+                file.seek(0, os.SEEK_END)
+                for line in iter_range(path, since=since, until=until):
+                    logger.debug(line.decode(errors='replace').strip())
+                if follow and until is None:
+                    _follow_log(file, logger)
+        except FileNotFoundError:
+            logger.error(f"File not found: '{path}'")
+        except KeyboardInterrupt:
+            logger.warning('KeyboardInterrupt')
+        except Exception as e:
+            logger.error(e)
+        return
+
     try:
         mode = 'r+' if clear else 'r'
-        with open(path, mode) as file:
+        with RingFile(ring) if use_ring else open(path, mode) as file:
 
             # Print a full log starting from the specified process session and exit:
             if session is not None:
@@ -486,6 +1254,7 @@ def print_log(name,  log_dir=LOG_DIR, follow=False, last_n=10, session=None, rem
                         file.seek(0)
                         file.writelines(lines[found_line_i:])
                         file.truncate()
+                        index.rebase(sum(len(line.encode()) for line in lines[:found_line_i]))
 
                     # Print lines starting from found line:
                     else:
@@ -497,6 +1266,7 @@ def print_log(name,  log_dir=LOG_DIR, follow=False, last_n=10, session=None, rem
             if clear:
                 file.seek(0)
                 file.truncate()
+                index.remove()
                 return
 
             # Print the last n lines:
@@ -508,12 +1278,7 @@ def print_log(name,  log_dir=LOG_DIR, follow=False, last_n=10, session=None, rem
             # Go to the end of the file and follow it:
             if follow:
                 file.seek(0, os.SEEK_END)
-                while True:
-                    line = file.readline()
-                    if not line:
-                        time.sleep(0.1)  # wait a bit if no new lines
-                        continue
-                    logger.debug(line if not line.endswith('\n') else line[:-1])
+                _follow_log(file, logger)
 
     except FileNotFoundError:
         logger.error(f"File not found: '{path}'")
@@ -523,7 +1288,8 @@ def print_log(name,  log_dir=LOG_DIR, follow=False, last_n=10, session=None, rem
         logger.error(e)
 
 
-def logs(pid_dir=PID_DIR, log_dir=LOG_DIR, paths=False, clear=False):
+def logs(pid_dir=PID_DIR, log_dir=LOG_DIR, paths=False, clear=False, max_bytes=None, max_age=None,
+         max_sessions=None, dry_run=False):
     logger = Logger.get_logger(PKJ_NAME)
 
     # Check directories:
@@ -531,41 +1297,56 @@ def logs(pid_dir=PID_DIR, log_dir=LOG_DIR, paths=False, clear=False):
         logger.error(f"No such directory: '{log_dir}'. Try running '{CMD_INIT}' first")
         return -8
 
+    if max_bytes is not None or max_age is not None or max_sessions is not None:
+        return retain_logs(pid_dir, log_dir, max_bytes=max_bytes, max_age=max_age, max_sessions=max_sessions,
+                           dry_run=dry_run)
+
     if clear:
         removing = []
     else:
         # Create Table printer and print header:
-        header = f"|                Name                |   PID exists   |    Running    |"
-        table = TablePrinter(header, alignment=['<', '^', '^'], logger=logger)
+        header = (f"|                Name                |   Size   |      Modified       | Sessions |"
+                  f" PID exists | Running |")
+        table = TablePrinter(header, alignment=['<', '>', '^', '>', '^', '^'], logger=logger)
         table.print_special('outer')
         table.print_special('header')
         table.print_special('inner')
 
-    for file in os.listdir(log_dir):
-        if file.endswith('.log'):
-            log_path = os.path.join(log_dir, file)
-            name = file.split('.log')[0]
-            pid_path = os.path.join(pid_dir, name + '.pid')
-
-            # Check states:
-            pid_exists = os.path.exists(pid_path)
-            pid_locked = False
-            if pid_exists:
-                pid_locked = pidlockfile.PIDLockFile(pid_path).is_locked() is not None
-
-            # Print row:
-            if not clear:
-                table.print_row((
-                    log_path if paths else name,
-                    'yes' if pid_exists else 'no',
-                    'yes' if pid_locked else 'no')
-                )
-            # Add a log file without a PID file to the removing list:
-            elif not pid_exists and not pid_locked:
-                removing.append(log_path)
+    registry = StatusRegistry(pid_dir)
+    total = 0
+    for info in scan_logs(log_dir):
+        pid_path = os.path.join(pid_dir, info.name + '.pid')
+
+        # Check states (the registry first, then the lock of the PID file):
+        pid_exists = os.path.exists(pid_path)
+        pid_locked = False
+        record = registry.get(info.name)
+        if record is not None:
+            pid_locked = record.running
+        elif pid_exists:
+            pid_locked = pidlockfile.PIDLockFile(pid_path).is_locked() is not None
+
+        # Print row:
+        if not clear:
+            total += info.disk_size
+            table.print_row((
+                info.path if paths else info.name,
+                format_size(info.disk_size),
+                datetime.fromtimestamp(info.mtime).isoformat(' ', 'seconds'),
+                str(len(info.sessions)),
+                'yes' if pid_exists else 'no',
+                'yes' if pid_locked else 'no')
+            )
+        # Add a log file without a PID file to the removing list:
+        elif not pid_exists and not pid_locked:
+            removing.append(info.path)
+
+    registry.close()
 
     # Print outer separator:
     if not clear:
+        table.print_special('inner')
+        table.print_row(('total', format_size(total), '', '', '', ''))
         table.print_special('outer')
     # Delete log files:
     elif len(removing):
@@ -573,80 +1354,112 @@ def logs(pid_dir=PID_DIR, log_dir=LOG_DIR, paths=False, clear=False):
             counter = 0
             for log_path in removing:
                 try:
-                    os.remove(log_path)
+                    delete_log(log_path)
                     counter += 1
                 except Exception as e:
                     logger.error(e)
             logger.debug(f'{counter} files deleted!')
 
 
-def runs(pid_dir=PID_DIR, show_all=False):
-    logger = Logger.get_logger(PKJ_NAME)
+def retain_logs(pid_dir=PID_DIR, log_dir=LOG_DIR, max_bytes=None, max_age=None, max_sessions=None, dry_run=False):
+    """
+    Enforces the retention of the logs without asking, so it can be run by a timer: removes the oldest
+    sessions of the logs until the total size of the logs directory fits into 'max_bytes', the sessions that
+    ended before 'max_age' and the sessions over 'max_sessions' per log. The last session of a log is never
+    removed, and a whole log is deleted only if its process is not running.
 
-    # Check directories:
-    if not os.path.exists(pid_dir):
-        logger.error(f"No such directory: '{pid_dir}'. Try running '{CMD_INIT}' first")
+    Args:
+        pid_dir (str): PIDLockFile directory.
+        log_dir (str): Logs directory.
+        max_bytes (str or int): The maximum total size of the logs, e.g. '10G'.
+        max_age (str or float): The maximum age of the sessions, e.g. '7d', or a POSIX timestamp.
+        max_sessions (int): The maximum number of sessions per log.
+        dry_run (bool): Only print what would be removed.
+
+    Returns:
+        int: 0 on success or a negative error code.
+    """
+    logger = Logger.get_logger(PKJ_NAME)
+    try:
+        if isinstance(max_bytes, str):
+            max_bytes = parse_size(max_bytes)
+        if isinstance(max_age, str):
+            max_age = parse_time(max_age)
+        if max_sessions is not None and max_sessions < 1:
+            raise ValueError(f"Invalid number of sessions: {max_sessions}. Keep at least 1")
+    except ValueError as e:
+        logger.error(e)
+        return -9
+    if not os.path.exists(log_dir):
+        logger.error(f"No such directory: '{log_dir}'. Try running '{CMD_INIT}' first")
         return -8
 
-    # Create Table printer:
-    header = f"|                Name                |     PID     |  Daemon  |    State    |"
-    table = TablePrinter(header, alignment=['<', '^', '^', '^'], logger=logger)
-    table.print_special('outer')
-    table.print_special('header')
-    table.print_special('inner')
+    registry = StatusRegistry(pid_dir)
 
-    for file in os.listdir(pid_dir):
-        if file.endswith('.pid'):
-            name = file.split('.pid')[0]
+    def _running(name):
+        record = registry.get(name)
+        if record is not None and record.running:
+            return True
+        pid_path = os.path.join(pid_dir, name + '.pid')
+        return os.path.exists(pid_path) and pidlockfile.PIDLockFile(pid_path).is_locked() is not None
 
-            # Get pid:
-            pid_path = os.path.join(pid_dir, file)
-            pid = read_pid_from_pidfile(pid_path, logger=logger)
+    try:
+        plan = plan_retention(scan_logs(log_dir), max_bytes=max_bytes, max_age=max_age, max_sessions=max_sessions,
+                              running=_running)
+        live = {info.name for info, _, cut in plan if cut is not None and _running(info.name)}
+    finally:
+        registry.close()
+
+    freed = 0
+    for info, sessions, cut in plan:
+        action = 'delete' if cut is None else f'trim {sessions} sessions ({format_size(cut)})'
+        if dry_run:
+            logger.info(f"'{info.name}': would {action}")
+            continue
+        try:
+            if cut is None:
+                delete_log(info.path)
+                rebase_log(log_dir, info.name, None, 0)
+                freed += info.disk_size
+            else:
+                shift = trim_head(info.path, cut, live=info.name in live)
+                if not shift:
+                    logger.warning(f"'{info.name}': the log of a running process cannot be trimmed on this file "
+                                   f"system, skipped")
+                    continue
+                rebase_log(log_dir, info.name, cut, shift)
+                freed += shift
+        except OSError as e:
+            logger.error(f"'{info.name}': failed to {action}: {e}")
+            continue
+        logger.debug(f"'{info.name}': {action}")
+    if not dry_run:
+        logger.info(f'Retention: {len(plan)} logs changed, {format_size(freed)} freed')
+    return 0
 
-            # Check running and daemon:
-            daemon = pid > 0
-            locked = pidlockfile.PIDLockFile(pid_path).is_locked() is not None
 
-            # Check if process alive:
-            running = False
-            if pid != 0:
-                try:
-                    os.kill(abs(pid), 0)
-                    running = True
-                except ProcessLookupError:
-                    pass
-
-            # The state of locked != running when not a daemon is normal:
-            if locked and not running or not locked and running and daemon:
-                state = 'zombie'
-                logger.warning(f"Process '{name}' (PID:{pid}) may be a zombie "
-                               f"because it is locked={locked} but running={running}!")
-            elif running:
-                state = 'running'
-            else:
-                state = '-'
+def _pid_path_locked(pid_path) -> bool:
+    if not os.path.exists(pid_path):
+        return False
+    try:
+        return pidlockfile.PIDLockFile(pid_path).is_locked() is not None
+    except ValueError:
+        return True             # locked, but the holder has not written its PID yet
 
-            if not show_all and (not running or (name == KILLER_PROC or name == LOCK_PROC)):
-                continue
 
-            # Print:
-            table.print_row((name, str(abs(pid)), 'yes' if daemon else 'no', state))
-    table.print_special('outer')
+def _pidfile_locked(name, pid_dir=PID_DIR) -> bool:
+    # Whether an instance of the process holds its PID file, without logging:
+    return _pid_path_locked(os.path.join(pid_dir, name + '.pid'))
 
 
-def is_running(name, pid_dir=PID_DIR):
+def _check_pidfile(pid_path, logger=None) -> tuple:
     """
-    Returns True if the process 'name' is running, otherwise returns False.
+    Returns (pid, locked, running) of a PID file: the PID written in it, whether it is locked and whether a
+    process with this PID is alive.
     """
-    logger = Logger.get_logger(PKJ_NAME)
-
-    # Get pid:
-    pid_path = os.path.join(pid_dir, name + '.pid')
     pid = read_pid_from_pidfile(pid_path, logger=logger)
     if pid is None:
-        return False
-
-    # Check running:
+        return None, False, False
     locked = pidlockfile.PIDLockFile(pid_path).is_locked() is not None
 
     # Check if process alive:
@@ -657,6 +1470,152 @@ def is_running(name, pid_dir=PID_DIR):
             running = True
         except ProcessLookupError:
             pass
+    return pid, locked, running
+
+
+def repair_registry(pid_dir=PID_DIR, registry: StatusRegistry = None, logger=None) -> int:
+    """
+    Reconciles the status registry with the PID files after crashes: records of processes that are no longer
+    running are marked as crashed and running processes without a record are added.
+
+    Returns:
+        int: The number of repaired records.
+    """
+    if logger is None:
+        logger = Logger.get_logger(PKJ_NAME)
+    if registry is None:
+        with StatusRegistry(pid_dir) as registry:
+            return repair_registry(pid_dir, registry=registry, logger=logger)
+
+    repaired = 0
+    seen = set()
+    for entry in os.scandir(pid_dir):
+        if not entry.name.endswith('.pid') or entry.name == LOCK_PROC + '.pid':
+            continue
+        name = entry.name[:-len('.pid')]
+        seen.add(name)
+        pid, locked, running = _check_pidfile(entry.path)
+        record = registry.get(name)
+
+        # The state of locked != running when not a daemon is normal:
+        if pid is not None and (locked and not running or not locked and running and pid > 0):
+            logger.warning(f"Process '{name}' (PID:{pid}) may be a zombie "
+                           f"because it is locked={locked} but running={running}!")
+        alive = pid is not None and locked and running
+        if alive and (record is None or not record.running or record.pid != abs(pid)):
+            def _adopt(r, pid=pid, started=entry.stat().st_mtime):
+                r.pid = abs(pid)
+                r.daemon = pid > 0
+                r.state = STATE_RUNNING
+                r.start_time = started
+                r.exit_time = 0.0
+            registry.update(name, _adopt)
+            repaired += 1
+        elif not alive and record is not None and record.running:
+            registry.update(name, _mark_crashed)
+            repaired += 1
+
+    # Running records without a PID file:
+    for record in registry.records():
+        if record.running and record.name not in seen:
+            registry.update(record.name, _mark_crashed)
+            repaired += 1
+    return repaired
+
+
+def _mark_crashed(record):
+    record.state = STATE_CRASHED
+    record.exit_time = time.time()
+
+
+def _open_registry(pid_dir, logger=None) -> StatusRegistry:
+    # A new registry is filled in from the PID files:
+    registry = StatusRegistry(pid_dir)
+    if registry.available and registry.created:
+        repair_registry(pid_dir, registry=registry, logger=logger)
+    return registry
+
+
+def runs(pid_dir=PID_DIR, show_all=False, show_limits=False, repair=False):
+    """
+    Prints the processes from the status registry.
+
+    Args:
+        pid_dir (str): PIDLockFile directory.
+        show_all (bool): Prints processes with any state.
+        show_limits (bool): Prints the resource limits of processes.
+        repair (bool): Reconciles the registry with the PID files first (after crashes or reboots).
+    """
+    logger = Logger.get_logger(PKJ_NAME)
+
+    # Check directories:
+    if not os.path.exists(pid_dir):
+        logger.error(f"No such directory: '{pid_dir}'. Try running '{CMD_INIT}' first")
+        return -8
+
+    with _open_registry(pid_dir, logger=logger) as registry:
+        if not registry.available:
+            logger.error(f"Cannot open the status registry: '{registry.path}'")
+            return -8
+        if repair:
+            logger.info(f'{repair_registry(pid_dir, registry=registry, logger=logger)} records repaired')
+        records = sorted(registry.records(), key=lambda r: r.name)
+
+    # Create Table printer:
+    header = (f"|                Name                |     PID     |  Daemon  |    State    |"
+              f"       Started       |  Exit  | Restarts | Suppressed |")
+    alignment = ['<', '^', '^', '^', '^', '^', '^', '^']
+    if show_limits:
+        header += f"                 Limits                 |"
+        alignment.append('<')
+    table = TablePrinter(header, alignment=alignment, logger=logger)
+    table.print_special('outer')
+    table.print_special('header')
+    table.print_special('inner')
+
+    for record in records:
+        if not show_all and (not record.running or record.name in (KILLER_PROC, LOCK_PROC)):
+            continue
+        if not record.state:
+            continue        # removed by --purge
+
+        # Print:
+        started = datetime.fromtimestamp(record.start_time).isoformat(' ', 'seconds') if record.start_time else '-'
+        row = [record.name, str(record.pid), 'yes' if record.daemon else 'no', record.state_name, started,
+               str(record.returncode) if record.state == STATE_EXITED else '-', str(record.restarts),
+               str(record.suppressed)]
+        if show_limits:
+            limits = ResourceLimits.from_dict(read_proc_info(record.name, pid_dir).get('limits'))
+            row.append(limits.summary() if limits else '-')
+        table.print_row(row)
+    table.print_special('outer')
+
+
+def is_running(name, pid_dir=PID_DIR):
+    """
+    Returns True if the process 'name' is running, otherwise returns False.
+    """
+    logger = Logger.get_logger(PKJ_NAME)
+
+    # Look up the status registry and check that a running process has not crashed:
+    with StatusRegistry(pid_dir) as registry:
+        record = registry.get(name)
+        if record is not None:
+            if not record.running:
+                return False
+            try:
+                os.kill(record.pid, 0)
+                return True
+            except ProcessLookupError:
+                registry.update(name, _mark_crashed)
+                return False
+            except PermissionError:
+                return True
+
+    # No record (e.g. the registry is not writable), check the PID file:
+    pid, locked, running = _check_pidfile(os.path.join(pid_dir, name + '.pid'), logger=logger)
+    if pid is None:
+        return False
 
     if locked and not running or not locked and running and pid > 0:
         logger.warning(f"Process '{name}' (PID:{pid}) may be a zombie "
@@ -668,6 +1627,171 @@ def is_running(name, pid_dir=PID_DIR):
         return False
 
 
+def grep_logs(pattern, names: list = None, log_dir=LOG_DIR, last_sessions=None, ignore_case=False, fixed=False,
+              max_count=None, jobs=None, paths=False):
+    """
+    Searches the logs of processes for a regular expression in parallel (see search_logs) and prints the matching
+    lines with the process name and the session number (as used by 'log -s').
+
+    Args:
+        pattern (str): A regular expression (or a fixed string if 'fixed' is set).
+        names (list): Process names or glob patterns of the logs to search. Defaults to all logs.
+        log_dir (str): Logs directory.
+        last_sessions (int): Searches only the last N sessions of every log.
+        ignore_case (bool): Ignores the case of letters.
+        fixed (bool): The pattern is a fixed string.
+        max_count (int): Stops after this number of matching lines per log.
+        jobs (int): The number of worker processes. Defaults to the number of CPUs.
+        paths (bool): Prints log file paths instead of process names.
+
+    Returns:
+        int: The number of matching lines or a negative error code.
+    """
+    logger = Logger.get_logger(PKJ_NAME)
+    if not os.path.exists(log_dir):
+        logger.error(f"No such directory: '{log_dir}'. Try running '{CMD_INIT}' first")
+        return -8
+    if last_sessions is not None and last_sessions < 1:
+        logger.error(f'Invalid number of sessions: {last_sessions}')
+        return -9
+
+    selected = select_logs(log_dir, names)
+    if not selected:
+        logger.error(f"No logs found in '{log_dir}'" + (f" for: {', '.join(names)}" if names else ''))
+        return -2
+    pattern = pattern.encode()
+    if fixed:
+        pattern = re.escape(pattern)
+    found = 0
+    paths_by_name = {info.name: info.path for info in selected}
+    try:
+        for name, session, line in search_logs(selected, pattern, flags=re.MULTILINE | (re.IGNORECASE if ignore_case else 0),
+                                               last_sessions=last_sessions, max_count=max_count, jobs=jobs):
+            found += 1
+            logger.debug(f"{paths_by_name[name] if paths else name}:{session if session >= 0 else '-'}: "
+                         f"{line.decode(errors='replace')}")
+    except re.error as e:
+        logger.error(f'Invalid pattern: {e}')
+        return -9
+    except KeyboardInterrupt:
+        logger.warning('KeyboardInterrupt')
+    return found
+
+
+def watch(pid_dir=PID_DIR, log_dir=LOG_DIR, interval=REFRESH_INTERVAL, show_all=False):
+    """
+    Shows a live view of the processes (see Dashboard). The selected process can be followed with 't' and
+    stopped with 's'.
+    """
+    logger = Logger.get_logger(PKJ_NAME)
+    if not sys.stdout.isatty() or not sys.stdin.isatty():
+        logger.error(f"'{CMD_WATCH}' needs a terminal, use '{CMD_RUNS}' instead")
+        return -9
+    if interval <= 0:
+        logger.error(f'Invalid interval: {interval}')
+        return -9
+    for path in (pid_dir, log_dir):
+        if not os.path.exists(path):
+            logger.error(f"No such directory: '{path}'. Try running '{CMD_INIT}' first")
+            return -8
+
+    def _stop(name):
+        # The dashboard is not blocked while the process is stopping:
+        cmd = f'{PKJ_NAME} {CMD_STOP} {name} -pd={pid_dir} -ld={log_dir}'
+        subprocess.Popen(shlex.split(cmd), stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                         stderr=subprocess.DEVNULL, start_new_session=True)
+        return f"Stopping '{name}'..."
+
+    def _tail(name):
+        print(f"Following '{name}', press Ctrl+C to return", flush=True)
+        subprocess.call(shlex.split(f'{PKJ_NAME} {CMD_LOG} {name} -ld={log_dir} -f'))
+
+    with _open_registry(pid_dir, logger=logger) as registry:
+        if not registry.available:
+            logger.error(f"The status registry in '{pid_dir}' is not available, use '{CMD_RUNS}' instead")
+            return -4
+        Dashboard(registry, log_dir, pid_dir, interval=interval, show_all=show_all, on_stop=_stop,
+                  on_tail=_tail).run()
+    return 0
+
+
+def history(name, log_dir=LOG_DIR, last_n=10, failures=False, since=None, stats=False):
+    """
+    Prints the history of the sessions of a process.
+
+    Args:
+        name (str): The name of the process.
+        log_dir (str): Logs directory (the history database is kept there).
+        last_n (int): The number of the last sessions to print. Zero prints all sessions.
+        failures (bool): Prints only the sessions that ended with a non-zero return code.
+        since (str or float): Prints only the sessions started since this time (see parse_time for the formats).
+        stats (bool): Prints the p50/p95 durations of each command instead of the sessions.
+    """
+    logger = Logger.get_logger(PKJ_NAME)
+    query = HistoryQuery(log_dir)
+    try:
+        since = parse_time(since) if since is not None else None
+        if stats:
+            rows = query.command_stats(name, since=since)
+        else:
+            rows = query.sessions(name, last_n=last_n, failures=failures, since=since)
+    except ValueError as e:
+        logger.error(e)
+        return -9
+    except FileNotFoundError:
+        logger.error(f"No history found in '{log_dir}'")
+        return -2
+    except sqlite3.Error as e:
+        logger.error(e)
+        return -4
+
+    if stats:
+        table = TablePrinter("|  #  |                    Command                     |  Runs  | Failed |  p50, s  |"
+                             "  p95, s  |  last, s  |", alignment=['^', '<', '>', '>', '>', '>', '>'], logger=logger)
+        table.print_special('outer')
+        table.print_special('header')
+        table.print_special('inner')
+        for idx, cmd, runs_n, failed, p50, p95, last in rows:
+            table.print_row((str(idx + 1), cmd, str(runs_n), str(failed), f'{p50:.3f}', f'{p95:.3f}', f'{last:.3f}'))
+        table.print_special('outer')
+        return 0
+
+    table = TablePrinter("|  Session  |       Started       | Duration, s |  Exit  |    PID    | Daemon | Commands |"
+                         "       Log bytes       |", logger=logger)
+    table.print_special('outer')
+    table.print_special('header')
+    table.print_special('inner')
+    for session_id, pid, daemon, start, end, returncode, log_start, log_end, commands in rows:
+        log_range = f'{log_start}-{log_end}' if log_start is not None and log_end is not None else '-'
+        table.print_row((str(session_id), datetime.fromtimestamp(start).isoformat(' ', 'seconds'),
+                         f'{end - start:.3f}' if end else '-', str(returncode), str(pid),
+                         'yes' if daemon else 'no', str(commands), log_range))
+    table.print_special('outer')
+    return 0
+
+
+def print_metrics(metrics_dir=METRICS_DIR, serve=None, host='127.0.0.1'):
+    """
+    Prints the metrics of all processes or serves them over HTTP at 'http://host:serve/metrics'.
+    """
+    logger = Logger.get_logger(PKJ_NAME)
+    if not metrics_dir:
+        logger.error("The metrics directory is not set. Use '--mdir' or $SUPROC_METRICS_DIR")
+        return -8
+    if serve is None:
+        print(MetricsStore(metrics_dir).read_all(), end='')
+        return 0
+    logger.info(f'Serving metrics at http://{host}:{serve}/metrics')
+    try:
+        serve_metrics(metrics_dir, serve, host=host)
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        logger.error(e)
+        return -4
+    return 0
+
+
 def main():
     parser = argparse.ArgumentParser('ava-suproc',
                             description='This package allows to create and manage Single Unique Processes')
@@ -694,9 +1818,108 @@ def main():
     parser_run.add_argument('-sh', '--shell', action='store_true', default=False,
                             help='If true, the command will be executed through the shell')
     parser_run.add_argument('-o', '--stdout', type=str, default='pipe',
-                            help=f"Where to direct the process's stdout: {list(STDOUT_VALUES.keys())}")
+                            help=f"Where to direct the process's stdout: {list(STDOUT_VALUES) + list(PIPELINE_VALUES)}."
+                                 f" 'fifo' and 'tee' send it to the process run with '--stdin-from' this one")
     parser_run.add_argument('-e', '--stderr', type=str, default='pipe',
                             help=f"Where to direct the process's stderr: {list(STDERR_VALUES.keys())}")
+    parser_run.add_argument('-i', '--stdin-from', type=str, default=None,
+                            help="Read stdin from the output of the process with this name (run with '--stdout=fifo')")
+    parser_run.add_argument('-rl', '--rate-limit', type=str, default=None,
+                            help="Limit the output written to the log, e.g. 'lines=1000,bytes=1M[,burst=5][,sample=100]'"
+                                 " (per second, the lines over the limit are dropped or 1 of 'sample' is kept)")
+    parser_run.add_argument('--dedupe', action='store_true', default=False,
+                            help='Collapse runs of identical output lines into one line and a counter')
+    parser_run.add_argument('-t', '--timeout', type=float, default=None,
+                            help='Stop a command that runs longer than this number of seconds (return code 124)')
+    parser_run.add_argument('--deadline', type=float, default=None,
+                            help='Stop the session (the running command and the rest) after this number of seconds')
+    parser_run.add_argument('-q', '--queue', type=int, nargs='?', const=QUEUE_DEPTH, default=None, metavar='DEPTH',
+                            help=f'If the process is running, queue the run to be run by it next instead of failing'
+                                 f' (at most DEPTH pending runs, {QUEUE_DEPTH} by default)')
+    parser_run.add_argument('--coalesce', action='store_true', default=False,
+                            help="Do not queue a run equal to a pending one (with '--queue')")
+    parser_run.add_argument('--log', type=str, default=LOG_FILE,
+                            help="Where a daemon writes its log: 'file', 'ring:SIZE' (a ring buffer of SIZE bytes"
+                                 " in /dev/shm, e.g. 'ring:64M') or 'none' (with '--ship')")
+    parser_run.add_argument('--ship', type=str, default=None,
+                            help="Also send the log to a local collector: 'unix:PATH' or 'unixgram:PATH' with options,"
+                                 " e.g. 'unixgram:/dev/log' or 'unix:/run/vector.sock,format=json,batch=512'")
+    parser_run.add_argument('-ts', '--timestamps', action='store_true', default=False,
+                            help='Prefix each line of the log with the time it was received')
+    parser_run.add_argument('--timings', action='store_true', default=False,
+                            help='Print the time of each phase of the run (daemons also append it to their log)')
+    parser_run.add_argument('--cpus', type=str, default=None,
+                            help="CPU affinity of the commands, e.g. '0,2-3'")
+    parser_run.add_argument('--nice', type=int, default=None,
+                            help='Nice level of the commands')
+    parser_run.add_argument('--ionice', type=str, default=None,
+                            help="I/O priority of the commands: 'idle', 'best-effort[:0-7]' or 'realtime[:0-7]'")
+    parser_run.add_argument('--rlimit', type=str, default=None,
+                            help="Resource limits of the commands, e.g. 'as=2G,nofile=1024:4096,cpu=10m'")
+    parser_run.add_argument('--cgroup', type=str, default=None,
+                            help='cgroup v2 directory to place the commands into (if it is writable)')
+    parser_run.add_argument('-r', '--ready', action='append', default=None,
+                            help="Readiness probe of a daemon: 'tcp:[HOST:]PORT', 'unix:PATH', 'log:REGEX', "
+                                 "'file:PATH' or 'cmd:COMMAND'. Can be repeated, all probes must succeed")
+    parser_run.add_argument('-rt', '--ready-timeout', type=float, default=READY_TIMEOUT,
+                            help=f'Seconds to wait for the readiness probes (exit code {EXIT_TIMEOUT} on timeout)')
+    parser_run.add_argument('-md', '--mdir', type=str, default=METRICS_DIR,
+                            help='Metrics directory (node-exporter textfile collector), $SUPROC_METRICS_DIR by default')
+    parser_run.add_argument('-w', '--warm', type=str, default=None,
+                            help="Fork the python commands ('module:function', 'script.py' or '-m module') "
+                                 "from the warm template with this name")
+
+    # Create a subparser for the 'WARM' command:
+    parser_warm = subparsers.add_parser(CMD_WARM, help='Start a warm template process for python commands')
+    parser_warm.add_argument('name', type=str, default=None,
+                             help='Template name')
+    parser_warm.add_argument('-m', '--preload', nargs='+', default=None,
+                             help='Modules to import in the template')
+    parser_warm.add_argument('-f', '--force', action='store_true', default=False,
+                             help='Restart the template if it is running')
+    parser_warm.add_argument('--stop', action='store_true', default=False,
+                             help='Stop the template')
+    parser_warm.add_argument('-pd', '--pdir', type=str, default=PID_DIR,
+                             help='PIDLockFile directory')
+    parser_warm.add_argument('-ld', '--ldir', type=str, default=LOG_DIR,
+                             help='Logs directory')
+
+    # Create a subparser for the 'SCHEDULE' command:
+    parser_schedule = subparsers.add_parser(CMD_SCHEDULE, help='Run a process periodically from a resident scheduler')
+    parser_schedule.add_argument('name', type=str, default=None,
+                                 help='Process name to run')
+    parser_schedule.add_argument('-c', '--cmds', nargs='+', default=None,
+                                 help='List of command strings')
+    parser_schedule.add_argument('-sh', '--shell', action='store_true', default=False,
+                                 help='If true, the commands will be executed through the shell')
+    parser_schedule.add_argument('--every', type=str, default=None,
+                                 help="Run every interval, aligned to the epoch, e.g. '60s', '5m', '1h'")
+    parser_schedule.add_argument('--cron', type=str, default=None,
+                                 help="Run at the times of a cron expression, e.g. '*/5 * * * *' or '@daily'")
+    parser_schedule.add_argument('--overlap', type=str, default=OVERLAP_SKIP, choices=OVERLAP_VALUES,
+                                 help='What to do if the previous run is still running: skip the run, queue it or '
+                                      'replace the running one')
+    parser_schedule.add_argument('--jitter', type=str, default=None,
+                                 help="Delay every run by a random time up to this interval, e.g. '10s'")
+    parser_schedule.add_argument('--catch-up', type=str, default=CATCH_UP_SKIP, choices=CATCH_UP_VALUES,
+                                 help='What to do with the runs missed while the scheduler was stopped or the host '
+                                      f'was suspended: skip them, run one or run all (at most {MAX_CATCH_UP})')
+    parser_schedule.add_argument('-t', '--timeout', type=float, default=None,
+                                 help='Stop a command that runs longer than this number of seconds (return code 124)')
+    parser_schedule.add_argument('--deadline', type=float, default=None,
+                                 help='Stop a run (the running command and the rest) after this number of seconds')
+    parser_schedule.add_argument('-f', '--force', action='store_true', default=False,
+                                 help='Restart the scheduler if it is running')
+    parser_schedule.add_argument('--stop', action='store_true', default=False,
+                                 help='Stop the scheduler (a running run is not stopped)')
+    parser_schedule.add_argument('--foreground', action='store_true', default=False,
+                                 help='Run the saved schedule in this process (used by the scheduler daemon)')
+    parser_schedule.add_argument('-pd', '--pdir', type=str, default=PID_DIR,
+                                 help='PIDLockFile directory')
+    parser_schedule.add_argument('-ld', '--ldir', type=str, default=LOG_DIR,
+                                 help='Logs directory')
+    parser_schedule.add_argument('-md', '--mdir', type=str, default=METRICS_DIR,
+                                 help='Metrics directory (node-exporter textfile collector), $SUPROC_METRICS_DIR by default')
 
     # Create a subparser for the 'STOP' command:
     parser_kill = subparsers.add_parser(CMD_STOP, help='Stop a single instance process by its name')
@@ -710,10 +1933,14 @@ def main():
                              help='Send SIGTERM instead of SIGINT')
     parser_kill.add_argument('--purge', action='store_true', default=False,
                              help='Remove the pid file and log file of the stopped process')
+    parser_kill.add_argument('--timings', action='store_true', default=False,
+                             help='Print the time of each phase of the stop')
     parser_kill.add_argument('-pd', '--pdir', type=str, default=PID_DIR,
                              help='PIDLockFile directory')
     parser_kill.add_argument('-ld', '--ldir', type=str, default=LOG_DIR,
                              help='Logs directory')
+    parser_kill.add_argument('-md', '--mdir', type=str, default=METRICS_DIR,
+                             help='Metrics directory, $SUPROC_METRICS_DIR by default')
 
     # Create a subparser for the 'LOG' command:
     parser_log = subparsers.add_parser(CMD_LOG, help='Print logs of a single instance process by its name')
@@ -731,6 +1958,10 @@ def main():
                             help='Remove a log file by process name')
     parser_log.add_argument('-c', '--clear', action='store_true', default=False,
                             help='Clear the log file according to the session number.')
+    parser_log.add_argument('--since', type=str, default=None,
+                            help="Print lines written since the time: '14:02', '2025-03-01 14:02:30', '5m', ...")
+    parser_log.add_argument('--until', type=str, default=None,
+                            help="Print lines written until the time: '14:05', '2025-03-01 14:05:00', '1m', ...")
 
     # Create a subparser for the 'RUNS' command:
     parser_runs = subparsers.add_parser(CMD_RUNS, help='Print a list of processes')
@@ -738,6 +1969,10 @@ def main():
                              help='PIDLockFile directory')
     parser_runs.add_argument('-a', '--all', action='store_true', default=False,
                              help='Print processes with any state')
+    parser_runs.add_argument('-l', '--limits', action='store_true', default=False,
+                             help='Print the resource limits of processes')
+    parser_runs.add_argument('-r', '--repair', action='store_true', default=False,
+                             help='Reconcile the status registry with the PID files first (after crashes)')
 
     # Create a subparser for the 'LOGS' command:
     parser_logs = subparsers.add_parser(CMD_LOGS, help='Print a list of logs of processes')
@@ -749,6 +1984,70 @@ def main():
                              help='Delete all logs without processes')
     parser_logs.add_argument('-p', '--paths', action='store_true', default=False,
                              help='Print log file paths instead of log names')
+    parser_logs.add_argument('--max-bytes', type=str, default=None,
+                             help='Remove the oldest sessions until all logs fit into the size, e.g. 10G')
+    parser_logs.add_argument('--max-age', type=str, default=None,
+                             help='Remove the sessions that ended before the time, e.g. 7d')
+    parser_logs.add_argument('--max-sessions', type=int, default=None,
+                             help='Keep at most N last sessions of every log')
+    parser_logs.add_argument('--dry-run', action='store_true', default=False,
+                             help='Print what the retention options would remove')
+
+    # Create a subparser for the 'GREP' command:
+    parser_grep = subparsers.add_parser(CMD_GREP, help='Search the logs of processes in parallel')
+    parser_grep.add_argument('pattern', type=str,
+                             help='Regular expression to search for')
+    parser_grep.add_argument('names', type=str, nargs='*', default=None,
+                             help='Process names or glob patterns of the logs to search (all logs by default)')
+    parser_grep.add_argument('-ld', '--ldir', type=str, default=LOG_DIR,
+                             help='Logs directory')
+    parser_grep.add_argument('-s', '--sessions', type=int, default=None,
+                             help='Search only the last N sessions of every log')
+    parser_grep.add_argument('-i', '--ignore-case', action='store_true', default=False,
+                             help='Ignore the case of letters')
+    parser_grep.add_argument('-F', '--fixed', action='store_true', default=False,
+                             help='The pattern is a fixed string')
+    parser_grep.add_argument('-m', '--max-count', type=int, default=None,
+                             help='Stop after N matching lines per log')
+    parser_grep.add_argument('-j', '--jobs', type=int, default=None,
+                             help='Number of worker processes (the number of CPUs by default)')
+    parser_grep.add_argument('-p', '--paths', action='store_true', default=False,
+                             help='Print log file paths instead of log names')
+
+    # Create a subparser for the 'WATCH' command:
+    parser_watch = subparsers.add_parser(CMD_WATCH, help='Show a live view of processes')
+    parser_watch.add_argument('-pd', '--pdir', type=str, default=PID_DIR,
+                              help='PIDLockFile directory')
+    parser_watch.add_argument('-ld', '--ldir', type=str, default=LOG_DIR,
+                              help='Logs directory')
+    parser_watch.add_argument('-i', '--interval', type=float, default=REFRESH_INTERVAL,
+                              help='Seconds between updates of CPU, RSS and uptime')
+    parser_watch.add_argument('-a', '--all', action='store_true', default=False,
+                              help='Show processes with any state')
+
+    # Create a subparser for the 'HISTORY' command:
+    parser_history = subparsers.add_parser(CMD_HISTORY, help='Print the history of the sessions of a process')
+    parser_history.add_argument('name', type=str,
+                                help='Process name to print its history')
+    parser_history.add_argument('-n', '--last-n', type=int, default=10,
+                                help='The number of the last sessions to print (0 - all)')
+    parser_history.add_argument('--failures', action='store_true', default=False,
+                                help='Print only the sessions that ended with a non-zero exit code')
+    parser_history.add_argument('--since', type=str, default=None,
+                                help="Print the sessions started since the time: '14:02', '2025-03-01 14:02', '2h'")
+    parser_history.add_argument('--stats', action='store_true', default=False,
+                                help='Print the p50/p95 durations of each command instead of the sessions')
+    parser_history.add_argument('-ld', '--ldir', type=str, default=LOG_DIR,
+                                help='Logs directory')
+
+    # Create a subparser for the 'METRICS' command:
+    parser_metrics = subparsers.add_parser(CMD_METRICS, help='Print or serve the metrics of processes')
+    parser_metrics.add_argument('-md', '--mdir', type=str, default=METRICS_DIR,
+                                help='Metrics directory, $SUPROC_METRICS_DIR by default')
+    parser_metrics.add_argument('--serve', type=int, default=None, metavar='PORT',
+                                help='Serve the metrics over HTTP on this port instead of printing them')
+    parser_metrics.add_argument('--host', type=str, default='127.0.0.1',
+                                help='Address to serve the metrics on')
 
     args = parser.parse_args()
 
@@ -757,7 +2056,14 @@ def main():
         logger = Logger.get_logger(PKJ_NAME)
         logger.info(__version__)
     elif args.command == CMD_RUN:
-        run_single_instance_proc(
+        try:
+            limits = ResourceLimits.parse(cpus=args.cpus, nice=args.nice, ionice=args.ionice, rlimits=args.rlimit,
+                                          cgroup=args.cgroup)
+        except ValueError as e:
+            Logger.get_logger(PKJ_NAME).error(e)
+            return
+        timings = PhaseTimings() if args.timings else None
+        returncode = run_single_instance_proc(
             name=args.name,
             cmds=args.cmds,
             force=args.force,
@@ -767,9 +2073,76 @@ def main():
             parent=args.parent,
             shell=args.shell,
             stdout=args.stdout,
-            stderr=args.stderr
+            stderr=args.stderr,
+            stdin_from=args.stdin_from,
+            rate_limit=args.rate_limit,
+            dedupe=args.dedupe,
+            log=args.log,
+            timeout=args.timeout,
+            deadline=args.deadline,
+            queue_depth=args.queue,
+            coalesce=args.coalesce,
+            ship=args.ship,
+            timestamps=args.timestamps,
+            warm=args.warm,
+            limits=limits,
+            ready=args.ready,
+            ready_timeout=args.ready_timeout,
+            metrics_dir=args.mdir,
+            timings=timings,
+            log_timings=args.timings
         )
+        if timings is not None and args.parent is None:
+            timings.print_table()
+        if args.ready and args.daemon and returncode < 0:
+            sys.exit(EXIT_TIMEOUT if returncode == RC_READY_TIMEOUT else 1)
+    elif args.command == CMD_WARM:
+        if args.stop:
+            kill_proc(
+                name=f'{WARM_PROC}.{args.name}',
+                pid_dir=args.pdir,
+                log_dir=args.ldir
+            )
+        else:
+            start_warm_template(
+                template=args.name,
+                preload=args.preload,
+                force=args.force,
+                pid_dir=args.pdir,
+                log_dir=args.ldir
+            )
+    elif args.command == CMD_SCHEDULE:
+        if args.stop:
+            kill_proc(
+                name=f'{SCHED_PROC}.{args.name}',
+                pid_dir=args.pdir,
+                log_dir=args.ldir
+            )
+        elif args.foreground:
+            run_scheduler(
+                name=args.name,
+                pid_dir=args.pdir,
+                log_dir=args.ldir
+            )
+        else:
+            start_scheduler(
+                name=args.name,
+                cmds=args.cmds,
+                every=args.every,
+                cron=args.cron,
+                overlap=args.overlap,
+                jitter=args.jitter,
+                catch_up=args.catch_up,
+                shell=args.shell,
+                timeout=args.timeout,
+                deadline=args.deadline,
+                force=args.force,
+                pid_dir=args.pdir,
+                log_dir=args.ldir,
+                metrics_dir=args.mdir
+            )
     elif args.command == CMD_STOP:
+        timings = PhaseTimings() if args.timings else None
         if args.no_killer_proc:
             kill_proc(
                 name=args.name,
@@ -778,7 +2151,9 @@ def main():
                 pid_dir=args.pdir,
                 log_dir=args.ldir,
                 purge=args.purge,
-                killer_proc=None
+                killer_proc=None,
+                metrics_dir=args.mdir,
+                timings=timings
             )
         else:
             kill_proc(
@@ -787,8 +2162,13 @@ def main():
                 kill=args.kill,
                 pid_dir=args.pdir,
                 log_dir=args.ldir,
-                purge=args.purge
+                purge=args.purge,
+                metrics_dir=args.mdir,
+                timings=timings,
+                log_timings=args.timings
             )
+        if timings is not None:
+            timings.print_table()
     elif args.command == CMD_LOG:
         print_log(
             name=args.name,
@@ -797,19 +2177,62 @@ def main():
             last_n=args.last_n,
             session=args.session,
             remove=args.remove,
-            clear=args.clear
+            clear=args.clear,
+            since=args.since,
+            until=args.until
         )
     elif args.command == CMD_RUNS:
         runs(
             pid_dir=args.pdir,
-            show_all=args.all
+            show_all=args.all,
+            show_limits=args.limits,
+            repair=args.repair
         )
     elif args.command == CMD_LOGS:
         logs(
             pid_dir=args.pdir,
             log_dir=args.ldir,
             paths=args.paths,
-            clear=args.clear
+            clear=args.clear,
+            max_bytes=args.max_bytes,
+            max_age=args.max_age,
+            max_sessions=args.max_sessions,
+            dry_run=args.dry_run
+        )
+    elif args.command == CMD_GREP:
+        found = grep_logs(
+            pattern=args.pattern,
+            names=args.names,
+            log_dir=args.ldir,
+            last_sessions=args.sessions,
+            ignore_case=args.ignore_case,
+            fixed=args.fixed,
+            max_count=args.max_count,
+            jobs=args.jobs,
+            paths=args.paths
+        )
+        sys.exit(0 if found > 0 else 1 if found == 0 else 2)     # as grep(1)
+    elif args.command == CMD_WATCH:
+        watch(
+            pid_dir=args.pdir,
+            log_dir=args.ldir,
+            interval=args.interval,
+            show_all=args.all
+        )
+    elif args.command == CMD_HISTORY:
+        history(
+            name=args.name,
+            log_dir=args.ldir,
+            last_n=args.last_n,
+            failures=args.failures,
+            since=args.since,
+            stats=args.stats
+        )
+    elif args.command == CMD_METRICS:
+        print_metrics(
+            metrics_dir=args.mdir,
+            serve=args.serve,
+            host=args.host
         )
     else:
         parser.print_help()
@@ -0,0 +1,217 @@
+"""
+AVA Single Unique Process
+© AVA, 2025
+"""
+import os
+import time
+import sqlite3
+
+HISTORY_FILE = '__history.db'
+BUSY_TIMEOUT = 5.0              # seconds to wait for another writer
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    daemon INTEGER NOT NULL,
+    start REAL NOT NULL,
+    end REAL,
+    returncode INTEGER,
+    log_start INTEGER,
+    log_end INTEGER
+);
+CREATE TABLE IF NOT EXISTS commands (
+    session_id INTEGER NOT NULL,
+    idx INTEGER NOT NULL,
+    cmd TEXT NOT NULL,
+    start REAL NOT NULL,
+    duration REAL NOT NULL,
+    returncode INTEGER,
+    PRIMARY KEY (session_id, idx)
+);
+CREATE INDEX IF NOT EXISTS sessions_name_start ON sessions(name, start);
+"""
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')      # durable enough for a history, no fsync per commit in WAL
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def percentile(values: list, q: float) -> float:
+    """
+    Returns the nearest-rank percentile 'q' (0..1) of the sorted values.
+    """
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+class SessionHistory:
+    """
+    Collects the session and the commands of a run in memory and writes them to the history database
+    ('__history.db' in the logs directory) in one transaction when the session ends, so the launch and the
+    commands are not slowed down by the database.
+    """
+    def __init__(self, log_dir: str):
+        self.path = os.path.join(log_dir, HISTORY_FILE)
+        self._session = None
+        self._commands = []
+        self._log_path = None
+        self._cmd_start = None
+
+    @property
+    def started(self) -> bool:
+        return self._session is not None
+
+    def begin(self, name: str, pid: int, daemon: bool, log_path: str = None):
+        log_start = None
+        if log_path is not None:
+            try:
+                log_start = os.path.getsize(log_path)
+            except OSError:
+                log_path = None
+        self._log_path = log_path
+        self._session = [name, pid, int(daemon), time.time(), log_start]
+        self._commands = []
+
+    def command_started(self):
+        self._cmd_start = (time.time(), time.monotonic())
+
+    def command_finished(self, cmd: str, returncode: int):
+        if self._cmd_start is None:
+            return
+        start, start_monotonic = self._cmd_start
+        self._commands.append((len(self._commands), str(cmd), start, time.monotonic() - start_monotonic, returncode))
+        self._cmd_start = None
+
+    def end(self, returncode: int) -> bool:
+        """
+        Writes the session to the database. Returns False if it could not be written.
+        """
+        if self._session is None:
+            return False
+        name, pid, daemon, start, log_start = self._session
+        self._session = None
+        log_end = None
+        if self._log_path is not None:
+            try:
+                log_end = os.path.getsize(self._log_path)
+            except OSError:
+                pass
+        try:
+            conn = _connect(self.path)
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                cursor = conn.execute(
+                    'INSERT INTO sessions (name, pid, daemon, start, end, returncode, log_start, log_end)'
+                    ' VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (name, pid, daemon, start, time.time(), returncode, log_start, log_end))
+                conn.executemany(
+                    'INSERT INTO commands (session_id, idx, cmd, start, duration, returncode)'
+                    ' VALUES (?, ?, ?, ?, ?, ?)',
+                    [(cursor.lastrowid,) + command for command in self._commands])
+                conn.execute('COMMIT')
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            return False
+        return True
+
+
+def rebase_log(log_dir: str, name: str, cut: int, shift: int) -> bool:
+    """
+    Updates the log ranges of the sessions of the process 'name' after the head of its log has been removed up
+    to the byte offset 'cut' (see retention.trim_head()): the ranges of the removed sessions are cleared. If
+    'cut' is None, the whole log has been deleted.
+    """
+    if cut is None:
+        cut = 2 ** 63 - 1
+    path = os.path.join(log_dir, HISTORY_FILE)
+    if not os.path.exists(path):
+        return False
+    try:
+        conn = _connect(path)
+        try:
+            conn.execute(
+                'UPDATE sessions SET'
+                ' log_start = CASE WHEN log_start >= ? THEN log_start - ? END,'
+                ' log_end = CASE WHEN log_start >= ? THEN log_end - ? END'
+                ' WHERE name = ? AND log_start IS NOT NULL',
+                (cut, shift, cut, shift, name))
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return False
+    return True
+
+
+class HistoryQuery:
+    """
+    Read-only queries of the history database.
+    """
+    def __init__(self, log_dir: str):
+        self.path = os.path.join(log_dir, HISTORY_FILE)
+
+    def _connect(self) -> sqlite3.Connection:
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(self.path)
+        return _connect(self.path)
+
+    def sessions(self, name: str, last_n: int = 10, failures=False, since: float = None) -> list:
+        """
+        Returns the last sessions of the process 'name' as tuples
+        (id, pid, daemon, start, end, returncode, log_start, log_end, commands), the newest first.
+        """
+        query = ('SELECT s.id, s.pid, s.daemon, s.start, s.end, s.returncode, s.log_start, s.log_end,'
+                 ' (SELECT COUNT(*) FROM commands c WHERE c.session_id = s.id)'
+                 ' FROM sessions s WHERE s.name = ?')
+        params = [name]
+        if failures:
+            query += ' AND s.returncode != 0'
+        if since is not None:
+            query += ' AND s.start >= ?'
+            params.append(since)
+        query += ' ORDER BY s.start DESC'
+        if last_n:
+            query += ' LIMIT ?'
+            params.append(last_n)
+        conn = self._connect()
+        try:
+            return conn.execute(query, params).fetchall()
+        finally:
+            conn.close()
+
+    def command_stats(self, name: str, since: float = None) -> list:
+        """
+        Returns the duration statistics of each command of the process 'name' as tuples
+        (idx, cmd, runs, failures, p50, p95, last), ordered by the position of the command.
+        """
+        query = ('SELECT c.idx, c.cmd, c.duration, c.returncode FROM commands c'
+                 ' JOIN sessions s ON s.id = c.session_id WHERE s.name = ?')
+        params = [name]
+        if since is not None:
+            query += ' AND s.start >= ?'
+            params.append(since)
+        query += ' ORDER BY c.start'
+        conn = self._connect()
+        try:
+            rows = conn.execute(query, params).fetchall()
+        finally:
+            conn.close()
+
+        grouped = {}
+        for idx, cmd, duration, returncode in rows:
+            item = grouped.setdefault((idx, cmd), {'durations': [], 'failures': 0, 'last': None})
+            item['durations'].append(duration)
+            item['failures'] += returncode != 0
+            item['last'] = duration
+        stats = []
+        for (idx, cmd), item in sorted(grouped.items()):
+            durations = sorted(item['durations'])
+            stats.append((idx, cmd, len(durations), item['failures'], percentile(durations, 0.5),
+                          percentile(durations, 0.95), item['last']))
+        return stats
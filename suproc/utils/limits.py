@@ -0,0 +1,256 @@
+"""
+AVA Single Unique Process
+© AVA, 2025
+"""
+import os
+import sys
+import json
+import ctypes
+import platform
+import resource
+
+IOPRIO_CLASSES = {
+    'realtime': 1, 'rt': 1,
+    'best-effort': 2, 'be': 2,
+    'idle': 3,
+}
+IOPRIO_CLASS_NAMES = {1: 'realtime', 2: 'best-effort', 3: 'idle'}
+_IOPRIO_CLASS_SHIFT = 13
+_IOPRIO_WHO_PROCESS = 1
+_SYS_IOPRIO_SET = {
+    'x86_64': 251, 'amd64': 251,
+    'i386': 289, 'i686': 289,
+    'aarch64': 30, 'arm64': 30,
+    'armv7l': 314, 'armv6l': 314,
+    'ppc64le': 273, 'ppc64': 273,
+    's390x': 282,
+    'riscv64': 30,
+}
+_SIZE_UNITS = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+_TIME_UNITS = {'s': 1, 'm': 60, 'h': 3600}
+
+
+def parse_cpus(value: str) -> list:
+    """
+    Parses a CPU list like '0,2-3' into [0, 2, 3].
+    """
+    cpus = set()
+    for part in value.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            first, last = part.split('-', 1)
+            cpus.update(range(int(first), int(last) + 1))
+        else:
+            cpus.add(int(part))
+    if not cpus:
+        raise ValueError(f"Invalid CPU list: '{value}'")
+    return sorted(cpus)
+
+
+def format_cpus(cpus: list) -> str:
+    ranges = []
+    for cpu in sorted(cpus):
+        if ranges and ranges[-1][1] == cpu - 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ','.join(str(a) if a == b else f'{a}-{b}' for a, b in ranges)
+
+
+def parse_ionice(value: str) -> tuple:
+    """
+    Parses an I/O priority like 'idle', 'best-effort:7' or 'rt:0' into (class, level).
+    """
+    cls, _, level = value.partition(':')
+    if cls.strip().lower() not in IOPRIO_CLASSES:
+        raise ValueError(f"Invalid I/O priority class: '{cls}'. Use one of {sorted(IOPRIO_CLASSES)}")
+    level = int(level) if level else (0 if IOPRIO_CLASSES[cls.strip().lower()] == 3 else 4)
+    if not 0 <= level <= 7:
+        raise ValueError(f"Invalid I/O priority level: {level}. It must be in [0, 7]")
+    return IOPRIO_CLASSES[cls.strip().lower()], level
+
+
+def _parse_limit_value(value: str, name: str) -> int:
+    value = value.strip()
+    if value.lower() in ('unlimited', 'inf', '-1'):
+        return resource.RLIM_INFINITY
+    if name == 'cpu' and value[-1:] in _TIME_UNITS:
+        return int(float(value[:-1]) * _TIME_UNITS[value[-1]])
+    if value[-1:].upper() in _SIZE_UNITS:
+        return int(float(value[:-1]) * _SIZE_UNITS[value[-1].upper()])
+    return int(value)
+
+
+def parse_rlimits(value: str) -> dict:
+    """
+    Parses resource limits like 'as=2G,nofile=1024:4096,cpu=10m' into {name: (soft, hard)}. The names are the
+    RLIMIT_* constants of the 'resource' module in lower case. If the hard limit is omitted, it equals the soft one.
+    """
+    rlimits = {}
+    for part in value.split(','):
+        if not part.strip():
+            continue
+        name, sep, limits = part.partition('=')
+        name = name.strip().lower()
+        if not sep or not hasattr(resource, f'RLIMIT_{name.upper()}'):
+            raise ValueError(f"Invalid resource limit: '{part}'")
+        soft, _, hard = limits.partition(':')
+        soft = _parse_limit_value(soft, name)
+        rlimits[name] = (soft, _parse_limit_value(hard, name) if hard else soft)
+    return rlimits
+
+
+def _format_limit_value(value: int) -> str:
+    if value == resource.RLIM_INFINITY:
+        return 'unlimited'
+    for unit in ('T', 'G', 'M', 'K'):
+        if value >= _SIZE_UNITS[unit] and value % _SIZE_UNITS[unit] == 0:
+            return f'{value // _SIZE_UNITS[unit]}{unit}'
+    return str(value)
+
+
+def format_rlimits(rlimits: dict) -> str:
+    parts = []
+    for name, (soft, hard) in rlimits.items():
+        limit = _format_limit_value(soft)
+        if hard != soft:
+            limit += ':' + _format_limit_value(hard)
+        parts.append(f'{name}={limit}')
+    return ','.join(parts)
+
+
+def _ioprio_set(cls: int, level: int):
+    number = _SYS_IOPRIO_SET.get(platform.machine().lower())
+    if number is None:
+        raise OSError(f"ioprio_set is not supported on '{platform.machine()}'")
+    libc = ctypes.CDLL(None, use_errno=True)
+    if libc.syscall(number, _IOPRIO_WHO_PROCESS, 0, (cls << _IOPRIO_CLASS_SHIFT) | level) != 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, f'ioprio_set: {os.strerror(errno)}')
+
+
+class ResourceLimits:
+    """
+    CPU affinity, scheduling priority, I/O priority, rlimits and the cgroup v2 of the commands of a process.
+    The limits are applied in the child right before it executes a command.
+    """
+    def __init__(self, cpus: list = None, nice: int = None, ionice: tuple = None, rlimits: dict = None,
+                 cgroup: str = None):
+        self.cpus = cpus
+        self.nice = nice
+        self.ionice = tuple(ionice) if ionice else None
+        self.rlimits = rlimits or {}
+        self.cgroup = cgroup
+
+    @classmethod
+    def parse(cls, cpus: str = None, nice: int = None, ionice: str = None, rlimits: str = None, cgroup: str = None):
+        """
+        Creates limits from the command line strings. Returns None if no limit is set.
+        """
+        limits = cls(
+            cpus=parse_cpus(cpus) if cpus else None,
+            nice=int(nice) if nice is not None else None,
+            ionice=parse_ionice(ionice) if ionice else None,
+            rlimits=parse_rlimits(rlimits) if rlimits else None,
+            cgroup=cgroup or None
+        )
+        return limits if limits else None
+
+    def __bool__(self):
+        return bool(self.cpus or self.nice is not None or self.ionice or self.rlimits or self.cgroup)
+
+    def to_dict(self) -> dict:
+        return {'cpus': self.cpus, 'nice': self.nice, 'ionice': self.ionice, 'rlimits': self.rlimits,
+                'cgroup': self.cgroup}
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        if not data:
+            return None
+        rlimits = {name: tuple(limit) for name, limit in (data.get('rlimits') or {}).items()}
+        return cls(cpus=data.get('cpus'), nice=data.get('nice'), ionice=data.get('ionice'), rlimits=rlimits,
+                   cgroup=data.get('cgroup'))
+
+    def to_args(self) -> str:
+        """
+        Returns the command line options of 'suproc run' for these limits.
+        """
+        args = []
+        if self.cpus:
+            args.append(f'--cpus={format_cpus(self.cpus)}')
+        if self.nice is not None:
+            args.append(f'--nice={self.nice}')
+        if self.ionice:
+            args.append(f'--ionice={IOPRIO_CLASS_NAMES[self.ionice[0]]}:{self.ionice[1]}')
+        if self.rlimits:
+            args.append(f'--rlimit={format_rlimits(self.rlimits)}')
+        if self.cgroup:
+            args.append(f'--cgroup={self.cgroup}')
+        return ' '.join(args)
+
+    def summary(self) -> str:
+        parts = []
+        if self.cpus:
+            parts.append(f'cpus={format_cpus(self.cpus)}')
+        if self.nice is not None:
+            parts.append(f'nice={self.nice}')
+        if self.ionice:
+            parts.append(f'io={IOPRIO_CLASS_NAMES[self.ionice[0]]}:{self.ionice[1]}')
+        if self.rlimits:
+            parts.append(format_rlimits(self.rlimits))
+        if self.cgroup:
+            parts.append(f'cg={os.path.basename(os.path.normpath(self.cgroup))}')
+        return ' '.join(parts)
+
+    def check_cgroup(self) -> bool:
+        """
+        Returns True if the cgroup v2 directory accepts processes. Otherwise, the cgroup is dropped.
+        """
+        if not self.cgroup:
+            return True
+        if os.access(os.path.join(self.cgroup, 'cgroup.procs'), os.W_OK):
+            return True
+        self.cgroup = None
+        return False
+
+    def apply(self):
+        """
+        Applies the limits to the current process (used as 'preexec_fn' and in forked children).
+        """
+        if self.cgroup:
+            with open(os.path.join(self.cgroup, 'cgroup.procs'), 'w') as f:
+                f.write(str(os.getpid()))
+        if self.cpus:
+            os.sched_setaffinity(0, self.cpus)
+        if self.nice is not None:
+            os.setpriority(os.PRIO_PROCESS, 0, self.nice)
+        if self.ionice:
+            _ioprio_set(*self.ionice)
+        for name, (soft, hard) in self.rlimits.items():
+            resource.setrlimit(getattr(resource, f'RLIMIT_{name.upper()}'), (soft, hard))
+
+    def wrap(self, argv: list) -> list:
+        """
+        Returns the command line that applies the limits and then executes 'argv' (see main()). Used instead of
+        'preexec_fn' while the parent runs threads: it is not safe then, the child can deadlock before exec.
+        """
+        return [sys.executable, '-m', 'suproc.utils.limits', json.dumps(self.to_dict()), *argv]
+
+
+def main():
+    # Apply the limits (a JSON of ResourceLimits.to_dict()) and execute the command, as if by 'preexec_fn':
+    if len(sys.argv) < 3:
+        print('usage: python -m suproc.utils.limits LIMITS COMMAND [ARG...]', file=sys.stderr)
+        sys.exit(2)
+    ResourceLimits.from_dict(json.loads(sys.argv[1])).apply()
+    try:
+        os.execvp(sys.argv[2], sys.argv[2:])
+    except OSError as e:
+        print(f'{sys.argv[2]}: {e.strerror}', file=sys.stderr)
+        sys.exit(127)
+
+
+if __name__ == '__main__':
+    main()
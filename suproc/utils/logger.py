@@ -10,11 +10,12 @@ class Logger:
     _loggers = {}
 
     @classmethod
-    def get_logger(cls, name, path=None, formatter=None):
+    def get_logger(cls, name, path=None, formatter=None, stream=None, handler=None):
         if name not in cls._loggers:
             if formatter is None:
                 formatter = cls.AvaFormatter()
-            Logger._loggers[name] = (cls._create_logger(name, path=path, formatter=formatter), path)
+            Logger._loggers[name] = (cls._create_logger(name, path=path, formatter=formatter, stream=stream,
+                                                        handler=handler), path)
 
         logger, _path = Logger._loggers[name]
         if _path != path:
@@ -23,14 +24,16 @@ class Logger:
         return logger
 
     @staticmethod
-    def _create_logger(name, path=None, formatter=None):
+    def _create_logger(name, path=None, formatter=None, stream=None, handler=None):
         logger = logging.getLogger(name)
         logger.setLevel(logging.DEBUG)
 
-        # Log file:
-        if path is not None:
+        # Log file (or a stream or a handler that stands for it, e.g. a ring buffer or a log shipper):
+        if handler is None and stream is not None:
+            handler = logging.StreamHandler(stream)
+        elif handler is None and path is not None:
             handler = logging.FileHandler(filename=path)
-        else:
+        elif handler is None:
             handler = logging.StreamHandler(sys.stdout)
 
         # Set formatter:
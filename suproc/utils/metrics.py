@@ -0,0 +1,195 @@
+"""
+AVA Single Unique Process
+© AVA, 2025
+"""
+import os
+import re
+import time
+import fcntl
+
+METRIC_PREFIX = 'suproc_'
+FLUSH_INTERVAL = 10.0           # seconds between two flushes of a running process
+FAMILIES = {
+    'launches_total': ('counter', 'Sessions started by suproc.'),
+    'failures_total': ('counter', 'Runs that ended with a non-zero return code, by return code.'),
+    'restarts_total': ('counter', 'Runs that stopped a running instance first.'),
+    'output_lines_total': ('counter', 'Output lines relayed to the log.'),
+    'output_bytes_total': ('counter', 'Output bytes relayed to the log.'),
+    'suppressed_lines_total': ('counter', 'Output lines dropped by the rate limit.'),
+    'suppressed_bytes_total': ('counter', 'Output bytes dropped by the rate limit.'),
+    'repeated_lines_total': ('counter', 'Repeated output lines collapsed into one.'),
+    'timeouts_total': ('counter', 'Commands stopped by their timeout or the session deadline.'),
+    'queued_total': ('counter', 'Runs queued for the running instance.'),
+    'skipped_runs_total': ('counter', 'Scheduled runs not started because the previous run was running or they '
+                                      'were missed, by reason.'),
+    'shipped_records_total': ('counter', 'Log records sent to the collector.'),
+    'ship_dropped_total': ('counter', 'Log records dropped because the spill file of the shipper was full.'),
+    'ship_backlog': ('gauge', 'Log records waiting to be sent to the collector.'),
+    'stop_seconds': ('summary', 'Time from the stop signal to the exit of the process.'),
+}
+_SAMPLE_RE = re.compile(r'^(' + METRIC_PREFIX + r'[a-zA-Z0-9_]+)(\{.*\})? (\S+)$')
+_UNSAFE_RE = re.compile(r'[^a-zA-Z0-9_.-]')
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _family_of(metric: str) -> str:
+    for suffix in ('_sum', '_count'):
+        if metric.endswith(suffix) and metric[:-len(suffix)] in FAMILIES:
+            return metric[:-len(suffix)]
+    return metric
+
+
+class MetricsStore:
+    """
+    Node-exporter textfile metrics: one '.prom' file per process name. Files are updated under a file lock by
+    read-modify-write and atomically replaced, so the collector never reads a partial file.
+    """
+    def __init__(self, metrics_dir: str):
+        self.metrics_dir = metrics_dir
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.metrics_dir, f'{METRIC_PREFIX}{_UNSAFE_RE.sub("_", name)}.prom')
+
+    @staticmethod
+    def _parse(text: str) -> dict:
+        samples = {}
+        for line in text.splitlines():
+            match = _SAMPLE_RE.match(line)
+            if match:
+                metric, labels, value = match.groups()
+                samples[(metric[len(METRIC_PREFIX):], labels or '')] = float(value)
+        return samples
+
+    @staticmethod
+    def _format(samples: dict) -> str:
+        lines = []
+        last_family = None
+        for (metric, labels), value in sorted(samples.items(), key=lambda item: (_family_of(item[0][0]), item[0])):
+            family = _family_of(metric)
+            if family != last_family and family in FAMILIES:
+                kind, help_text = FAMILIES[family]
+                lines.append(f'# HELP {METRIC_PREFIX}{family} {help_text}')
+                lines.append(f'# TYPE {METRIC_PREFIX}{family} {kind}')
+            last_family = family
+            value = int(value) if float(value).is_integer() else value
+            lines.append(f'{METRIC_PREFIX}{metric}{labels} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def update(self, name: str, deltas: dict):
+        """
+        Adds the deltas {(metric, labels): value} to the metrics of the process 'name'.
+        """
+        if not deltas:
+            return
+        os.makedirs(self.metrics_dir, exist_ok=True)
+        path = self.path(name)
+        with open(os.path.join(self.metrics_dir, f'.{os.path.basename(path)}.lock'), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                with open(path, 'r') as f:
+                    samples = self._parse(f.read())
+            except FileNotFoundError:
+                samples = {}
+            for key, value in deltas.items():
+                samples[key] = samples.get(key, 0) + value
+            tmp_path = f'{path}.{os.getpid()}.tmp'       # node-exporter ignores files without '.prom'
+            with open(tmp_path, 'w') as f:
+                f.write(self._format(samples))
+            os.replace(tmp_path, path)
+
+    def read_all(self) -> str:
+        """
+        Returns the metrics of all processes in the text exposition format.
+        """
+        samples = {}
+        try:
+            entries = sorted(e.path for e in os.scandir(self.metrics_dir)
+                             if e.name.startswith(METRIC_PREFIX) and e.name.endswith('.prom'))
+        except FileNotFoundError:
+            return ''
+        for path in entries:
+            try:
+                with open(path, 'r') as f:
+                    samples.update(self._parse(f.read()))
+            except OSError:
+                continue
+        return self._format(samples) if samples else ''
+
+
+class ProcessMetrics:
+    """
+    Metrics of one suproc process. Counters are plain integers updated without locks and flushed to the store
+    at most once per 'flush_interval' seconds and at the end of the run.
+    """
+    def __init__(self, name: str, metrics_dir: str, flush_interval: float = FLUSH_INTERVAL):
+        self.name = name
+        self.store = MetricsStore(metrics_dir)
+        self.flush_interval = flush_interval
+        self._labels = f'{{name="{_escape(name)}"}}'
+        self._deltas = {}
+        self.output_lines = 0
+        self.output_bytes = 0
+        self._next_flush = time.monotonic() + flush_interval
+
+    def inc(self, metric: str, value=1, **labels):
+        if labels:
+            extra = ','.join(f'{k}="{_escape(v)}"' for k, v in sorted(labels.items()))
+            key = (metric, f'{self._labels[:-1]},{extra}}}')
+        else:
+            key = (metric, self._labels)
+        self._deltas[key] = self._deltas.get(key, 0) + value
+
+    def observe(self, metric: str, value: float):
+        self.inc(f'{metric}_sum', value)
+        self.inc(f'{metric}_count')
+
+    def output(self, lines: int, size: int):
+        # Called by the relay for every block of output:
+        self.output_lines += lines
+        self.output_bytes += size
+        if time.monotonic() >= self._next_flush:
+            self.flush()
+
+    def flush(self):
+        if self.output_lines:
+            self.inc('output_lines_total', self.output_lines)
+            self.inc('output_bytes_total', self.output_bytes)
+            self.output_lines = self.output_bytes = 0
+        deltas, self._deltas = self._deltas, {}
+        self._next_flush = time.monotonic() + self.flush_interval
+        try:
+            self.store.update(self.name, deltas)
+        except OSError:
+            pass
+
+
+def serve_metrics(metrics_dir: str, port: int, host: str = '127.0.0.1'):
+    """
+    Serves the metrics of all processes over HTTP at 'http://host:port/metrics' until interrupted.
+    """
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+    store = MetricsStore(metrics_dir)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = store.read_all().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
@@ -0,0 +1,64 @@
+"""
+AVA Single Unique Process
+© AVA, 2025
+"""
+import os
+import stat
+import errno
+import ctypes
+
+FIFO_EXT = '.fifo'
+PIPELINE_VALUES = ('fifo', 'tee')       # '--stdout' values that send the output to the FIFO of the process
+
+_libc = None
+
+
+def fifo_path(pid_dir: str, name: str) -> str:
+    """
+    Returns the path of the FIFO that carries the output of the process 'name' to 'run --stdin-from <name>'.
+    """
+    return str(os.path.join(pid_dir, name + FIFO_EXT))
+
+
+def open_fifo(path: str, flags: int) -> int:
+    """
+    Creates the FIFO if it does not exist and opens it. Like a pipe, opening blocks until the other side opens it.
+    """
+    try:
+        os.mkfifo(path, 0o600)
+    except FileExistsError:
+        if not stat.S_ISFIFO(os.stat(path).st_mode):
+            raise OSError(errno.EEXIST, f"Not a FIFO: '{path}'")
+    return os.open(path, flags | os.O_CLOEXEC)
+
+
+def _load_libc():
+    global _libc
+    if _libc is None:
+        libc = ctypes.CDLL(None, use_errno=True)
+        if hasattr(libc, 'tee'):
+            libc.tee.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_size_t, ctypes.c_uint]
+            libc.tee.restype = ctypes.c_ssize_t
+        _libc = libc
+    return _libc
+
+
+def tee(fd_in: int, fd_out: int, size: int) -> int:
+    """
+    Duplicates up to 'size' bytes from the pipe 'fd_in' to the pipe 'fd_out' without consuming them (tee(2)):
+    the data is not copied to user space. Returns the number of duplicated bytes, 0 at the end of the input.
+    """
+    libc = _load_libc()
+    if not hasattr(libc, 'tee'):
+        raise OSError(errno.ENOSYS, 'tee(2) is not available')
+    n = libc.tee(fd_in, fd_out, size, 0)
+    if n < 0:
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err))
+    return n
+
+
+def write_all(fd: int, data: bytes):
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
@@ -0,0 +1,451 @@
+"""
+AVA Single Unique Process
+© AVA, 2025
+"""
+import os
+import re
+import time
+import errno
+import ctypes
+import ctypes.util
+import socket
+import struct
+import selectors
+import subprocess
+
+PROBE_KINDS = ('tcp', 'unix', 'log', 'file', 'cmd')
+RETRY_MIN = 0.05                # seconds before a failed probe is retried, doubled up to RETRY_MAX
+RETRY_MAX = 1.0
+POLL_INTERVAL = 0.25            # used instead of inotify where it is not available
+
+# inotify(7) events:
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT = struct.Struct('iIII')
+
+
+class Inotify:
+    """
+    A minimal inotify(7) binding: watches paths and returns their events without polling the filesystem.
+    """
+    def __init__(self):
+        libc_name = ctypes.util.find_library('c') or None
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.paths = {}         # wd -> path
+
+    @classmethod
+    def create(cls):
+        """
+        Returns an Inotify instance or None if inotify is not available.
+        """
+        try:
+            return cls()
+        except (OSError, AttributeError):
+            return None
+
+    def fileno(self):
+        return self._fd
+
+    def add_watch(self, path: str, mask: int) -> int:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f'inotify_add_watch: {os.strerror(err)}', path)
+        self.paths[wd] = path
+        return wd
+
+    def rm_watch(self, wd: int):
+        if self.paths.pop(wd, None) is not None:
+            self._libc.inotify_rm_watch(self._fd, wd)
+
+    def read(self) -> list:
+        """
+        Returns the pending events as a list of (wd, mask, name).
+        """
+        events = []
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, size = _EVENT.unpack_from(data, offset)
+                offset += _EVENT.size
+                name = data[offset:offset + size].rstrip(b'\0').decode(errors='replace')
+                offset += size
+                events.append((wd, mask, name))
+        return events
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def parse_probe(spec: str) -> tuple:
+    """
+    Parses a readiness probe: 'tcp:[HOST:]PORT', 'unix:PATH', 'log:REGEX', 'file:PATH' or 'cmd:COMMAND'.
+
+    Returns:
+        tuple: (kind, argument)
+    """
+    kind, sep, arg = spec.partition(':')
+    if not sep or kind not in PROBE_KINDS or not arg:
+        raise ValueError(f"Invalid readiness probe: '{spec}'. Use one of: {', '.join(k + ':...' for k in PROBE_KINDS)}")
+    if kind == 'tcp':
+        host, _, port = arg.rpartition(':')
+        if not port.isdigit():
+            raise ValueError(f"Invalid port in the readiness probe: '{spec}'")
+        arg = (host.strip('[]') or 'localhost', int(port))
+    elif kind == 'log':
+        try:
+            arg = re.compile(arg.encode())
+        except re.error as e:
+            raise ValueError(f"Invalid regex in the readiness probe '{spec}': {e}")
+    return kind, arg
+
+
+class _Probe:
+    def __init__(self, spec: str):
+        self.spec = spec
+        self.ready = False
+        self.wakeup = None          # monotonic time of the next timer call
+        self._delay = RETRY_MIN
+
+    def retry(self, loop):
+        self.wakeup = time.monotonic() + self._delay
+        self._delay = min(self._delay * 2, RETRY_MAX)
+
+    def start(self, loop):
+        raise NotImplementedError
+
+    def on_timer(self, loop):
+        self.wakeup = None
+        self.start(loop)
+
+    def on_io(self, loop, key):
+        pass
+
+    def on_fs(self, loop, mask, name):
+        pass
+
+    def close(self, loop):
+        pass
+
+
+class _ConnectProbe(_Probe):
+    def __init__(self, spec, family, address):
+        super().__init__(spec)
+        self.family = family
+        self.address = address
+        self._sock = None
+        self._addresses = []
+
+    def start(self, loop):
+        if self.family == socket.AF_UNIX and not os.path.exists(self.address):
+            if not loop.watch(self, os.path.dirname(os.path.abspath(self.address)), IN_CREATE | IN_MOVED_TO):
+                self.retry(loop)
+            return
+        # Every address of the host is tried ('localhost' may resolve to '::1' first for an IPv4 only service):
+        try:
+            self._addresses = [(self.family, self.address)] if self.family == socket.AF_UNIX else \
+                [(info[0], info[4]) for info in socket.getaddrinfo(*self.address, type=socket.SOCK_STREAM)]
+        except socket.gaierror:
+            self.retry(loop)
+            return
+        self._connect_next(loop)
+
+    def _connect_next(self, loop):
+        while self._addresses:
+            family, address = self._addresses.pop(0)
+            try:
+                self._sock = socket.socket(family, socket.SOCK_STREAM)
+            except OSError:
+                continue                # e.g. IPv6 is disabled
+            self._sock.setblocking(False)
+            err = self._sock.connect_ex(address)
+            if err in (errno.EINPROGRESS, errno.EAGAIN, errno.EWOULDBLOCK):
+                loop.selector.register(self._sock, selectors.EVENT_WRITE, self)
+                return
+            self._sock.close()
+            self._sock = None
+            if err == 0:
+                self.ready = True
+                return
+        self.retry(loop)
+
+    def on_io(self, loop, key):
+        loop.selector.unregister(self._sock)
+        self._done(loop, self._sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0)
+
+    def on_fs(self, loop, mask, name):
+        if os.path.exists(self.address):
+            loop.unwatch(self)
+            self.start(loop)
+
+    def _done(self, loop, connected: bool):
+        self._sock.close()
+        self._sock = None
+        if connected:
+            self.ready = True
+        else:
+            self._connect_next(loop)
+
+    def close(self, loop):
+        if self._sock is not None:
+            if self._sock.fileno() in loop.selector.get_map():
+                loop.selector.unregister(self._sock)
+            self._sock.close()
+
+
+class _FileProbe(_Probe):
+    def __init__(self, spec, path):
+        super().__init__(spec)
+        self.path = os.path.abspath(path)
+
+    def start(self, loop):
+        if os.path.exists(self.path):
+            self.ready = True
+        elif not loop.watch(self, os.path.dirname(self.path), IN_CREATE | IN_MOVED_TO | IN_CLOSE_WRITE):
+            self.wakeup = time.monotonic() + POLL_INTERVAL
+
+    def on_fs(self, loop, mask, name):
+        if os.path.exists(self.path):
+            self.ready = True
+
+
+class _LogProbe(_Probe):
+    def __init__(self, spec, regex, path, offset):
+        super().__init__(spec)
+        self.regex = regex
+        self.path = path
+        self.offset = offset
+        self._carry = b''
+        self._watched = False
+
+    def start(self, loop):
+        self._scan()
+        if self.ready:
+            return
+        if not self._watched:
+            self._watched = loop.watch(self, self.path, IN_MODIFY) if os.path.exists(self.path) else \
+                loop.watch(self, os.path.dirname(self.path), IN_CREATE | IN_MODIFY)
+        # Also scan periodically in case inotify is not available or the log is recreated:
+        self.wakeup = time.monotonic() + (RETRY_MAX if self._watched else POLL_INTERVAL)
+
+    def on_fs(self, loop, mask, name):
+        self._scan()
+
+    def _scan(self):
+        try:
+            with open(self.path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size < self.offset:
+                    self.offset = 0         # the log has been cleared
+                f.seek(self.offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        self.offset += len(data)
+        lines = (self._carry + data).split(b'\n')
+        self._carry = lines.pop()[-64 * 1024:]
+        if any(self.regex.search(line) for line in lines):
+            self.ready = True
+
+
+class _CmdProbe(_Probe):
+    def __init__(self, spec, cmd):
+        super().__init__(spec)
+        self.cmd = cmd
+        self._process = None
+        self._pidfd = None
+
+    def start(self, loop):
+        self._process = subprocess.Popen(self.cmd, shell=True, stdin=subprocess.DEVNULL,
+                                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            self._pidfd = os.pidfd_open(self._process.pid)
+            loop.selector.register(self._pidfd, selectors.EVENT_READ, self)
+        except (AttributeError, OSError):
+            self._pidfd = None
+            self.wakeup = time.monotonic() + RETRY_MIN
+
+    def on_timer(self, loop):
+        self.wakeup = None
+        if self._process is None:
+            self.start(loop)
+        elif self._process.poll() is None:
+            self.wakeup = time.monotonic() + RETRY_MIN
+        else:
+            self._finish(loop)
+
+    def on_io(self, loop, key):
+        self._process.wait()
+        self._finish(loop)
+
+    def _finish(self, loop):
+        if self._pidfd is not None:
+            loop.selector.unregister(self._pidfd)
+            os.close(self._pidfd)
+            self._pidfd = None
+        returncode, self._process = self._process.returncode, None
+        if returncode == 0:
+            self.ready = True
+        else:
+            self.retry(loop)
+
+    def close(self, loop):
+        if self._process is not None and self._process.poll() is None:
+            self._process.kill()
+            self._process.wait()
+        if self._pidfd is not None:
+            loop.selector.unregister(self._pidfd)
+            os.close(self._pidfd)
+
+
+class _ProcessWatch:
+    # Wakes up the loop when the watched process exits
+    def __init__(self, pid):
+        self.pid = pid
+        self.exited = False
+
+    def on_io(self, loop, key):
+        self.exited = True
+
+
+class ProbeLoop:
+    """
+    Waits until all readiness probes succeed. Sockets are connected without blocking, files and logs are watched
+    with inotify, commands and the process itself are watched with pidfds, so the loop sleeps between events.
+    """
+    def __init__(self, specs: list, log_path: str = None, log_offset: int = 0, pid: int = None):
+        self.selector = selectors.DefaultSelector()
+        self.inotify = Inotify.create()
+        self._watches = {}          # wd -> [probe]
+        self._pidfd = None
+        self.process = None
+        self.probes = []
+        for spec in specs:
+            kind, arg = parse_probe(spec)
+            if kind == 'tcp':
+                self.probes.append(_ConnectProbe(spec, socket.AF_INET, arg))
+            elif kind == 'unix':
+                self.probes.append(_ConnectProbe(spec, socket.AF_UNIX, arg))
+            elif kind == 'file':
+                self.probes.append(_FileProbe(spec, arg))
+            elif kind == 'log':
+                if log_path is None:
+                    raise ValueError(f"The readiness probe '{spec}' requires a log file")
+                self.probes.append(_LogProbe(spec, arg, log_path, log_offset))
+            else:
+                self.probes.append(_CmdProbe(spec, arg))
+
+        if self.inotify is not None:
+            self.selector.register(self.inotify, selectors.EVENT_READ, self)
+        if pid is not None:
+            self.process = _ProcessWatch(pid)
+            try:
+                self._pidfd = os.pidfd_open(pid)
+                self.selector.register(self._pidfd, selectors.EVENT_READ, self.process)
+            except (AttributeError, OSError):
+                self._pidfd = None
+
+    def watch(self, probe, path: str, mask: int) -> bool:
+        if self.inotify is None:
+            return False
+        try:
+            wd = self.inotify.add_watch(path, mask)
+        except OSError:
+            return False
+        self._watches.setdefault(wd, []).append(probe)
+        return True
+
+    def unwatch(self, probe):
+        for wd, probes in list(self._watches.items()):
+            if probe in probes:
+                probes.remove(probe)
+                if not probes:
+                    del self._watches[wd]
+                    self.inotify.rm_watch(wd)
+
+    def on_io(self, loop, key):
+        for wd, mask, name in self.inotify.read():
+            for probe in list(self._watches.get(wd, [])):
+                if not probe.ready:
+                    probe.on_fs(self, mask, name)
+
+    def _process_alive(self) -> bool:
+        if self.process is None:
+            return True
+        if self._pidfd is None:
+            try:
+                os.kill(self.process.pid, 0)
+            except ProcessLookupError:
+                self.process.exited = True
+        return not self.process.exited
+
+    def pending(self) -> list:
+        return [probe.spec for probe in self.probes if not probe.ready]
+
+    def run(self, timeout: float) -> str:
+        """
+        Returns:
+            str: 'ready' if all probes succeeded, 'timeout' or 'exited' if the process exited before.
+        """
+        deadline = time.monotonic() + timeout
+        try:
+            for probe in self.probes:
+                probe.start(self)
+            while True:
+                if all(probe.ready for probe in self.probes):
+                    return 'ready'
+                if not self._process_alive():
+                    return 'exited'
+                now = time.monotonic()
+                if now >= deadline:
+                    return 'timeout'
+
+                wakeups = [p.wakeup for p in self.probes if not p.ready and p.wakeup is not None] + [deadline]
+                if self._pidfd is None and self.process is not None:
+                    wakeups.append(now + POLL_INTERVAL)
+                for key, _ in self.selector.select(max(0.0, min(wakeups) - now)):
+                    key.data.on_io(self, key)
+
+                now = time.monotonic()
+                for probe in self.probes:
+                    if not probe.ready and probe.wakeup is not None and probe.wakeup <= now:
+                        probe.on_timer(self)
+        finally:
+            self.close()
+
+    def close(self):
+        for probe in self.probes:
+            probe.close(self)
+        if self._pidfd is not None:
+            os.close(self._pidfd)
+            self._pidfd = None
+        if self.inotify is not None:
+            self.inotify.close()
+        self.selector.close()
+
+
+def wait_ready(specs: list, timeout: float, log_path: str = None, log_offset: int = 0, pid: int = None):
+    """
+    Waits until all readiness probes succeed, the timeout expires or the process 'pid' exits.
+
+    Returns:
+        tuple: (status, pending probes) where the status is 'ready', 'timeout' or 'exited'.
+    """
+    loop = ProbeLoop(specs, log_path=log_path, log_offset=log_offset, pid=pid)
+    status = loop.run(timeout)
+    return status, loop.pending()
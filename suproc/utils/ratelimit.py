@@ -0,0 +1,192 @@
+"""
+AVA Single Unique Process
+© AVA, 2025
+"""
+import time
+
+MARK_INTERVAL = 5.0             # seconds between two "N lines suppressed" markers of a flood
+BURST = 1.0                     # seconds of the rate a bucket holds
+_KEYS = ('lines', 'bytes', 'burst', 'sample')
+_SIZE_UNITS = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+
+def parse_rate_limit(value: str) -> dict:
+    """
+    Parses an output rate limit like 'lines=1000,bytes=1M,burst=5,sample=100' into a dict. 'lines' and 'bytes'
+    are per second, 'burst' is the number of seconds of the rate that may be output at once and 'sample' keeps
+    one of N lines over the limit instead of dropping all of them.
+    """
+    limit = {}
+    for part in value.split(','):
+        if not part.strip():
+            continue
+        key, sep, number = part.partition('=')
+        key = key.strip().lower()
+        number = number.strip()
+        if not sep or key not in _KEYS or not number:
+            raise ValueError(f"Invalid rate limit: '{part}'. Use {', '.join(k + '=N' for k in _KEYS)}")
+        if key == 'bytes' and number[-1].upper() in _SIZE_UNITS:
+            limit[key] = float(number[:-1]) * _SIZE_UNITS[number[-1].upper()]
+        else:
+            limit[key] = float(number)
+        if limit[key] <= 0:
+            raise ValueError(f"Invalid rate limit: '{part}'. The value must be positive")
+    if 'lines' not in limit and 'bytes' not in limit:
+        raise ValueError(f"Invalid rate limit: '{value}'. Set 'lines' and/or 'bytes' per second")
+    return limit
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float = BURST):
+        self.rate = rate
+        self.capacity = max(rate * burst, 1.0)
+        self.tokens = self.capacity
+        self._last = time.monotonic()
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+
+
+class OutputLimiter:
+    """
+    Bounds the output written to the log: lines over the token buckets of lines/sec and bytes/sec are dropped
+    (or sampled) and runs of 2 or more repeats of a line are collapsed into a marker. Markers of dropped lines
+    are written at most once per 'mark_interval' seconds of a flood and at the end. report(lines, size, repeated)
+    is called with the counts accumulated since the last report at the same times, not per marker.
+    """
+    def __init__(self, lines_rate: float = None, bytes_rate: float = None, burst: float = BURST,
+                 sample: float = None, dedupe=False, report=None, mark_interval: float = MARK_INTERVAL):
+        self.lines = TokenBucket(lines_rate, burst) if lines_rate else None
+        self.bytes = TokenBucket(bytes_rate, burst) if bytes_rate else None
+        self.sample = int(sample) if sample else 0
+        self.dedupe = dedupe
+        self.report = report
+        self.mark_interval = mark_interval
+        self.suppressed_lines = 0           # totals
+        self.suppressed_bytes = 0
+        self.repeated_lines = 0
+        self._dropped = 0                   # since the last marker
+        self._dropped_bytes = 0
+        self._sampled = 0
+        self._last_line = None
+        self._repeats = 0
+        self._unreported_repeats = 0        # collapsed lines not reported yet
+        self._next_mark = 0.0
+
+    @classmethod
+    def create(cls, rate_limit: dict = None, dedupe=False, report=None):
+        if not rate_limit and not dedupe:
+            return None
+        rate_limit = rate_limit or {}
+        return cls(lines_rate=rate_limit.get('lines'), bytes_rate=rate_limit.get('bytes'),
+                   burst=rate_limit.get('burst', BURST), sample=rate_limit.get('sample'), dedupe=dedupe, report=report)
+
+    def _collapse(self, lines: list) -> list:
+        kept = []
+        for line in lines:
+            if line == self._last_line:
+                self._repeats += 1
+                continue
+            if self._repeats:
+                kept.append(self._end_repeats())
+            self._last_line = line
+            kept.append(line)
+        return kept
+
+    def _end_repeats(self) -> bytes:
+        # A single repeat is kept as it is, a marker would be longer than the line:
+        repeats, self._repeats = self._repeats, 0
+        if repeats == 1:
+            return self._last_line
+        self.repeated_lines += repeats
+        self._unreported_repeats += repeats
+        return f'[suproc] last line repeated {repeats} times'.encode()
+
+    def _report_repeats(self):
+        if self._unreported_repeats:
+            self._report(0, 0, self._unreported_repeats)
+            self._unreported_repeats = 0
+
+    def _limit(self, lines: list, out: list):
+        size = sum(len(line) for line in lines)
+        lines_ok = self.lines is None or self.lines.tokens >= len(lines)
+        if lines_ok and (self.bytes is None or self.bytes.tokens >= size):
+            # Fast path: the whole block fits into the buckets:
+            if self.lines is not None:
+                self.lines.tokens -= len(lines)
+            if self.bytes is not None:
+                self.bytes.tokens -= size
+            out.extend(lines)
+            return
+
+        for line in lines:
+            if (self.lines is None or self.lines.tokens >= 1) and \
+                    (self.bytes is None or self.bytes.tokens >= len(line)):
+                if self.lines is not None:
+                    self.lines.tokens -= 1
+                if self.bytes is not None:
+                    self.bytes.tokens -= len(line)
+                out.append(line)
+                continue
+            self._sampled += 1
+            if self.sample and self._sampled % self.sample == 0:
+                out.append(line)
+                continue
+            self._dropped += 1
+            self._dropped_bytes += len(line)
+
+    def _drop_marker(self) -> bytes:
+        marker = (f'[suproc] {self._dropped} lines ({self._dropped_bytes} bytes) suppressed'
+                  f' by the rate limit').encode()
+        self.suppressed_lines += self._dropped
+        self.suppressed_bytes += self._dropped_bytes
+        self._report(self._dropped, self._dropped_bytes, 0)
+        self._dropped = self._dropped_bytes = 0
+        return marker
+
+    def _report(self, lines: int, size: int, repeated: int):
+        if self.report is not None:
+            self.report(lines, size, repeated)
+
+    def filter(self, lines: list) -> list:
+        """
+        Returns the lines of a block to be written, with markers of the suppressed lines.
+        """
+        if not lines:
+            return lines
+        now = time.monotonic()
+        if self.dedupe:
+            lines = self._collapse(lines)
+        out = []
+        if self.lines is not None or self.bytes is not None:
+            if self.lines is not None:
+                self.lines.refill(now)
+            if self.bytes is not None:
+                self.bytes.refill(now)
+            self._limit(lines, out)
+        else:
+            out = lines
+
+        # Periodic markers of an ongoing flood and the report of the collapsed lines:
+        if (self._dropped or self._repeats > 1 or self._unreported_repeats) and now >= self._next_mark:
+            self._next_mark = now + self.mark_interval
+            if self._repeats > 1:
+                out.append(self._end_repeats())
+            if self._dropped:
+                out.append(self._drop_marker())
+            self._report_repeats()
+        return out
+
+    def flush(self) -> list:
+        """
+        Returns the markers of the lines suppressed since the last marker (at the end of the output).
+        """
+        out = []
+        if self._repeats:
+            out.append(self._end_repeats())
+        if self._dropped:
+            out.append(self._drop_marker())
+        self._report_repeats()
+        self._last_line = None
+        return out
@@ -0,0 +1,292 @@
+"""
+AVA Single Unique Process
+© AVA, 2025
+"""
+import os
+import time
+import mmap
+import zlib
+import fcntl
+import struct
+
+REGISTRY_FILE = '__registry.mmap'
+MAGIC = b'SUPROCRG'
+VERSION = 1
+CAPACITY = 1024                 # records, open addressing by the hash of the name
+NAME_SIZE = 64
+HEADER = struct.Struct('<8sIII')                                # magic, version, record size, capacity
+HEADER_SIZE = 64
+SEQ = struct.Struct('<I')
+BODY = struct.Struct(f'<iBBHddiII{NAME_SIZE}sQ')                # see RegistryRecord
+_NAME_OFFSET = struct.calcsize('<iBBHddiII')
+RECORD_SIZE = 128               # SEQ + BODY + reserved bytes for new fields of later versions
+READ_RETRIES = 100
+
+STATE_NONE = 0
+STATE_RUNNING = 1
+STATE_EXITED = 2
+STATE_STOPPED = 3
+STATE_CRASHED = 4
+STATE_NAMES = {
+    STATE_NONE: '-',
+    STATE_RUNNING: 'running',
+    STATE_EXITED: 'exited',
+    STATE_STOPPED: 'stopped',
+    STATE_CRASHED: 'crashed',
+}
+
+
+class RegistryRecord:
+    """
+    The status of one process name in the registry.
+    """
+    __slots__ = ('name', 'pid', 'daemon', 'state', 'flags', 'start_time', 'exit_time', 'returncode', 'restarts',
+                 'launches', 'suppressed')
+
+    def __init__(self, name: str, pid=0, daemon=False, state=STATE_NONE, flags=0, start_time=0.0, exit_time=0.0,
+                 returncode=0, restarts=0, launches=0, suppressed=0):
+        self.name = name
+        self.pid = pid
+        self.daemon = daemon
+        self.state = state
+        self.flags = flags
+        self.start_time = start_time
+        self.exit_time = exit_time
+        self.returncode = returncode
+        self.restarts = restarts
+        self.launches = launches
+        self.suppressed = suppressed            # output lines of the session dropped by the rate limit
+
+    @property
+    def state_name(self) -> str:
+        return STATE_NAMES.get(self.state, '?')
+
+    @property
+    def running(self) -> bool:
+        return self.state == STATE_RUNNING
+
+    @classmethod
+    def unpack(cls, data: tuple):
+        pid, daemon, state, flags, start_time, exit_time, returncode, restarts, launches, name, suppressed = data
+        return cls(name.rstrip(b'\0').decode(), pid, bool(daemon), state, flags, start_time, exit_time, returncode,
+                   restarts, launches, suppressed)
+
+    def pack_into(self, buffer, offset: int):
+        BODY.pack_into(buffer, offset, self.pid, int(self.daemon), self.state, self.flags, self.start_time,
+                       self.exit_time, self.returncode, self.restarts, self.launches, self.name.encode(),
+                       self.suppressed)
+
+
+class StatusRegistry:
+    """
+    A table of fixed-size status records in a memory-mapped file of the PID directory: one record per process
+    name, found by hashing the name. Every record is guarded by a sequence lock: writers (holding a byte-range
+    lock of the record) make the sequence odd while they write, and readers retry until they see the same even
+    sequence before and after reading, so lookups take no locks and no syscalls.
+
+    The file is opened on first use. If it cannot be opened or the table is full, the methods do nothing and
+    lookups return None, so the caller falls back to the pidfiles.
+    """
+    def __init__(self, pid_dir: str):
+        self.path = os.path.join(pid_dir, REGISTRY_FILE)
+        self.created = False
+        self._fd = None
+        self._mm = None
+        self._opened = False
+
+    def _open(self):
+        size = HEADER_SIZE + CAPACITY * RECORD_SIZE
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        header = os.pread(self._fd, HEADER.size, 0)
+        if len(header) < HEADER.size or HEADER.unpack(header) != (MAGIC, VERSION, RECORD_SIZE, CAPACITY) \
+                or os.fstat(self._fd).st_size < size:
+            # Create the table or recreate it if its layout has changed:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                header = os.pread(self._fd, HEADER.size, 0)
+                if len(header) < HEADER.size or HEADER.unpack(header) != (MAGIC, VERSION, RECORD_SIZE, CAPACITY) \
+                        or os.fstat(self._fd).st_size < size:
+                    os.ftruncate(self._fd, 0)
+                    os.ftruncate(self._fd, size)
+                    os.pwrite(self._fd, HEADER.pack(MAGIC, VERSION, RECORD_SIZE, CAPACITY), 0)
+                    self.created = True
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._mm = mmap.mmap(self._fd, size)
+
+    def _mapped(self):
+        if not self._opened:
+            self._opened = True
+            try:
+                self._open()
+            except (OSError, ValueError):
+                self.close()
+        return self._mm
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def available(self) -> bool:
+        return self._mapped() is not None
+
+    @staticmethod
+    def _offset(slot: int) -> int:
+        return HEADER_SIZE + slot * RECORD_SIZE
+
+    def _read_slot(self, slot: int):
+        offset = self._offset(slot)
+        for _ in range(READ_RETRIES):
+            seq = SEQ.unpack_from(self._mm, offset)[0]
+            if seq & 1:
+                continue
+            data = BODY.unpack_from(self._mm, offset + SEQ.size)
+            if SEQ.unpack_from(self._mm, offset)[0] == seq:
+                return data
+        return None
+
+    def _find(self, name: bytes) -> tuple:
+        # Returns (slot, found): the slot of the name or the first empty slot of its probe sequence:
+        start = zlib.crc32(name) % CAPACITY
+        for i in range(CAPACITY):
+            slot = (start + i) % CAPACITY
+            offset = self._offset(slot) + SEQ.size + _NAME_OFFSET
+            stored = self._mm[offset:offset + NAME_SIZE].rstrip(b'\0')
+            if stored == name:
+                return slot, True
+            if not stored:
+                return slot, False
+        return None, False
+
+    def get(self, name: str):
+        """
+        Returns the RegistryRecord of the process 'name' or None if it has no record.
+        """
+        if self._mapped() is None:
+            return None
+        slot, found = self._find(name.encode())
+        if not found:
+            return None
+        data = self._read_slot(slot)
+        return RegistryRecord.unpack(data) if data is not None else None
+
+    def records(self) -> list:
+        """
+        Returns the records of all process names in the registry.
+        """
+        if self._mapped() is None:
+            return []
+        records = []
+        for slot in range(CAPACITY):
+            data = self._read_slot(slot)
+            if data is not None and data[9][:1] != b'\0':
+                records.append(RegistryRecord.unpack(data))
+        return records
+
+    def update(self, name: str, update, create=True) -> RegistryRecord or None:
+        """
+        Atomically updates the record of the process 'name': update(record) is called with the current record
+        (or a new empty one) and may change its fields. Returns the updated record. If 'create' is False, a name
+        without a record is left alone and None is returned.
+        """
+        if self._mapped() is None:
+            return None
+        encoded = name.encode()
+        if not encoded or len(encoded) > NAME_SIZE:
+            return None
+        try:
+            slot, found = self._find(encoded)
+            if not found and not create:
+                return None
+            if not found:
+                # Claim an empty slot under the lock of the whole table:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+                try:
+                    slot, found = self._find(encoded)
+                    if slot is None:
+                        return None
+                    if not found:
+                        self._write(slot, RegistryRecord(name))
+                finally:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+            elif slot is None:
+                return None
+
+            offset = self._offset(slot)
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, RECORD_SIZE, offset)
+            try:
+                record = RegistryRecord.unpack(BODY.unpack_from(self._mm, offset + SEQ.size))
+                update(record)
+                record.name = name
+                self._write(slot, record)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, RECORD_SIZE, offset)
+            return record
+        except OSError:
+            return None
+
+    def _write(self, slot: int, record: RegistryRecord):
+        offset = self._offset(slot)
+        seq = ((SEQ.unpack_from(self._mm, offset)[0] + 1) | 1) & 0xFFFFFFFF
+        SEQ.pack_into(self._mm, offset, seq)                      # odd: the record is being written
+        record.pack_into(self._mm, offset + SEQ.size)
+        SEQ.pack_into(self._mm, offset, (seq + 1) & 0xFFFFFFFF)
+
+    # Status changes of the process life cycle:
+    def started(self, name: str, pid: int, daemon: bool):
+        def _update(record):
+            record.pid = pid
+            record.daemon = daemon
+            record.state = STATE_RUNNING
+            record.start_time = time.time()
+            record.exit_time = 0.0
+            record.launches += 1
+            record.suppressed = 0
+        return self.update(name, _update)
+
+    def exited(self, name: str, pid: int, returncode: int):
+        def _update(record):
+            if record.pid == pid and record.state == STATE_RUNNING:
+                record.state = STATE_EXITED
+                record.exit_time = time.time()
+                record.returncode = returncode
+        return self.update(name, _update, create=False)       # a run that never started has no record
+
+    def stopped(self, name: str, pid: int):
+        def _update(record):
+            if record.pid == pid and record.state == STATE_RUNNING:
+                record.state = STATE_STOPPED
+                record.exit_time = time.time()
+        return self.update(name, _update, create=False)
+
+    def suppressed(self, name: str, pid: int, lines: int):
+        def _update(record):
+            if record.pid == pid:
+                record.suppressed += lines
+        return self.update(name, _update, create=False)
+
+    def restarted(self, name: str):
+        def _update(record):
+            record.restarts += 1
+        return self.update(name, _update)
+
+    def remove(self, name: str):
+        # The slot keeps the name, so the probe sequences of other names are not broken:
+        if self.get(name) is None:
+            return None
+
+        def _update(record):
+            record.pid = 0
+            record.state = STATE_NONE
+        return self.update(name, _update)
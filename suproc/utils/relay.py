@@ -0,0 +1,296 @@
+"""
+AVA Single Unique Process
+© AVA, 2025
+"""
+import os
+import time
+import errno
+import signal
+import logging
+import selectors
+import subprocess
+from collections import deque
+
+from suproc.utils.logger import Logger
+from suproc.utils.timeindex import LineClock, TimeIndex
+from suproc.utils.pipes import tee, write_all
+
+CHUNK_SIZE = 64 * 1024          # bytes read from a pipe at once
+MAX_LINE = 64 * 1024            # longer lines without a newline are split
+STDERR_LIMIT = 1024 * 1024      # bytes of stderr kept to be printed if the command fails
+ENCODING = 'utf-8'
+KILL_GRACE = 5.0                # seconds between SIGTERM and SIGKILL of a command over its time limit
+
+
+class LineSplitter:
+    """
+    Splits a byte stream into lines. The carry-over of an unfinished line is bounded by 'max_line' and carriage
+    return updates (progress bars) are collapsed to the last one, as a terminal would show them.
+    """
+    def __init__(self, max_line: int = MAX_LINE):
+        self.max_line = max_line
+        self._carry = b''
+
+    def feed(self, chunk: bytes) -> list:
+        data = self._carry + chunk if self._carry else chunk
+        lines = data.split(b'\n')
+        carry = lines.pop()
+
+        if b'\r' in data:
+            lines = [self._collapse(line) for line in lines]
+            if b'\r' in carry:
+                carry = carry[carry.rfind(b'\r', 0, len(carry) - 1) + 1:]
+        if len(carry) >= self.max_line:
+            lines.append(carry)
+            carry = b''
+        self._carry = carry
+        return lines
+
+    def flush(self) -> list:
+        carry, self._carry = self._carry, b''
+        return [self._collapse(carry)] if carry else []
+
+    @staticmethod
+    def _collapse(line: bytes) -> bytes:
+        line = line.rstrip(b'\r')
+        return line[line.rfind(b'\r') + 1:]
+
+
+def _iter_handlers(logger):
+    # The same handlers that logger.debug() would call:
+    while logger is not None:
+        yield from logger.handlers
+        if not logger.propagate:
+            break
+        logger = logger.parent
+
+
+class LogSink:
+    """
+    Writes blocks of output lines to the handlers of a logger in bulk: one decode and one write per block instead of
+    a log record per line. Handlers with an emit_lines() method (see ShipHandler) get the blocks as they are, and
+    other handlers that do not use the package formatter fall back to logger.debug().
+    """
+    def __init__(self, logger, clock: LineClock = None, index: TimeIndex = None):
+        self.logger = logger
+        self.clock = clock
+        self.index = index
+        self._bulk = []
+        self._lines = []
+        self._fallback = []
+        self._file_stream = None
+
+        if not logger.isEnabledFor(logging.DEBUG):
+            return
+        colors = Logger.AvaFormatter.COLORS
+        for handler in _iter_handlers(logger):
+            if handler.level > logging.DEBUG:
+                continue
+            if hasattr(handler, 'emit_lines'):
+                self._lines.append(handler)
+            elif isinstance(handler, logging.StreamHandler) and isinstance(handler.formatter, Logger.AvaFormatter):
+                self._bulk.append((handler, colors[logging.DEBUG].encode(), colors['RESET'].encode()))
+                if self._file_stream is None and isinstance(handler, logging.FileHandler):
+                    self._file_stream = handler.stream
+            else:
+                self._fallback.append(handler)
+
+    @property
+    def file_stream(self):
+        return self._file_stream
+
+    def write(self, lines: list):
+        if not lines:
+            return
+        t = None
+        head = b''
+        if self.clock is not None:
+            t = self.clock.now()
+            head = self.clock.stamp(t).encode() + b' '
+
+        for handler, prefix, suffix in self._bulk:
+            prefix += head
+            block = prefix + (suffix + b'\n' + prefix).join(lines) + suffix + b'\n'
+            handler.acquire()
+            try:
+                handler.stream.write(block.decode(ENCODING, 'replace'))
+                handler.flush()
+            finally:
+                handler.release()
+
+        for handler in self._lines:
+            handler.emit_lines(lines, t)
+
+        if self._fallback:
+            head = head.decode()
+            for line in lines:
+                record = self.logger.makeRecord(self.logger.name, logging.DEBUG, '', 0,
+                                                head + line.decode(ENCODING, 'replace'), None, None)
+                for handler in self._fallback:
+                    if record.levelno >= handler.level:
+                        handler.handle(record)
+
+        if self.index is not None and self._file_stream is not None:
+            self.index.mark(t if t is not None else time.time(), self._file_stream)
+
+
+def signal_group(process, sig):
+    """
+    Sends a signal to the process group of the command if it leads one (started with start_new_session), so the
+    processes it has started get it too. Otherwise, only to the command.
+    """
+    try:
+        if os.getpgid(process.pid) == process.pid:
+            os.killpg(process.pid, sig)
+            return
+    except ProcessLookupError:
+        return
+    except OSError:
+        pass
+    process.send_signal(sig)
+
+
+class KillTimer:
+    """
+    The time limit of a running command, checked by the wait of OutputRelay.run(). When the deadline passes,
+    SIGTERM is sent to the process group of the command, and SIGKILL if it is still running 'grace' seconds later.
+    If the pipes are still open 'grace' seconds after SIGKILL (held by processes that left the group), the relay
+    stops reading them.
+
+    Args:
+        deadline (float): The time.monotonic() time of the limit.
+        grace (float): Seconds between the signals.
+    """
+    def __init__(self, deadline: float, grace: float = KILL_GRACE):
+        self.deadline = deadline
+        self.grace = grace
+        self.expired = False            # SIGTERM has been sent
+        self.killed = False             # SIGKILL has been sent
+        self.abandoned = False          # the pipes are not read anymore
+
+    def remaining(self):
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.monotonic(), 0.0)
+
+    def check(self, process) -> bool:
+        """
+        Sends the next signal if the deadline has passed. Returns True if it has.
+        """
+        if self.deadline is None or time.monotonic() < self.deadline:
+            return False
+        if not self.expired:
+            self.expired = True
+            signal_group(process, signal.SIGTERM)
+        elif not self.killed:
+            self.killed = True
+            signal_group(process, signal.SIGKILL)
+        else:
+            self.abandoned = True
+            self.deadline = None
+            return True
+        self.deadline = time.monotonic() + self.grace
+        return True
+
+
+class OutputRelay:
+    """
+    Relays the output of a child process: reads large binary chunks from its pipes with os.read(), splits lines
+    itself and writes them to the sink in bulk. Stderr is kept in a bounded buffer to be reported on failure.
+
+    If 'tee_fd' (a pipe or a FIFO) is given, stdout is also duplicated into it with tee(2) before it is read, or
+    copied if tee(2) is not supported. A closed reader stops the duplication and sets 'tee_error'.
+    """
+    def __init__(self, sink: LogSink, chunk_size: int = CHUNK_SIZE, max_line: int = MAX_LINE,
+                 stderr_limit: int = STDERR_LIMIT, metrics=None, tee_fd: int = None, limiter=None):
+        self.sink = sink
+        self.metrics = metrics
+        self.limiter = limiter
+        self.tee_fd = tee_fd
+        self.tee_error = None
+        self._tee_copy = False
+        self.chunk_size = chunk_size
+        self.max_line = max_line
+        self.stderr_limit = stderr_limit
+        self._stderr = deque()
+        self._stderr_size = 0
+        self.stderr_dropped = 0
+
+    def _keep_stderr(self, lines: list):
+        for line in lines:
+            self._stderr.append(line)
+            self._stderr_size += len(line)
+        while self._stderr_size > self.stderr_limit and len(self._stderr) > 1:
+            self._stderr_size -= len(self._stderr.popleft())
+            self.stderr_dropped += 1
+
+    def stderr_lines(self) -> list:
+        return [line.decode(ENCODING, 'replace') for line in self._stderr]
+
+    def _tee(self, fd: int) -> int:
+        # Duplicates the pending data into 'tee_fd' and returns the number of bytes to read:
+        if self._tee_copy:
+            return self.chunk_size
+        try:
+            return tee(fd, self.tee_fd, self.chunk_size) or self.chunk_size
+        except OSError as e:
+            if e.errno in (errno.EINVAL, errno.ENOSYS):
+                self._tee_copy = True           # e.g. 'tee_fd' is not a pipe
+            else:
+                self.tee_error = e
+                self.tee_fd = None
+            return self.chunk_size
+
+    def _tee_write(self, chunk: bytes):
+        try:
+            write_all(self.tee_fd, chunk)
+        except OSError as e:
+            self.tee_error = e
+            self.tee_fd = None
+
+    def run(self, process, timer: KillTimer = None):
+        """
+        Relays the output until both pipes are closed and waits for the process. If a 'timer' is given, its
+        deadline is the timeout of the waits, so the command is signaled in time without a timer thread.
+
+        Returns:
+            int: The return code of the process.
+        """
+        stdout_fd = process.stdout.fileno() if process.stdout is not None else None
+        with selectors.DefaultSelector() as selector:
+            if process.stdout is not None:
+                selector.register(process.stdout.fileno(), selectors.EVENT_READ,
+                                  (LineSplitter(self.max_line), self.sink.write, self.metrics, self.limiter))
+            if process.stderr is not None:
+                selector.register(process.stderr.fileno(), selectors.EVENT_READ,
+                                  (LineSplitter(self.max_line), self._keep_stderr, None, None))
+
+            while selector.get_map():
+                events = selector.select(timer.remaining() if timer is not None else None)
+                if timer is not None and timer.check(process) and timer.abandoned:
+                    break
+                for key, _ in events:
+                    splitter, write, metrics, limiter = key.data
+                    if key.fd == stdout_fd and self.tee_fd is not None:
+                        chunk = os.read(key.fd, self._tee(key.fd))
+                        if self._tee_copy and self.tee_fd is not None and chunk:
+                            self._tee_write(chunk)
+                    else:
+                        chunk = os.read(key.fd, self.chunk_size)
+                    if chunk:
+                        lines = splitter.feed(chunk)
+                        if metrics is not None:
+                            metrics.output(len(lines), len(chunk))
+                        write(lines if limiter is None else limiter.filter(lines))
+                    else:
+                        lines = splitter.flush()
+                        write(lines if limiter is None else limiter.filter(lines) + limiter.flush())
+                        selector.unregister(key.fd)
+
+        # The pipes may be closed before the process exits:
+        while timer is not None:
+            try:
+                return process.wait(timer.remaining())
+            except subprocess.TimeoutExpired:
+                timer.check(process)
+        return process.wait()
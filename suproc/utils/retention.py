@@ -0,0 +1,285 @@
+"""
+AVA Single Unique Process
+© AVA, 2025
+"""
+import os
+import mmap
+import fcntl
+import ctypes
+
+from suproc.utils.timeindex import TimeIndex, FLAG_SESSION, INDEX_EXT, PID_HEADER_BYTES, line_time
+
+LOG_EXT = '.log'
+FALLOC_FL_COLLAPSE_RANGE = 0x08
+COPY_CHUNK = 1024 * 1024
+_SIZE_UNITS = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+_libc = None
+
+
+def parse_size(value: str) -> int:
+    """
+    Parses a size in bytes with an optional unit: '500000', '512K', '100M', '10G'.
+    """
+    value = value.strip().upper().rstrip('B')
+    try:
+        if value and value[-1] in _SIZE_UNITS:
+            size = float(value[:-1]) * _SIZE_UNITS[value[-1]]
+        else:
+            size = float(value)
+    except ValueError:
+        raise ValueError(f"Invalid size: '{value}'. Use bytes or K, M, G, T") from None
+    if size < 0:
+        raise ValueError(f"Invalid size: '{value}'. The value must not be negative")
+    return int(size)
+
+
+def format_size(size: int) -> str:
+    for unit in ('', 'K', 'M', 'G'):
+        if size < 1024:
+            return f'{size:.1f}{unit}' if unit else f'{size}B'
+        size /= 1024
+    return f'{size:.1f}T'
+
+
+class LogInfo:
+    """
+    A log file of the logs directory: its size and mtime (from one os.scandir pass) and its sessions.
+    """
+    __slots__ = ('name', 'path', 'size', 'mtime', 'index_size', '_sessions')
+
+    def __init__(self, name: str, path: str, size: int, mtime: float, index_size: int = 0):
+        self.name = name
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+        self.index_size = index_size
+        self._sessions = None
+
+    @property
+    def sessions(self) -> list:
+        if self._sessions is None:
+            self._sessions = session_offsets(self.path)
+        return self._sessions
+
+    @property
+    def disk_size(self) -> int:
+        return self.size + self.index_size
+
+
+def scan_logs(log_dir: str) -> list:
+    """
+    Returns a LogInfo of each log file of the logs directory, sorted by name.
+    """
+    logs, index_sizes = {}, {}
+    with os.scandir(log_dir) as entries:
+        for entry in entries:
+            try:
+                if entry.name.endswith(LOG_EXT):
+                    st = entry.stat()
+                    name = entry.name[:-len(LOG_EXT)]
+                    logs[name] = LogInfo(name, entry.path, st.st_size, st.st_mtime)
+                elif entry.name.endswith(LOG_EXT + INDEX_EXT):
+                    index_sizes[entry.name[:-len(LOG_EXT + INDEX_EXT)]] = entry.stat().st_size
+            except FileNotFoundError:
+                continue
+    for name, size in index_sizes.items():
+        if name in logs:
+            logs[name].index_size = size
+    return [logs[name] for name in sorted(logs)]
+
+
+def _scan_headers(log_path: str) -> list:
+    sessions = []
+    with open(log_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return sessions
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = mm.find(PID_HEADER_BYTES)
+            while pos != -1:
+                start = mm.rfind(b'\n', 0, pos) + 1
+                end = mm.find(b'\n', pos)
+                sessions.append((start, line_time(mm[start:end if end != -1 else len(mm)])))
+                pos = mm.find(PID_HEADER_BYTES, pos + len(PID_HEADER_BYTES))
+    return sessions
+
+
+def session_offsets(log_path: str) -> list:
+    """
+    Returns the (offset, start time) of each session of a log file, the oldest first. The sessions are read
+    from the FLAG_SESSION records of the time index; logs without them (or with sessions written before the
+    index) are scanned for the session headers.
+    """
+    index = TimeIndex(TimeIndex.path_for(log_path))
+    sessions = [(offset, t) for t, offset, flags in index.records() if flags & FLAG_SESSION]
+    try:
+        if sessions and sessions[0][0] > 0:
+            # The head before the first indexed session may hold older sessions:
+            with open(log_path, 'rb') as f:
+                head = f.read(sessions[0][0])
+            if PID_HEADER_BYTES in head:
+                sessions = []
+        if not sessions:
+            sessions = _scan_headers(log_path)
+    except FileNotFoundError:
+        return []
+    return sessions
+
+
+def _load_libc():
+    global _libc
+    if _libc is None:
+        libc = ctypes.CDLL(None, use_errno=True)
+        if hasattr(libc, 'fallocate'):
+            libc.fallocate.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_longlong, ctypes.c_longlong]
+            libc.fallocate.restype = ctypes.c_int
+        _libc = libc
+    return _libc
+
+
+def _collapse_range(fd: int, length: int) -> bool:
+    # Removes the first 'length' bytes in place (fallocate(2) FALLOC_FL_COLLAPSE_RANGE, ext4 and XFS):
+    libc = _load_libc()
+    if not hasattr(libc, 'fallocate'):
+        return False
+    return libc.fallocate(fd, FALLOC_FL_COLLAPSE_RANGE, 0, length) == 0
+
+
+def _copy_down(fd: int, cut: int):
+    # Moves the data after 'cut' to the start of the file. Only for a log without a writer: the data appended
+    # between the last read and the truncation would be cut off:
+    pos = cut
+    while True:
+        chunk = os.pread(fd, COPY_CHUNK, pos)
+        if not chunk:
+            break
+        os.pwrite(fd, chunk, pos - cut)
+        pos += len(chunk)
+    os.ftruncate(fd, pos - cut)
+
+
+def trim_head(log_path: str, cut: int, live=False) -> int:
+    """
+    Removes the head of a log file up to the byte offset 'cut' (the start of a session) and rebases its time
+    index. 'live' tells that the process may still be appending to the log.
+
+    The blocks of the head are collapsed in place by the file system, so the rest of the file is not rewritten
+    and an appending writer is not disturbed. The remainder of the head that does not fill a block is blanked out
+    as one empty line. If the file system cannot collapse ranges, the rest of the file is copied down, but not
+    for a live log: it is left as it is.
+
+    Returns:
+        int: The number of bytes the offsets after 'cut' have moved by, 0 if nothing has been removed.
+    """
+    fd = os.open(log_path, os.O_RDWR)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)          # one trimmer at a time (the writer does not take it)
+        st = os.fstat(fd)
+        cut = min(cut, st.st_size)
+        if cut <= 0:
+            return 0
+        aligned = cut - cut % st.st_blksize
+        if 0 < aligned < st.st_size and _collapse_range(fd, aligned):
+            shift = aligned
+            rest = cut - aligned
+            if rest:
+                os.pwrite(fd, b' ' * (rest - 1) + b'\n', 0)
+        elif live:
+            return 0
+        else:
+            shift = cut
+            _copy_down(fd, cut)
+    finally:
+        os.close(fd)
+
+    index_path = TimeIndex.path_for(log_path)
+    if os.path.exists(index_path):
+        TimeIndex(index_path).rebase(cut, shift)
+    return shift
+
+
+def _cut(info: LogInfo, first: int) -> int:
+    # The offset the log is trimmed at to keep its sessions from 'first':
+    return info.sessions[first][0] if first else 0
+
+
+def plan_retention(logs: list, max_bytes: int = None, max_age: float = None, max_sessions: int = None,
+                   running=None) -> list:
+    """
+    Decides which sessions of the logs are removed, the oldest first. The last session of a log is never
+    trimmed; a whole log is only deleted if its process is not running.
+
+    Args:
+        logs (list): LogInfo of the log files (see scan_logs()).
+        max_bytes (int): The maximum total size of the logs and their indexes.
+        max_age (float): A POSIX timestamp: sessions that ended before it are removed, and logs last written
+                         before it are deleted.
+        max_sessions (int): The maximum number of sessions per log.
+        running: A function running(name) -> bool. By default, all processes are taken as running.
+
+    Returns:
+        list: (LogInfo, number of removed sessions, cut offset or None to delete the log) of the logs to change.
+    """
+    if running is None:
+        running = lambda name: True
+    keep = {}                                   # name -> index of the first kept session
+    deleted = set()
+
+    for info in logs:
+        n = len(info.sessions)
+        first = 0
+        if max_sessions is not None and n > max_sessions:
+            first = n - max(max_sessions, 1)
+        if max_age is not None:
+            if info.mtime < max_age and not running(info.name):
+                deleted.add(info.name)
+                continue
+            # A session has ended when the next one has started:
+            for i in range(1, n):
+                if info.sessions[i][1] is not None and info.sessions[i][1] <= max_age:
+                    first = max(first, i)
+        keep[info.name] = first
+
+    if max_bytes is not None:
+        total = 0
+        candidates = []
+        for info in logs:
+            if info.name in deleted:
+                continue
+            total += info.disk_size - _cut(info, keep[info.name])
+            for i in range(keep[info.name], len(info.sessions) - 1):
+                candidates.append((info.sessions[i][1] or info.mtime, i, info))
+
+        # Remove the oldest sessions of all logs until the total fits:
+        candidates.sort(key=lambda item: (item[0], item[1]))
+        for _, i, info in candidates:
+            if total <= max_bytes:
+                break
+            if keep[info.name] == i:
+                keep[info.name] = i + 1
+                total -= _cut(info, i + 1) - _cut(info, i)
+
+        if total > max_bytes:
+            # Only the last sessions are left, delete the logs of the stopped processes:
+            for info in sorted(logs, key=lambda item: item.mtime):
+                if total <= max_bytes:
+                    break
+                if info.name not in deleted and not running(info.name):
+                    deleted.add(info.name)
+                    total -= info.disk_size - _cut(info, keep[info.name])
+
+    plan = []
+    for info in logs:
+        if info.name in deleted:
+            plan.append((info, len(info.sessions), None))
+        elif keep.get(info.name):
+            plan.append((info, keep[info.name], info.sessions[keep[info.name]][0]))
+    return plan
+
+
+def delete_log(log_path: str):
+    for path in (log_path, TimeIndex.path_for(log_path)):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
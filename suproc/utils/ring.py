@@ -0,0 +1,216 @@
+"""
+AVA Single Unique Process
+© AVA, 2025
+"""
+import os
+import mmap
+import zlib
+import struct
+from collections import deque
+
+from suproc.utils.retention import parse_size
+
+RING_DIR = '/dev/shm'
+RING_EXT = '.ring'
+LOG_FILE = 'file'
+LOG_RING = 'ring'
+LOG_NONE = 'none'               # no log file, the log is only shipped (see '--ship')
+MAGIC = b'SUPRRING'
+VERSION = 1
+HEADER = struct.Struct('<8sIIQ')        # magic, version, reserved, capacity
+POSITION = struct.Struct('<Q')
+HEAD_OFFSET = 24                        # bytes written so far (published after the data)
+RESERVE_OFFSET = 32                     # bytes being written (published before the data)
+HEADER_SIZE = 64
+MIN_SIZE = 4096
+READ_RETRIES = 100
+ENCODING = 'utf-8'
+
+
+def parse_log_mode(value: str) -> int:
+    """
+    Parses a '--log' value: 'file', 'ring:SIZE' (e.g. 'ring:64M') or 'none'. Returns the size of the ring buffer or
+    0 for a log file or no log.
+    """
+    if value is None or value in (LOG_FILE, LOG_NONE):
+        return 0
+    mode, _, size = value.partition(':')
+    if mode != LOG_RING or not size:
+        raise ValueError(f"Invalid log mode: '{value}'. Use '{LOG_FILE}', '{LOG_NONE}' or '{LOG_RING}:SIZE',"
+                         f" e.g. 'ring:64M'")
+    size = parse_size(size)
+    if size < MIN_SIZE:
+        raise ValueError(f"Invalid log mode: '{value}'. The ring buffer must be at least {MIN_SIZE} bytes")
+    return size
+
+
+def ring_path(log_dir: str, name: str) -> str:
+    """
+    Returns the path of the ring buffer of the process 'name' in shared memory. The logs directory is a part of
+    the path, so processes with the same name but different logs directories do not share a buffer.
+    """
+    tag = zlib.crc32(os.path.abspath(log_dir).encode())
+    return os.path.join(RING_DIR, f'suproc.{tag:08x}.{name}{RING_EXT}')
+
+
+def active_ring(log_dir: str, name: str) -> str or None:
+    """
+    Returns the path of the ring buffer of the process 'name' if its log is read from it: the ring buffer is newer
+    than the log file. Otherwise, None.
+    """
+    ring = ring_path(log_dir, name)
+    path = os.path.join(log_dir, name + '.log')
+    try:
+        if os.path.exists(ring) and (not os.path.exists(path) or os.path.getmtime(ring) >= os.path.getmtime(path)):
+            return ring
+    except OSError:
+        pass
+    return None
+
+
+class RingWriter:
+    """
+    A log in a fixed-size ring buffer in shared memory instead of a file: writing a block is a memcpy into the
+    mapped buffer, and the oldest output is overwritten when it is full. There is one writer (the daemon), so no
+    locks are taken: positions are byte counters that only grow, and a writer announces the range it is about to
+    overwrite ('reserve') before copying and publishes it ('head') after, so readers can drop the bytes that were
+    overwritten while they were copying. A buffer of the same size is reused, so it keeps the previous sessions.
+
+    It is a text stream for logging.StreamHandler.
+    """
+    def __init__(self, path: str, capacity: int):
+        self.path = path
+        self.name = path
+        self.capacity = capacity
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            header = os.pread(fd, HEADER.size, 0)
+            size = HEADER_SIZE + capacity
+            if len(header) < HEADER.size or HEADER.unpack(header) != (MAGIC, VERSION, 0, capacity) \
+                    or os.fstat(fd).st_size != size:
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, size)
+                os.pwrite(fd, HEADER.pack(MAGIC, VERSION, 0, capacity), 0)
+            os.utime(fd)                # the mtime tells which of the ring and the log file is newer
+            self._mm = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        self._head = POSITION.unpack_from(self._mm, HEAD_OFFSET)[0]
+        POSITION.pack_into(self._mm, RESERVE_OFFSET, self._head)
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode(ENCODING, 'replace')
+        if len(data) > self.capacity:
+            data = data[-self.capacity:]
+        n = len(data)
+        if not n:
+            return
+        head = self._head
+        POSITION.pack_into(self._mm, RESERVE_OFFSET, head + n)
+        pos = head % self.capacity
+        first = min(n, self.capacity - pos)
+        self._mm[HEADER_SIZE + pos:HEADER_SIZE + pos + first] = data[:first]
+        if first < n:
+            self._mm[HEADER_SIZE:HEADER_SIZE + n - first] = data[first:]
+        self._head = head + n
+        POSITION.pack_into(self._mm, HEAD_OFFSET, self._head)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+
+class RingReader:
+    """
+    Reads a ring buffer written by RingWriter without locks.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                raise ValueError(f"Not a ring buffer: '{path}'")
+            magic, version, _, self.capacity = HEADER.unpack(header)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"Not a ring buffer: '{path}'")
+            self._mm = mmap.mmap(f.fileno(), HEADER_SIZE + self.capacity, access=mmap.ACCESS_READ)
+
+    @property
+    def head(self) -> int:
+        return POSITION.unpack_from(self._mm, HEAD_OFFSET)[0]
+
+    def read(self, start: int = None) -> tuple:
+        """
+        Returns (data, end): the whole lines written from the position 'start' (the oldest line still in the buffer
+        by default) to the position 'end'. If the writer has overwritten some of them, they are skipped.
+        """
+        for _ in range(READ_RETRIES):
+            head = self.head
+            low = max(head - self.capacity, 0)
+            begin = low if start is None else min(max(start, low), head)
+            pos, end = begin % self.capacity, head % self.capacity
+            if begin == head:
+                data = b''
+            elif pos < end:
+                data = self._mm[HEADER_SIZE + pos:HEADER_SIZE + end]
+            else:
+                data = self._mm[HEADER_SIZE + pos:HEADER_SIZE + self.capacity] + self._mm[HEADER_SIZE:HEADER_SIZE + end]
+            reserve = POSITION.unpack_from(self._mm, RESERVE_OFFSET)[0]
+            if reserve < head:
+                continue                # a torn read of the positions
+            valid = max(begin, reserve - self.capacity)
+            data = data[valid - begin:]
+            if valid > 0 and (start is None or valid > start):
+                # Skip the rest of a line whose start has been overwritten:
+                data = data[data.find(b'\n') + 1:]
+            return data, head
+        return b'', start if start is not None else 0
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+
+class RingFile:
+    """
+    A read-only text file over a ring buffer with the methods used to print logs: readlines(), readline() (returns
+    '' until a new line is written) and seek() to the end.
+    """
+    def __init__(self, path: str):
+        self.reader = RingReader(path)
+        self.name = path
+        self._pos = None
+        self._pending = deque()
+
+    def readlines(self) -> list:
+        data, self._pos = self.reader.read()
+        self._pending.clear()
+        return data.decode(ENCODING, 'replace').splitlines(keepends=True)
+
+    def readline(self) -> str:
+        if not self._pending:
+            data, self._pos = self.reader.read(self._pos)
+            if data:
+                self._pending.extend(data.decode(ENCODING, 'replace').splitlines(keepends=True))
+        return self._pending.popleft() if self._pending else ''
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET):
+        if offset != 0 or whence != os.SEEK_END:
+            raise ValueError('A ring buffer can only be read from the start or followed from the end')
+        self._pos = self.reader.head
+        self._pending.clear()
+
+    def close(self):
+        self.reader.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
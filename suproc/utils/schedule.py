@@ -0,0 +1,205 @@
+"""
+AVA Single Unique Process
+© AVA, 2025
+"""
+import os
+import re
+import json
+import time
+from datetime import datetime, timedelta
+
+SCHEDULE_EXT = '.schedule'
+OVERLAP_SKIP = 'skip'           # the run is not started while the previous one is running
+OVERLAP_QUEUE = 'queue'         # the run is queued for the running one (see 'run --queue')
+OVERLAP_REPLACE = 'replace'     # the running one is stopped (see 'run --force')
+OVERLAP_VALUES = (OVERLAP_SKIP, OVERLAP_QUEUE, OVERLAP_REPLACE)
+CATCH_UP_SKIP = 'skip'          # the runs missed while the scheduler was stopped or suspended are not started
+CATCH_UP_ONE = 'one'            # one run is started for all of them
+CATCH_UP_ALL = 'all'            # all of them are started one after another (at most MAX_CATCH_UP)
+CATCH_UP_VALUES = (CATCH_UP_SKIP, CATCH_UP_ONE, CATCH_UP_ALL)
+MAX_CATCH_UP = 100
+MISS_GRACE = 60.0               # seconds a run may be late before it is considered missed
+MAX_YEARS = 5                   # how far the next time of a cron expression is searched
+MAX_DST_SHIFT = timedelta(hours=2)  # the most the local clock is turned back or forward at once
+_INTERVAL_RE = re.compile(r'^(\d+(?:\.\d+)?)\s*([smhd]?)$')
+_UNITS = {'': 1, 's': 1, 'm': 60, 'h': 3600, 'd': 86400}
+_MACROS = {'@yearly': '0 0 1 1 *', '@annually': '0 0 1 1 *', '@monthly': '0 0 1 * *', '@weekly': '0 0 * * 0',
+           '@daily': '0 0 * * *', '@midnight': '0 0 * * *', '@hourly': '0 * * * *'}
+_MONTHS = {name: i for i, name in enumerate(('jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct',
+                                             'nov', 'dec'), 1)}
+_DAYS = {name: i for i, name in enumerate(('sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat'))}
+_FIELDS = (('minute', 0, 59, {}), ('hour', 0, 23, {}), ('day of month', 1, 31, {}), ('month', 1, 12, _MONTHS),
+           ('day of week', 0, 7, _DAYS))
+
+
+def parse_interval(value: str) -> float:
+    """
+    Parses an interval in seconds with an optional unit: '90', '90s', '5m', '1.5h', '1d'.
+    """
+    match = _INTERVAL_RE.match(str(value).strip().lower())
+    if match is None:
+        raise ValueError(f"Invalid interval: '{value}'. Use seconds or s, m, h, d, e.g. '60s' or '5m'")
+    return float(match.group(1)) * _UNITS[match.group(2)]
+
+
+def _parse_field(text: str, name: str, low: int, high: int, names: dict) -> set:
+    values = set()
+    for item in text.split(','):
+        item, _, step = item.partition('/')
+        try:
+            step = int(step) if step else 1
+            if item == '*':
+                start, end = low, high
+            else:
+                first, _, last = item.partition('-')
+                start = names.get(first.lower()) if first.lower() in names else int(first)
+                end = (names.get(last.lower()) if last.lower() in names else int(last)) if last else \
+                    (high if step > 1 else start)
+        except ValueError:
+            raise ValueError(f"Invalid {name} in the cron expression: '{text}'") from None
+        if step < 1 or not low <= start <= end <= high:
+            raise ValueError(f"Invalid {name} in the cron expression: '{text}' (from {low} to {high})")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronExpr:
+    """
+    A cron expression of 5 fields: minute, hour, day of month, month and day of week, with '*', lists, ranges,
+    steps and the names of months and days (e.g. '*/5 * * * *', '0 9-18 * * mon-fri'), or a macro like '@daily'.
+    As in cron, if both days are restricted, a time matches either of them. Times are local: a time skipped when
+    the clock is turned forward matches right after the change, and a time repeated when it is turned back matches
+    once, or twice if the hour is not restricted.
+    """
+    def __init__(self, expr: str):
+        self.expr = expr
+        fields = _MACROS.get(expr.strip().lower(), expr).split()
+        if len(fields) != len(_FIELDS):
+            raise ValueError(f"Invalid cron expression: '{expr}'. Use 5 fields: minute hour day month weekday")
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            _parse_field(text, *field) for text, field in zip(fields, _FIELDS))
+        self.weekdays = {day % 7 for day in weekdays}                  # 7 is Sunday too
+        self._any_hour = fields[1] == '*'
+        self._any_day = fields[2] == '*'
+        self._any_weekday = fields[4] == '*'
+        if self.next_after(datetime.now().timestamp()) is None:
+            raise ValueError(f"Invalid cron expression: '{expr}'. It never matches")
+
+    def _day_matches(self, dt: datetime) -> bool:
+        day = dt.day in self.days
+        weekday = (dt.weekday() + 1) % 7 in self.weekdays             # cron counts from Sunday
+        if self._any_day or self._any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def _timestamp(self, dt: datetime, t: float) -> float or None:
+        # The time of a local wall clock time after 't', if any. With DST, the time is missing (the first time after
+        # the change is used then) or repeated (the second time counts only if the hour is not restricted):
+        fields = dt.timetuple()[:6]
+        times = sorted({time.mktime(fields + (0, 0, is_dst)) for is_dst in (0, 1)})
+        valid = [ts for ts in times if time.localtime(ts)[:6] == fields]
+        if not valid:
+            valid = times[-1:]
+        elif not self._any_hour:
+            valid = valid[:1]
+        return next((ts for ts in valid if ts > t), None)
+
+    def _search(self, dt: datetime, t: float, window=False) -> float or None:
+        # Searches the local wall clock time from 'dt' (naive datetimes ignore DST). Without 'window', the first
+        # match is returned. Around a turn of the clock the order of the wall clock times is not that of the times,
+        # so with 'window' the search goes on after a match and returns the first of the times:
+        end_year = dt.year + MAX_YEARS
+        first = end = None
+        while dt.year <= end_year and (end is None or dt <= end):
+            if dt.month not in self.months:
+                dt = (dt.replace(day=1) + timedelta(days=32)).replace(day=1, hour=0, minute=0)
+            elif not self._day_matches(dt):
+                dt = (dt + timedelta(days=1)).replace(hour=0, minute=0)
+            elif dt.hour not in self.hours:
+                dt = (dt + timedelta(hours=1)).replace(minute=0)
+            elif dt.minute not in self.minutes:
+                dt += timedelta(minutes=1)
+            elif not window:
+                return time.mktime(dt.timetuple()[:6] + (0, 0, -1))
+            else:
+                ts = self._timestamp(dt, t)
+                if ts is not None and (first is None or ts < first):
+                    first = ts
+                    end = end or dt + MAX_DST_SHIFT
+                dt += timedelta(minutes=1)
+        return first
+
+    def next_after(self, t: float) -> float or None:
+        """
+        Returns the first matching time after 't' or None if there is none in MAX_YEARS years.
+        """
+        # Without a turn of the clock around 't' and the match, the first matching wall clock time is the next time:
+        start = datetime.fromtimestamp(t).replace(second=0, microsecond=0)
+        ts = self._search(start + timedelta(minutes=1), t)
+        if ts is None or ts > t and not _offset_changes(t) and not _offset_changes(ts):
+            return ts
+        return self._search(start - MAX_DST_SHIFT, t, window=True)
+
+
+def _offset_changes(t: float) -> bool:
+    # Whether the clock is turned around the time 't':
+    shift = MAX_DST_SHIFT.total_seconds()
+    return time.localtime(t - shift).tm_gmtoff != time.localtime(t + shift).tm_gmtoff
+
+
+class Schedule:
+    """
+    The times of the runs of a scheduled process: every 'every' seconds (aligned to the epoch, so '--every 1h'
+    fires at the start of every hour) or at the times of a cron expression.
+    """
+    def __init__(self, every: float = None, cron: str = None):
+        if (every is None) == (cron is None):
+            raise ValueError("Set either an interval ('--every') or a cron expression ('--cron')")
+        if every is not None and every <= 0:
+            raise ValueError(f"Invalid interval: {every}. The value must be positive")
+        self.every = every
+        self.cron = CronExpr(cron) if cron is not None else None
+
+    def __str__(self):
+        return f'every {self.every:g}s' if self.every is not None else f"cron '{self.cron.expr}'"
+
+    def next_after(self, t: float) -> float:
+        if self.every is not None:
+            return (t // self.every + 1) * self.every
+        return self.cron.next_after(t)
+
+    def count(self, start: float, end: float, limit: int) -> int:
+        """
+        Returns the number of the times in (start, end], at most 'limit'.
+        """
+        if self.every is not None:
+            return int(min(max(end // self.every - start // self.every, 0), limit))
+        count = 0
+        t = self.next_after(start)
+        while t is not None and t <= end and count < limit:
+            count += 1
+            t = self.next_after(t)
+        return count
+
+
+def schedule_path(pid_dir: str, name: str) -> str:
+    return os.path.join(pid_dir, name + SCHEDULE_EXT)
+
+
+def load_schedule(path: str) -> dict or None:
+    """
+    Reads a schedule file: the schedule and the commands of the process and the time of its last run.
+    """
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_schedule(path: str, spec: dict):
+    # Replaced atomically, so the scheduler never reads a partial file:
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(spec, f)
+    os.replace(tmp_path, path)
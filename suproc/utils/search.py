@@ -0,0 +1,134 @@
+"""
+AVA Single Unique Process
+© AVA, 2025
+"""
+import os
+import re
+import mmap
+import fnmatch
+import functools
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+
+from suproc.utils.retention import scan_logs
+
+CHUNK_SIZE = 64 * 1024 * 1024   # a big log is searched in chunks of this size by several workers
+_ANSI_RE = re.compile(rb'\x1b\[[0-9;]*m')
+
+
+@functools.lru_cache(maxsize=8)
+def _compile(pattern: bytes, flags: int):
+    return re.compile(pattern, flags)
+
+
+def search_range(path: str, start: int, end: int, sessions: list, pattern: bytes, flags: int = 0,
+                 max_count: int = None) -> list:
+    """
+    Searches the lines of a log between the byte offsets 'start' and 'end' (at line boundaries) through mmap, so
+    the file is not copied to the process. Runs in a worker of the pool.
+
+    Returns:
+        list: (offset, session number, line without colors) of the matching lines. The session number is the
+              index of the last session header before the line (see the session numbers of 'suproc log -s').
+    """
+    regex = _compile(pattern, flags)
+    hits = []
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        end = min(end, size)
+        if start >= end:
+            return hits
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = start
+            while pos < end:
+                match = regex.search(mm, pos, end)
+                if match is None:
+                    break
+                line_start = mm.rfind(b'\n', start, match.start()) + 1 or start
+                line_end = mm.find(b'\n', match.start(), end)
+                if line_end == -1:
+                    line_end = end
+                line = _ANSI_RE.sub(b'', mm[line_start:line_end]).rstrip(b'\r')
+                hits.append((line_start, bisect_right(sessions, line_start) - 1, line))
+                if max_count is not None and len(hits) >= max_count:
+                    break
+                pos = line_end + 1          # one hit per line
+    return hits
+
+
+def _split(path: str, start: int, size: int, chunk_size: int) -> list:
+    # Byte ranges of about 'chunk_size' that end at line boundaries:
+    ranges = []
+    with open(path, 'rb') as f:
+        while start < size:
+            end = start + chunk_size
+            if end >= size:
+                ranges.append((start, size))
+                break
+            f.seek(end)
+            end += len(f.readline())
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def select_logs(log_dir: str, names: list = None) -> list:
+    """
+    Returns the LogInfo of the logs whose names match any of the names or glob patterns (all logs by default).
+    """
+    logs = scan_logs(log_dir)
+    if not names:
+        return logs
+    return [info for info in logs if any(fnmatch.fnmatchcase(info.name, name) for name in names)]
+
+
+def search_logs(logs: list, pattern: bytes, flags: int = 0, last_sessions: int = None, max_count: int = None,
+                jobs: int = None, chunk_size: int = CHUNK_SIZE):
+    """
+    Searches the logs in parallel on a process pool: every log (and every chunk of a big log) is a task, so the
+    search scales with the number of cores.
+
+    Args:
+        logs (list): LogInfo of the logs to search (see select_logs()).
+        pattern (bytes): A regular expression searched in the bytes of the lines.
+        flags (int): Flags of the regular expression, e.g. re.IGNORECASE.
+        last_sessions (int): Searches only the last N sessions of every log.
+        max_count (int): Stops after this number of matching lines per log.
+        jobs (int): The number of worker processes. Defaults to the number of CPUs.
+        chunk_size (int): The size of the chunks of a big log.
+
+    Yields:
+        tuple: (name, session number, line) of the matching lines, log by log in the order of the lines.
+    """
+    _compile(pattern, flags)        # raises re.error before the pool is started
+    tasks = []
+    for info in logs:
+        offsets = [offset for offset, _ in info.sessions]
+        start = 0
+        if last_sessions is not None and len(offsets) > last_sessions:
+            start = offsets[len(offsets) - last_sessions]
+        for begin, end in _split(info.path, start, info.size, chunk_size):
+            tasks.append((info, begin, end, offsets))
+    if not tasks:
+        return
+
+    jobs = min(jobs or os.cpu_count() or 1, len(tasks))
+    if jobs == 1:
+        results = (search_range(info.path, begin, end, offsets, pattern, flags, max_count)
+                   for info, begin, end, offsets in tasks)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=jobs)
+        results = pool.map(search_range, *zip(*[(info.path, begin, end, offsets, pattern, flags, max_count)
+                                                for info, begin, end, offsets in tasks]))
+    try:
+        counts = {}
+        for (info, _, _, _), hits in zip(tasks, results):
+            for _, session, line in hits:
+                if max_count is not None and counts.get(info.name, 0) >= max_count:
+                    break
+                counts[info.name] = counts.get(info.name, 0) + 1
+                yield info.name, session, line
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
@@ -0,0 +1,395 @@
+"""
+AVA Single Unique Process
+© AVA, 2025
+"""
+import os
+import re
+import json
+import time
+import socket
+import struct
+import logging
+import threading
+from collections import deque
+
+from suproc.utils.retention import parse_size
+
+SPILL_EXT = '.spill'
+STREAM = 'unix'                 # a SOCK_STREAM socket, e.g. Vector or Fluent Bit
+DATAGRAM = 'unixgram'           # a SOCK_DGRAM socket, e.g. /dev/log
+FORMAT_SYSLOG = 'syslog'
+FORMAT_JSON = 'json'
+BATCH = 256                     # records sent at once
+FLUSH_INTERVAL = 0.2            # seconds a record may wait for its batch to fill up
+BUFFER_SIZE = 4 * 1024 * 1024   # bytes of records kept in memory before they are spilled to disk
+SPILL_SIZE = 256 * 1024 * 1024  # bytes of the spill file before records are dropped
+SEND_TIMEOUT = 1.0
+RETRY_MIN = 0.5                 # seconds between reconnections, doubled up to RETRY_MAX
+RETRY_MAX = 30.0
+CLOSE_TIMEOUT = 5.0             # seconds to send the backlog at the end, the rest is kept in the spill file
+MAX_DATAGRAM = 32 * 1024        # JSON records are packed into datagrams up to this size
+REPORT_INTERVAL = 5.0
+_FRAME = struct.Struct('<I')
+_ANSI_RE = re.compile(rb'\x1b\[[0-9;]*m')
+_KEYS = ('format', 'batch', 'flush', 'buffer', 'spill', 'facility')
+_FACILITIES = {'kern': 0, 'user': 1, 'daemon': 3, 'syslog': 5, **{f'local{i}': 16 + i for i in range(8)}}
+_SEVERITIES = {logging.DEBUG: 6, logging.INFO: 6, logging.WARNING: 4, logging.ERROR: 3, logging.CRITICAL: 2}
+_LEVELS = {logging.DEBUG: 'output', logging.INFO: 'info', logging.WARNING: 'warning', logging.ERROR: 'error',
+           logging.CRITICAL: 'critical'}
+
+
+def parse_ship(value: str) -> dict:
+    """
+    Parses a log shipping target like 'unixgram:/dev/log' or 'unix:/run/vector.sock,format=json,batch=512' into a
+    dict. Options: 'format' ('syslog' or 'json'), 'batch' (records), 'flush' (seconds), 'buffer' and 'spill' (sizes,
+    e.g. '4M') and 'facility' (syslog, e.g. 'local0').
+    """
+    address, *parts = value.split(',')
+    kind, sep, path = address.partition(':')
+    if not sep or kind not in (STREAM, DATAGRAM) or not path:
+        raise ValueError(f"Invalid log shipping target: '{address}'. Use '{STREAM}:PATH' or '{DATAGRAM}:PATH'")
+    config = {'kind': kind, 'path': path, 'format': FORMAT_SYSLOG, 'batch': BATCH, 'flush': FLUSH_INTERVAL,
+              'buffer': BUFFER_SIZE, 'spill': SPILL_SIZE, 'facility': _FACILITIES['user']}
+    for part in parts:
+        if not part.strip():
+            continue
+        key, sep, option = part.partition('=')
+        key, option = key.strip().lower(), option.strip()
+        if not sep or key not in _KEYS or not option:
+            raise ValueError(f"Invalid log shipping option: '{part}'. Use {', '.join(k + '=...' for k in _KEYS)}")
+        try:
+            if key == 'format':
+                if option not in (FORMAT_SYSLOG, FORMAT_JSON):
+                    raise ValueError
+                config[key] = option
+            elif key == 'facility':
+                config[key] = _FACILITIES[option] if option in _FACILITIES else int(option)
+            elif key in ('buffer', 'spill'):
+                config[key] = parse_size(option)
+            elif key == 'batch':
+                config[key] = int(option)
+            else:
+                config[key] = float(option)
+        except (ValueError, KeyError):
+            raise ValueError(f"Invalid log shipping option: '{part}'") from None
+        if key in ('batch', 'buffer') and config[key] <= 0 or key == 'flush' and config[key] < 0:
+            raise ValueError(f"Invalid log shipping option: '{part}'. The value must be positive")
+    return config
+
+
+def spill_path(log_dir: str, name: str) -> str:
+    return os.path.join(log_dir, name + SPILL_EXT)
+
+
+class LogShipper:
+    """
+    Sends encoded records to a local collector over a Unix socket from a background thread, in batches: a batch
+    is sent when it is full or 'flush' seconds after its first record. put() never blocks on the collector: the
+    records wait in a bounded memory buffer, and when it is full (the collector is slow or down), in the spill
+    file on disk, which is sent after the buffer. Records over the size of the spill file are dropped and counted.
+    The records left at close() stay in the spill file and are sent by the next session of the process first.
+
+    Records are sent at least once: a batch cut off by a failed send is sent again after reconnecting.
+    """
+    def __init__(self, config: dict, spill_file: str):
+        self.config = config
+        self.spill_file = spill_file
+        self.shipped = 0
+        self.dropped = 0
+        self.error = None               # the last send error, None when connected
+        self._memory = deque()
+        self._memory_size = 0
+        self._spill = None              # the file object of the spill file
+        self._spill_offset = 0          # the first record not sent yet
+        self._spill_size = 0
+        self._spill_count = 0           # records in the spill file not sent yet
+        self._sock = None
+        self._closing = False
+        self._cond = threading.Condition()
+        if os.path.exists(spill_file):
+            self._open_spill()
+        self._thread = threading.Thread(target=self._run, name='suproc-shipper', daemon=True)
+        self._thread.start()
+
+    @property
+    def backlog(self) -> int:
+        return len(self._memory) + self._spill_count
+
+    # Buffering:
+    def _open_spill(self):
+        self._spill = open(self.spill_file, 'a+b')
+        self._spill_offset = 0
+        self._spill_size = 0
+        self._spill_count = 0
+        # Count the records left by the previous session, a partial frame of a crash is cut off:
+        fd = self._spill.fileno()
+        size = os.fstat(fd).st_size
+        while self._spill_size + _FRAME.size <= size:
+            end = self._spill_size + _FRAME.size + _FRAME.unpack(os.pread(fd, _FRAME.size, self._spill_size))[0]
+            if end > size:
+                break
+            self._spill_size = end
+            self._spill_count += 1
+        if self._spill_size < size:
+            self._spill.truncate(self._spill_size)
+
+    def _read_spill(self, limit: int) -> list:
+        # Reads up to 'limit' records from the spill offset:
+        self._spill.flush()
+        records = []
+        offset = self._spill_offset
+        fd = self._spill.fileno()
+        while len(records) < limit:
+            head = os.pread(fd, _FRAME.size, offset)
+            if len(head) < _FRAME.size:
+                break
+            size = _FRAME.unpack(head)[0]
+            record = os.pread(fd, size, offset + _FRAME.size)
+            if len(record) < size:
+                break
+            records.append(record)
+            offset += _FRAME.size + size
+        return records
+
+    def put(self, records: list):
+        """
+        Queues encoded records (bytes without a newline) to be sent.
+        """
+        with self._cond:
+            idle = not self._memory     # the first record of a batch starts its flush interval
+            for record in records:
+                if self._spill_count == 0 and self._memory_size + len(record) <= self.config['buffer']:
+                    self._memory.append(record)
+                    self._memory_size += len(record)
+                elif self._spill_size + _FRAME.size + len(record) <= self.config['spill']:
+                    # Keep the order: once records are spilled, the next ones follow them:
+                    if self._spill is None:
+                        self._open_spill()
+                    self._spill.write(_FRAME.pack(len(record)) + record)
+                    self._spill_size += _FRAME.size + len(record)
+                    self._spill_count += 1
+                else:
+                    self.dropped += 1
+            if idle and self._memory or len(self._memory) >= self.config['batch'] or self._spill_count:
+                self._cond.notify()
+
+    def _take(self) -> tuple:
+        # The next batch: (records, from the spill file) (with the lock held):
+        if self._memory:
+            batch = [self._memory.popleft() for _ in range(min(len(self._memory), self.config['batch']))]
+            self._memory_size -= sum(len(record) for record in batch)
+            return batch, False
+        if self._spill_count:
+            return self._read_spill(self.config['batch']), True
+        return [], False
+
+    def _done(self, batch: list, sent: int, spilled: bool):
+        # Commits the sent records of a batch and puts back the rest (with the lock held):
+        self.shipped += sent
+        if spilled:
+            if self._spill is None:
+                return                  # closed meanwhile, the batch is in the spill file
+            self._spill_offset += sum(_FRAME.size + len(record) for record in batch[:sent])
+            self._spill_count -= sent
+            if self._spill_count == 0:
+                self._spill.truncate(0)
+                self._spill_offset = self._spill_size = 0
+        else:
+            for record in reversed(batch[sent:]):
+                self._memory.appendleft(record)
+                self._memory_size += len(record)
+
+    # Sending:
+    def _connect(self):
+        kind = socket.SOCK_STREAM if self.config['kind'] == STREAM else socket.SOCK_DGRAM
+        sock = socket.socket(socket.AF_UNIX, kind)
+        sock.settimeout(SEND_TIMEOUT)
+        try:
+            sock.connect(self.config['path'])
+        except OSError:
+            sock.close()
+            raise
+        self._sock = sock
+
+    def _frames(self, batch: list) -> list:
+        # (bytes, records) to send one by one:
+        if self.config['kind'] == STREAM:
+            if self.config['format'] == FORMAT_SYSLOG:
+                frames = [b'%d %s' % (len(record), record) for record in batch]     # octet counting (RFC 6587)
+            else:
+                frames = [record + b'\n' for record in batch]
+            return [(frame, 1) for frame in frames]
+        if self.config['format'] == FORMAT_SYSLOG:
+            return [(record, 1) for record in batch]                          # a message per datagram
+        packed, frames, count = [], [], 0
+        for record in batch:
+            if packed and sum(map(len, packed)) + len(packed) + len(record) > MAX_DATAGRAM:
+                frames.append((b'\n'.join(packed), count))
+                packed, count = [], 0
+            packed.append(record)
+            count += 1
+        if packed:
+            frames.append((b'\n'.join(packed), count))
+        return frames
+
+    def _send(self, batch: list) -> tuple:
+        # Returns (the number of records sent, the error that stopped the sending or None):
+        sent = 0
+        try:
+            if self._sock is None:
+                self._connect()
+            if self.config['kind'] == STREAM:
+                # One write for the batch; the records of a cut-off write are counted up to the cut:
+                frames = self._frames(batch)
+                data = memoryview(b''.join(frame for frame, _ in frames))
+                done = 0
+                try:
+                    while done < len(data):
+                        done += self._sock.send(data[done:])
+                finally:
+                    for frame, count in frames:
+                        if done < len(frame):
+                            break
+                        done -= len(frame)
+                        sent += count
+            else:
+                for frame, count in self._frames(batch):
+                    self._sock.send(frame)
+                    sent += count
+        except OSError as e:
+            self._disconnect()
+            return sent, e
+        return sent, None
+
+    def _disconnect(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def _run(self):
+        retry = RETRY_MIN
+        while True:
+            with self._cond:
+                while not self._closing and not (self._memory or self._spill_count):
+                    self._cond.wait()
+                if not self._closing and not self._spill_count and len(self._memory) < self.config['batch']:
+                    self._cond.wait(self.config['flush'])
+                batch, spilled = self._take()
+                if not batch:
+                    if self._closing:
+                        return
+                    continue
+            sent, error = self._send(batch)
+            with self._cond:
+                self._done(batch, sent, spilled)
+                self.error = error
+                if error is None:
+                    retry = RETRY_MIN
+                    continue
+                if self._closing:
+                    return
+                self._cond.wait(retry)
+                retry = min(retry * 2, RETRY_MAX)
+
+    def close(self, timeout: float = CLOSE_TIMEOUT):
+        """
+        Sends the backlog for up to 'timeout' seconds and keeps the rest in the spill file.
+        """
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+        self._thread.join(timeout + SEND_TIMEOUT)
+        with self._cond:
+            if self._memory:
+                # The memory records are older than the spilled ones:
+                rest = self._read_spill(self._spill_count) if self._spill is not None else []
+                tmp_path = f'{self.spill_file}.{os.getpid()}.tmp'
+                with open(tmp_path, 'wb') as f:
+                    for record in list(self._memory) + rest:
+                        f.write(_FRAME.pack(len(record)) + record)
+                os.replace(tmp_path, self.spill_file)
+                self._memory.clear()
+                self._memory_size = 0
+            elif self._spill is not None and self._spill_count == 0:
+                try:
+                    os.remove(self.spill_file)
+                except FileNotFoundError:
+                    pass
+            elif self._spill is not None and self._spill_offset:
+                # Drop the sent records from the spill file:
+                rest = self._read_spill(self._spill_count)
+                tmp_path = f'{self.spill_file}.{os.getpid()}.tmp'
+                with open(tmp_path, 'wb') as f:
+                    for record in rest:
+                        f.write(_FRAME.pack(len(record)) + record)
+                os.replace(tmp_path, self.spill_file)
+            if self._spill is not None:
+                self._spill.close()
+                self._spill = None
+            self._disconnect()
+
+
+class ShipHandler(logging.Handler):
+    """
+    A logging handler that ships the records of a process to a collector (see LogShipper). The messages of suproc
+    come through emit(), the output of the commands through emit_lines() in blocks (see LogSink), so an output line
+    is encoded once and never formatted as a log record.
+
+    Records are syslog messages ('<PRI>Mmm dd hh:mm:ss NAME[PID]: MESSAGE') or JSON objects with the keys 'time',
+    'host', 'name', 'pid', 'level' ('output' for the output of the commands) and 'message'. Colors are removed.
+    """
+    def __init__(self, name: str, config: dict, spill_file: str, metrics=None):
+        super().__init__(logging.DEBUG)
+        self.name = name
+        self.shipper = LogShipper(config, spill_file)
+        self.metrics = metrics
+        self._format = config['format']
+        self._facility = config['facility']
+        self._host = socket.gethostname()
+        self._tag = re.sub(r'[^\w.-]', '_', name)[:32]
+        self._reported = (0, 0, self.shipper.backlog)      # the backlog of the previous session is reported
+        self._next_report = time.monotonic() + REPORT_INTERVAL
+
+    def _encode(self, t: float, level: int, message: bytes) -> bytes:
+        message = _ANSI_RE.sub(b'', message).replace(b'\n', b' ')
+        if self._format == FORMAT_SYSLOG:
+            pri = self._facility * 8 + _SEVERITIES.get(level, 6)
+            stamp = time.strftime('%b %d %H:%M:%S', time.localtime(t))
+            return f'<{pri}>{stamp} {self._tag}[{os.getpid()}]: '.encode() + message
+        return json.dumps({'time': round(t, 6), 'host': self._host, 'name': self.name, 'pid': os.getpid(),
+                           'level': _LEVELS.get(level, 'info'), 'message': message.decode('utf-8', 'replace')},
+                          ensure_ascii=False).encode()
+
+    def emit(self, record):
+        try:
+            self.shipper.put([self._encode(record.created, record.levelno, record.getMessage().encode())])
+        except Exception:
+            self.handleError(record)
+
+    def emit_lines(self, lines: list, t: float = None):
+        t = t if t is not None else time.time()
+        self.shipper.put([self._encode(t, logging.DEBUG, line) for line in lines])
+        if self.metrics is not None and time.monotonic() >= self._next_report:
+            self.report()
+
+    def report(self):
+        """
+        Adds the shipped and dropped records since the last report and the change of the backlog to the metrics.
+        """
+        self._next_report = time.monotonic() + REPORT_INTERVAL
+        if self.metrics is None:
+            return
+        shipped, dropped, backlog = self.shipper.shipped, self.shipper.dropped, self.shipper.backlog
+        last_shipped, last_dropped, last_backlog = self._reported
+        if shipped > last_shipped:
+            self.metrics.inc('shipped_records_total', shipped - last_shipped)
+        if dropped > last_dropped:
+            self.metrics.inc('ship_dropped_total', dropped - last_dropped)
+        if backlog != last_backlog:
+            self.metrics.inc('ship_backlog', backlog - last_backlog)
+        self._reported = (shipped, dropped, backlog)
+
+    def close(self):
+        self.shipper.close()
+        self.report()
+        super().close()
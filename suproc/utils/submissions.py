@@ -0,0 +1,138 @@
+"""
+AVA Single Unique Process
+© AVA, 2025
+"""
+import os
+import json
+import time
+import uuid
+import fcntl
+
+QUEUE_EXT = '.queue'
+QUEUE_DEPTH = 100               # the default maximum number of pending submissions of a name
+SESSION_KEYS = ('cmds', 'shell', 'timeout', 'deadline')     # the options a submission brings to its session
+
+
+class SubmissionQueue:
+    """
+    A durable FIFO queue of the runs submitted while the process 'name' was running ('run --queue'): one JSON line
+    per submission in '<log_dir>/<name>.queue', changed under an exclusive flock and synced to disk.
+
+    The holder of the PID file runs the submissions after its session. To hand over without losing submissions,
+    it keeps the queue locked from finding it empty until it has released the PID file (see lock_empty()), and a
+    submitter appends only while it sees the PID file locked under the queue lock (see push()). The file of an
+    empty queue is removed.
+    """
+    def __init__(self, log_dir: str, name: str):
+        self.path = os.path.join(log_dir, name + QUEUE_EXT)
+        self._fd = None
+
+    def _lock(self):
+        # Open and lock the file, again if it has been removed by the holder in the meantime:
+        while True:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_CLOEXEC, 0o644)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                if os.stat(self.path).st_ino == os.fstat(fd).st_ino:
+                    self._fd = fd
+                    return
+            except FileNotFoundError:
+                pass
+            os.close(fd)
+
+    def release(self, remove_empty=True):
+        if self._fd is None:
+            return
+        try:
+            if remove_empty and os.fstat(self._fd).st_size == 0:
+                os.remove(self.path)
+        except OSError:
+            pass
+        os.close(self._fd)
+        self._fd = None
+
+    def _read(self) -> list:
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        data = b''
+        while True:
+            chunk = os.read(self._fd, 64 * 1024)
+            if not chunk:
+                break
+            data += chunk
+        items = []
+        for line in data.splitlines():
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                continue                # a partial line of a crashed writer
+        return items
+
+    def _write(self, items: list):
+        data = b''.join(json.dumps(item, separators=(',', ':')).encode() + b'\n' for item in items)
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        os.ftruncate(self._fd, 0)
+        os.write(self._fd, data)
+        os.fsync(self._fd)
+
+    def push(self, submission: dict, is_held, max_depth: int = QUEUE_DEPTH, coalesce=False) -> tuple:
+        """
+        Appends a submission (a dict with SESSION_KEYS) if is_held() tells that the PID file is still locked.
+
+        Returns:
+            tuple: (position, added). The position is None if the queue is full and 0 if the PID file is not
+                   locked anymore, so the caller can run itself. 'added' is False if the submission was coalesced
+                   with an equal pending one.
+        """
+        self._lock()
+        try:
+            if not is_held():
+                return 0, False
+            items = self._read()
+            if coalesce:
+                for position, item in enumerate(items, 1):
+                    if all(item.get(key) == submission.get(key) for key in SESSION_KEYS):
+                        return position, False
+            if len(items) >= max_depth:
+                return None, False
+            item = {key: submission.get(key) for key in SESSION_KEYS}
+            item['id'] = uuid.uuid4().hex
+            item['time'] = time.time()
+            os.lseek(self._fd, 0, os.SEEK_END)
+            os.write(self._fd, json.dumps(item, separators=(',', ':')).encode() + b'\n')
+            os.fsync(self._fd)
+            return len(items) + 1, True
+        finally:
+            self.release()
+
+    def lock_empty(self):
+        """
+        Returns the next submission, or None with the queue left locked: the holder calls release() after it has
+        released the PID file, so nothing can be appended in between.
+        """
+        self._lock()
+        items = self._read()
+        if items:
+            self.release()
+            return items[0]
+        return None
+
+    def remove(self, submission_id: str):
+        """
+        Removes a submission after it has run. Submissions are removed only after they have run, so those of a
+        holder that crashed are run by the next holder.
+        """
+        self._lock()
+        try:
+            items = self._read()
+            kept = [item for item in items if item.get('id') != submission_id]
+            if len(kept) != len(items):
+                self._write(kept)
+        finally:
+            self.release()
+
+    def __len__(self):
+        try:
+            with open(self.path, 'rb') as f:
+                return sum(1 for line in f if line.strip())
+        except FileNotFoundError:
+            return 0
@@ -0,0 +1,248 @@
+"""
+AVA Single Unique Process
+© AVA, 2025
+"""
+import os
+import re
+import fcntl
+import struct
+import time
+from datetime import datetime, timedelta
+
+INDEX_EXT = '.idx'
+INDEX_INTERVAL = 1.0            # seconds between two sparse index records
+INDEX_RECORD = struct.Struct('<dQB7x')
+FLAG_SESSION = 0x01
+STAMP_SPEC = 'microseconds'
+PID_HEADER_BYTES = b'=== PID:'
+
+_STAMP_RE = re.compile(rb'^(?:\x1b\[[0-9;]*m)?(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d\.\d{6}) ')
+_HEADER_RE = re.compile(rb'=== PID:-?\d+, commands:\d+, time:(\S+) ===')
+_RELATIVE_RE = re.compile(r'^(\d+(?:\.\d+)?)\s*([smhd])(?:\s*ago)?$')
+_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+class LineClock:
+    """
+    Wall clock anchored to the monotonic clock: stamps never go backwards even if the system time is adjusted
+    while the process is running.
+    """
+    def __init__(self):
+        self._wall = time.time()
+        self._mono = time.monotonic()
+
+    def now(self) -> float:
+        return self._wall + (time.monotonic() - self._mono)
+
+    def stamp(self, t: float = None) -> str:
+        if t is None:
+            t = self.now()
+        return datetime.fromtimestamp(t).isoformat(timespec=STAMP_SPEC)
+
+
+class TimeIndex:
+    """
+    Sparse time index of a log file: fixed-size (time, byte offset, flags) records appended at most once per
+    INDEX_INTERVAL seconds, so a time range can be found with a binary search instead of reading the whole log.
+    """
+    def __init__(self, path: str, interval: float = INDEX_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self._last = None
+
+    @staticmethod
+    def path_for(log_path: str) -> str:
+        return log_path + INDEX_EXT
+
+    def append(self, t: float, offset: int, flags: int = 0):
+        with open(self.path, 'ab') as f:
+            fcntl.flock(f, fcntl.LOCK_SH)       # not while the index is rebased (see rebase())
+            f.write(INDEX_RECORD.pack(t, offset, flags))
+        self._last = t
+
+    def mark(self, t: float, stream, flags: int = 0) -> bool:
+        """
+        Appends a record for the current end of the log 'stream' if the last record is older than the interval.
+        Records with flags (e.g. FLAG_SESSION for a session start) are always appended.
+        """
+        if not flags and self._last is not None and t - self._last < self.interval:
+            return False
+        try:
+            stream.flush()
+            self.append(t, os.fstat(stream.fileno()).st_size, flags)
+        except (OSError, ValueError):
+            self._last = t
+            return False
+        return True
+
+    def __len__(self):
+        try:
+            return os.path.getsize(self.path) // INDEX_RECORD.size
+        except OSError:
+            return 0
+
+    def records(self):
+        """
+        Yields all (time, offset, flags) records of the index.
+        """
+        try:
+            with open(self.path, 'rb') as f:
+                while True:
+                    chunk = f.read(INDEX_RECORD.size * 4096)
+                    if not chunk:
+                        break
+                    yield from INDEX_RECORD.iter_unpack(chunk[:len(chunk) - len(chunk) % INDEX_RECORD.size])
+        except FileNotFoundError:
+            return
+
+    def _bisect(self, f, n: int, t: float) -> int:
+        # Number of records with time <= t (records are appended in time order):
+        lo, hi = 0, n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            f.seek(mid * INDEX_RECORD.size)
+            rec_t, _, _ = INDEX_RECORD.unpack(f.read(INDEX_RECORD.size))
+            if rec_t <= t:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _read(self, f, i: int):
+        f.seek(i * INDEX_RECORD.size)
+        return INDEX_RECORD.unpack(f.read(INDEX_RECORD.size))
+
+    def lookup(self, since: float = None, until: float = None):
+        """
+        Finds the byte range of the log that covers [since, until].
+
+        Returns:
+            tuple: (start offset, start time or None, end offset or None). The end offset is None if the range is
+                   open to the end of the log.
+        """
+        n = len(self)
+        if n == 0:
+            return 0, None, None
+        with open(self.path, 'rb') as f:
+            start, start_t = 0, None
+            if since is not None:
+                i = self._bisect(f, n, since)
+                if i > 0:
+                    start_t, start, _ = self._read(f, i - 1)
+            end = None
+            if until is not None:
+                i = self._bisect(f, n, until)
+                if i < n:
+                    _, end, _ = self._read(f, i)
+        return start, start_t, end
+
+    def rebase(self, cut: int, shift: int = None):
+        """
+        Drops records before the byte offset 'cut' and shifts the rest after the log head has been removed.
+        'shift' is the number of removed bytes if it differs from 'cut' (see retention.trim_head()).
+        """
+        if shift is None:
+            shift = cut
+        # Rewritten in place under the lock the writer takes to append, so its next record follows the kept ones
+        # (a replaced file would take the records of a writer that still has the old one open):
+        try:
+            f = open(self.path, 'r+b')
+        except FileNotFoundError:
+            return
+        with f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            data = f.read()
+            kept = [(t, offset - shift, flags)
+                    for t, offset, flags in INDEX_RECORD.iter_unpack(data[:len(data) - len(data) % INDEX_RECORD.size])
+                    if offset >= cut]
+            f.seek(0)
+            f.write(b''.join(INDEX_RECORD.pack(*rec) for rec in kept))
+            f.truncate()
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def parse_time(value: str, now: datetime = None) -> float:
+    """
+    Parses a point in time for '--since' / '--until'.
+
+    Args:
+        value (str): An ISO date/time ('2025-03-01', '2025-03-01 14:02', '2025-03-01T14:02:30'), a time of the
+                     current day ('14:02', '14:02:30') or a relative time ('90s', '5m', '2h ago', '1d').
+        now (datetime): The current time. Defaults to datetime.now().
+
+    Returns:
+        float: A POSIX timestamp.
+    """
+    if now is None:
+        now = datetime.now()
+    value = value.strip()
+
+    match = _RELATIVE_RE.match(value)
+    if match:
+        return (now - timedelta(seconds=float(match.group(1)) * _UNITS[match.group(2)])).timestamp()
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        pass
+    try:
+        day_time = datetime.strptime(value, '%H:%M:%S' if value.count(':') == 2 else '%H:%M').time()
+        return datetime.combine(now.date(), day_time).timestamp()
+    except ValueError:
+        raise ValueError(f"Invalid time: '{value}'") from None
+
+
+def line_time(line: bytes) -> float or None:
+    """
+    Returns the time of a log line: its per-line stamp or the time of a session header. Otherwise, returns None.
+    """
+    match = _STAMP_RE.match(line)
+    if match is None:
+        match = _HEADER_RE.search(line)
+        if match is None:
+            return None
+    try:
+        return datetime.fromisoformat(match.group(1).decode()).timestamp()
+    except ValueError:
+        return None
+
+
+def iter_range(path: str, since: float = None, until: float = None):
+    """
+    Streams the lines of the log written between 'since' and 'until' without reading the whole file: the time
+    index is used to seek to the first candidate byte and to stop at the end of the range. Lines with per-line
+    stamps are filtered exactly, lines without them - with the resolution of the index.
+
+    Yields:
+        bytes: Log lines including their trailing newline.
+    """
+    start, _, end = TimeIndex(TimeIndex.path_for(path)).lookup(since, until)
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if start > size or (end is not None and end > size):    # the index is stale (the log has been rewritten)
+            start, end = 0, None
+        f.seek(start)
+        offset = start
+        current = None              # the time of the current line if known
+        for line in f:
+            if end is not None and offset >= end:
+                break
+            offset += len(line)
+
+            match = _STAMP_RE.match(line)
+            if match is not None:
+                current = line_time(line)
+            elif PID_HEADER_BYTES in line:
+                # A session header gives the time of the session start, not of the following lines:
+                t = line_time(line)
+                if until is not None and t is not None and t > until:
+                    break
+                current = t if t is not None and since is not None and t >= since else None
+            if until is not None and current is not None and current > until:
+                break
+            if since is None or current is None or current >= since:
+                yield line
@@ -0,0 +1,73 @@
+"""
+AVA Single Unique Process
+© AVA, 2025
+"""
+import re
+import json
+import time
+
+from suproc.utils.printer import TablePrinter
+
+_DETACH_RE = re.compile(r'spawn=([0-9.]+) confirm=([0-9.]+)')
+
+
+class PhaseTimings:
+    """
+    High-resolution timings of the phases of 'run' and 'stop'. Each mark() closes the phase that started at the
+    previous mark, so the phases add up to the total time. Pass an instance to run_single_instance_proc() or
+    kill_proc() to get it filled in.
+    """
+    def __init__(self):
+        self.phases = []            # [(phase, seconds)]
+        self._start = time.perf_counter()
+        self._last = self._start
+
+    def mark(self, phase: str) -> float:
+        now = time.perf_counter()
+        seconds = now - self._last
+        self.phases.append((phase, seconds))
+        self._last = now
+        return seconds
+
+    def split_detach(self, output: str):
+        """
+        Splits the last phase (the 'suproc-detach' call) by the spawn and confirmation times it printed.
+        """
+        match = _DETACH_RE.search(output or '')
+        if not match or not self.phases:
+            return
+        phase, seconds = self.phases.pop()
+        spawn, confirm = float(match.group(1)), float(match.group(2))
+        self.phases.append((f'{phase}_exec', max(seconds - spawn - confirm, 0.0)))
+        self.phases.append((f'{phase}_spawn', spawn))
+        self.phases.append((f'{phase}_confirm', confirm))
+
+    @property
+    def total(self) -> float:
+        return self._last - self._start
+
+    def to_dict(self) -> dict:
+        result = {}
+        for phase, seconds in self.phases:
+            result[phase] = result.get(phase, 0.0) + seconds
+        return result
+
+    def to_json(self) -> str:
+        """
+        Returns the timings in milliseconds as one JSON line.
+        """
+        phases = {phase: round(seconds * 1000, 3) for phase, seconds in self.to_dict().items()}
+        return json.dumps({'total_ms': round(self.total * 1000, 3), 'phases_ms': phases}, separators=(',', ':'))
+
+    def print_table(self, logger=None):
+        table = TablePrinter("|        Phase         |   Time, ms   |   Share   |", alignment=['<', '>', '>'],
+                             logger=logger)
+        table.print_special('outer')
+        table.print_special('header')
+        table.print_special('inner')
+        total = self.total or 1e-9
+        for phase, seconds in self.phases:
+            table.print_row((phase, f'{seconds * 1000:.3f}', f'{seconds / total * 100:.1f}%'))
+        table.print_special('inner')
+        table.print_row(('total', f'{self.total * 1000:.3f}', '100.0%'))
+        table.print_special('outer')
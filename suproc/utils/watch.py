@@ -0,0 +1,313 @@
+"""
+AVA Single Unique Process
+© AVA, 2025
+"""
+import os
+import re
+import sys
+import time
+import curses
+import selectors
+from datetime import timedelta
+
+from suproc.utils.probes import Inotify, IN_MODIFY, IN_CLOSE_WRITE, IN_CREATE, IN_DELETE, IN_MOVED_FROM, IN_MOVED_TO
+from suproc.utils.registry import StatusRegistry
+from suproc.utils.retention import format_size
+from suproc.utils.ring import RingReader, active_ring
+
+REFRESH_INTERVAL = 1.0          # seconds between two updates of the CPU, RSS and uptime
+TAIL_BYTES = 4096               # the end of a log read for its last line
+HEADER_ROWS = 2
+_ANSI_RE = re.compile(r'\x1b\[[0-9;]*m')
+_CLK_TCK = os.sysconf('SC_CLK_TCK')
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+_PID_EVENTS = IN_CREATE | IN_DELETE | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+_LOG_EVENTS = IN_MODIFY | IN_CREATE | IN_DELETE | IN_MOVED_TO
+_KEYS_HELP = 'up/down: select  t/enter: tail  s: stop  a: all  q: quit'
+
+
+def tree_usage(pid: int) -> tuple or None:
+    """
+    Returns (CPU ticks, RSS bytes) of the process and all its descendants from /proc, or None if the process
+    does not exist.
+    """
+    ticks = rss = 0
+    stack = [pid]
+    while stack:
+        p = stack.pop()
+        try:
+            with open(f'/proc/{p}/stat', 'rb') as f:
+                data = f.read()
+        except OSError:
+            if p == pid:
+                return None
+            continue
+        fields = data[data.rfind(b')') + 2:].split()
+        ticks += int(fields[11]) + int(fields[12])      # utime + stime
+        rss += int(fields[21]) * _PAGE_SIZE
+        try:
+            with open(f'/proc/{p}/task/{p}/children', 'rb') as f:
+                stack.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass
+    return ticks, rss
+
+
+def last_line(log_path: str, ring=False) -> str:
+    """
+    Returns the last non-empty line of a log file (or of a ring buffer if 'ring' is set) without colors.
+    """
+    try:
+        if ring:
+            reader = RingReader(log_path)
+            try:
+                data, _ = reader.read(max(reader.head - TAIL_BYTES, 0))
+            finally:
+                reader.close()
+        else:
+            with open(log_path, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                f.seek(max(size - TAIL_BYTES, 0))
+                data = f.read(TAIL_BYTES)
+    except (OSError, ValueError):
+        return ''
+    for line in reversed(data.splitlines()):
+        line = _ANSI_RE.sub('', line.decode(errors='replace')).strip()
+        if line:
+            return line
+    return ''
+
+
+class _Row:
+    __slots__ = ('name', 'pid', 'state', 'start_time', 'cpu', 'rss', 'line', 'log_size', 'ticks', 'ticks_time')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.pid = 0
+        self.state = '-'
+        self.start_time = 0.0
+        self.cpu = None
+        self.rss = None
+        self.line = None                # None: the last log line has to be read
+        self.log_size = -1
+        self.ticks = None
+        self.ticks_time = 0.0
+
+    def render(self, now: float) -> str:
+        uptime = str(timedelta(seconds=int(now - self.start_time))) if self.state == 'running' else '-'
+        cpu = f'{self.cpu:.1f}' if self.cpu is not None else '-'
+        rss = format_size(self.rss) if self.rss is not None else '-'
+        return (f'{self.name[:24]:<24} {self.pid or "-":>8} {self.state:<8} {uptime:>12} {cpu:>6} {rss:>8}  '
+                f'{self.line or ""}')
+
+
+class Dashboard:
+    """
+    A live terminal view of the processes: their state, uptime, CPU and RSS (of the whole process tree) and the
+    last line of their logs. The states are read from the status registry and the resources from /proc once per
+    interval; the changes of the PID and logs directories come from inotify, so the directories are not
+    rescanned and a log is only read when it has been written. Only the rows that have changed are redrawn.
+
+    'on_stop(name)' is called to stop the selected process and returns a status message, 'on_tail(name)' is
+    called with the terminal restored to follow its log until Ctrl+C.
+    """
+    def __init__(self, registry: StatusRegistry, log_dir: str, pid_dir: str, interval: float = REFRESH_INTERVAL,
+                 show_all=False, on_stop=None, on_tail=None):
+        self.registry = registry
+        self.log_dir = log_dir
+        self.pid_dir = pid_dir
+        self.interval = interval
+        self.show_all = show_all
+        self.on_stop = on_stop
+        self.on_tail = on_tail
+        self.rows = []
+        self.selected = 0
+        self.status = ''
+        self._rows = {}                 # name -> _Row
+        self._confirm = None            # the name to stop after 'y'
+        self._inotify = None
+        self._screen = None
+        self._drawn = []                # the texts of the screen lines
+        self._done = False
+
+    def run(self):
+        curses.wrapper(self._main)
+
+    def _log_path(self, name: str) -> str:
+        return os.path.join(self.log_dir, name + '.log')
+
+    # Updates:
+    def _update_rows(self):
+        now = time.time()
+        names = set()
+        for record in self.registry.records():
+            if not record.state or record.name.startswith('__'):
+                continue
+            if not self.show_all and not record.running:
+                continue
+            names.add(record.name)
+            row = self._rows.get(record.name)
+            if row is None:
+                row = self._rows[record.name] = _Row(record.name)
+            if row.pid != record.pid:
+                row.ticks = None
+            row.pid, row.state, row.start_time = record.pid, record.state_name, record.start_time
+        for name in list(self._rows):
+            if name not in names:
+                del self._rows[name]
+        self.rows = [self._rows[name] for name in sorted(self._rows)]
+        self.selected = min(self.selected, max(len(self.rows) - 1, 0))
+
+        for row in self.rows:
+            if active_ring(self.log_dir, row.name) is not None:
+                row.line = None         # a ring buffer is written in shared memory without inotify events
+            usage = tree_usage(row.pid) if row.state == 'running' and row.pid else None
+            if usage is None:
+                row.cpu = row.rss = row.ticks = None
+                continue
+            ticks, row.rss = usage
+            if row.ticks is not None and now > row.ticks_time:
+                row.cpu = max(ticks - row.ticks, 0) / _CLK_TCK / (now - row.ticks_time) * 100
+            row.ticks, row.ticks_time = ticks, now
+            if self._inotify is None:
+                # No inotify: check the size of the log instead:
+                try:
+                    size = os.path.getsize(self._log_path(row.name))
+                except OSError:
+                    size = -1
+                if size != row.log_size:
+                    row.log_size = size
+                    row.line = None
+
+    def _on_events(self, events: list):
+        refresh = False
+        for wd, mask, name in events:
+            if self._inotify.paths.get(wd) == self.log_dir:
+                row = self._rows.get(name[:-len('.log')]) if name.endswith('.log') else None
+                if row is not None:
+                    row.line = None
+            else:
+                refresh = refresh or name.endswith('.pid')
+        if refresh:
+            self._update_rows()
+
+    # Keys:
+    def _on_keys(self):
+        while True:
+            key = self._screen.getch()
+            if key == -1:
+                return
+            if self._confirm is not None:
+                if key in (ord('y'), ord('Y')) and self.on_stop is not None:
+                    self.status = self.on_stop(self._confirm) or ''
+                else:
+                    self.status = ''
+                self._confirm = None
+            elif key in (ord('q'), 27):
+                self._done = True
+                return
+            elif key in (curses.KEY_UP, ord('k')):
+                self.selected = max(self.selected - 1, 0)
+            elif key in (curses.KEY_DOWN, ord('j')):
+                self.selected = min(self.selected + 1, max(len(self.rows) - 1, 0))
+            elif key == ord('a'):
+                self.show_all = not self.show_all
+                self._update_rows()
+            elif key in (ord('t'), ord('\n'), curses.KEY_ENTER) and self.rows and self.on_tail is not None:
+                self._tail(self.rows[self.selected].name)
+            elif key == ord('s') and self.rows:
+                self._confirm = self.rows[self.selected].name
+                self.status = f"Stop '{self._confirm}'? (y/n)"
+            elif key == curses.KEY_RESIZE:
+                self._invalidate()
+
+    def _tail(self, name: str):
+        curses.def_prog_mode()
+        curses.endwin()
+        # SIGINT is not ignored here, the tail would inherit it; Ctrl+C stops the tail and returns to the dashboard:
+        try:
+            self.on_tail(name)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            curses.reset_prog_mode()
+            self._invalidate()
+
+    # Drawing:
+    def _invalidate(self):
+        self._screen.clear()
+        self._drawn = []
+
+    def _put(self, y: int, text: str, attr=0):
+        # Writes a screen line if it differs from the drawn one:
+        height, width = self._screen.getmaxyx()
+        if y >= height:
+            return
+        text = text[:width - 1]
+        key = (text, attr)
+        while len(self._drawn) <= y:
+            self._drawn.append(None)
+        if self._drawn[y] == key:
+            return
+        self._drawn[y] = key
+        self._screen.move(y, 0)
+        self._screen.clrtoeol()
+        self._screen.addstr(y, 0, text, attr)
+
+    def _draw(self):
+        now = time.time()
+        height, _ = self._screen.getmaxyx()
+        running = sum(row.state == 'running' for row in self.rows)
+        self._put(0, f'suproc watch: {running} running, {len(self.rows)} shown, every {self.interval:g}s'
+                     f'{" (all)" if self.show_all else ""}', curses.A_BOLD)
+        self._put(1, f'{"Name":<24} {"PID":>8} {"State":<8} {"Uptime":>12} {"CPU%":>6} {"RSS":>8}  Last log line',
+                  curses.A_UNDERLINE)
+        for i, row in enumerate(self.rows):
+            if row.line is None:
+                ring = active_ring(self.log_dir, row.name)
+                row.line = last_line(ring, ring=True) if ring else last_line(self._log_path(row.name))
+            self._put(HEADER_ROWS + i, row.render(now), curses.A_REVERSE if i == self.selected else 0)
+        for y in range(HEADER_ROWS + len(self.rows), height - 1):
+            self._put(y, '')
+        self._put(height - 1, self.status or _KEYS_HELP, curses.A_DIM)
+        self._screen.refresh()
+
+    def _main(self, screen):
+        self._screen = screen
+        try:
+            curses.curs_set(0)
+        except curses.error:
+            pass
+        screen.nodelay(True)
+        screen.keypad(True)
+
+        selector = selectors.DefaultSelector()
+        selector.register(sys.stdin, selectors.EVENT_READ)
+        self._inotify = Inotify.create()
+        if self._inotify is not None:
+            try:
+                self._inotify.add_watch(self.pid_dir, _PID_EVENTS)
+                self._inotify.add_watch(self.log_dir, _LOG_EVENTS)
+                selector.register(self._inotify, selectors.EVENT_READ)
+            except OSError:
+                self._inotify.close()
+                self._inotify = None
+        try:
+            self._update_rows()
+            next_update = time.monotonic() + self.interval
+            while not self._done:
+                self._draw()
+                for key, _ in selector.select(max(next_update - time.monotonic(), 0)):
+                    if key.fileobj is self._inotify:
+                        self._on_events(self._inotify.read())
+                    else:
+                        self._on_keys()
+                if time.monotonic() >= next_update:
+                    self._update_rows()
+                    next_update = time.monotonic() + self.interval
+        except KeyboardInterrupt:
+            pass
+        finally:
+            selector.close()
+            if self._inotify is not None:
+                self._inotify.close()
@@ -0,0 +1,110 @@
+"""
+AVA Single Unique Process
+© AVA, 2025
+"""
+import pytest
+
+from suproc.utils import ratelimit
+from suproc.utils.ratelimit import OutputLimiter, parse_rate_limit
+
+
+class _Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(ratelimit.time, 'monotonic', clock)
+    return clock
+
+
+def _limiter(**kwargs):
+    reports = []
+    limiter = OutputLimiter(report=lambda *counts: reports.append(counts), **kwargs)
+    return limiter, reports
+
+
+def test_parse_rate_limit():
+    assert parse_rate_limit('lines=1000,bytes=1M') == {'lines': 1000, 'bytes': 1024 ** 2}
+    assert parse_rate_limit('bytes=512k, burst=5, sample=10') == {'bytes': 512 * 1024, 'burst': 5, 'sample': 10}
+    for value in ('lines', 'lines=0', 'rate=5', 'burst=5'):
+        with pytest.raises(ValueError):
+            parse_rate_limit(value)
+
+
+def test_create():
+    assert OutputLimiter.create() is None
+    assert OutputLimiter.create(dedupe=True).dedupe
+
+
+def test_lines_rate(clock):
+    limiter, reports = _limiter(lines_rate=3, mark_interval=5)
+    out = limiter.filter([b'1', b'2', b'3', b'4', b'5'])
+    assert out == [b'1', b'2', b'3', b'[suproc] 2 lines (2 bytes) suppressed by the rate limit']
+    assert reports == [(2, 2, 0)]
+
+    # The next marker of the flood waits for the interval, the bucket refills with time:
+    clock.now += 1
+    assert limiter.filter([b'6', b'7', b'8', b'9']) == [b'6', b'7', b'8']
+    clock.now += 5
+    assert limiter.filter([b'10']) == [b'10', b'[suproc] 1 lines (1 bytes) suppressed by the rate limit']
+    assert limiter.flush() == []
+    assert (limiter.suppressed_lines, limiter.suppressed_bytes) == (3, 3)
+    assert reports == [(2, 2, 0), (1, 1, 0)]
+
+
+def test_bytes_rate_and_flush(clock):
+    limiter, reports = _limiter(bytes_rate=10)
+    assert limiter.filter([b'12345', b'67890', b'x']) == [b'12345', b'67890',
+                                                           b'[suproc] 1 lines (1 bytes) suppressed by the rate limit']
+    assert limiter.filter([b'abc']) == []
+    assert limiter.flush() == [b'[suproc] 1 lines (3 bytes) suppressed by the rate limit']
+    assert reports == [(1, 1, 0), (1, 3, 0)]
+
+
+def test_sample(clock):
+    # One of 'sample' lines over the limit is kept:
+    limiter, _ = _limiter(lines_rate=1, sample=3)
+    out = limiter.filter([b'%d' % i for i in range(8)])
+    assert out[:3] == [b'0', b'3', b'6']
+    assert limiter.suppressed_lines == 5
+
+
+def test_dedupe_single_repeats(clock):
+    # A single repeat is kept, a marker would be longer than the line:
+    limiter, reports = _limiter(dedupe=True)
+    assert limiter.filter([b'a', b'a', b'b', b'a', b'a', b'c']) == [b'a', b'a', b'b', b'a', b'a', b'c']
+    assert limiter.flush() == []
+    assert reports == [] and limiter.repeated_lines == 0
+
+
+def test_dedupe_reports(clock):
+    # Runs of 2+ repeats become markers, their counts are reported together at the marker interval:
+    limiter, reports = _limiter(dedupe=True, mark_interval=5)
+    assert limiter.filter([b'x', b'x', b'x']) == [b'x', b'[suproc] last line repeated 2 times']
+    assert reports == [(0, 0, 2)]
+    assert limiter.filter([b'y', b'y', b'y', b'z']) == [b'y', b'[suproc] last line repeated 2 times', b'z']
+    assert limiter.filter([b'z', b'z']) == []
+    assert reports == [(0, 0, 2)]
+    clock.now += 5
+    assert limiter.filter([b'w']) == [b'[suproc] last line repeated 2 times', b'w']
+    assert reports == [(0, 0, 2), (0, 0, 4)]
+    assert limiter.flush() == []
+    assert limiter.repeated_lines == 6
+
+
+def test_dedupe_flush(clock):
+    # The repeats pending at the end are marked and reported on flush:
+    limiter, reports = _limiter(dedupe=True, mark_interval=5)
+    assert limiter.filter([b'x', b'x']) == [b'x']
+    assert limiter.filter([b'x', b'x']) == [b'[suproc] last line repeated 3 times']
+    assert limiter.filter([b'x', b'x', b'x']) == []
+    assert reports == [(0, 0, 3)]
+    assert limiter.flush() == [b'[suproc] last line repeated 3 times']
+    assert reports == [(0, 0, 3), (0, 0, 3)]
+    assert limiter.flush() == []
@@ -0,0 +1,110 @@
+"""
+AVA Single Unique Process
+© AVA, 2025
+"""
+import os
+import time
+
+from suproc.utils.registry import StatusRegistry, REGISTRY_FILE, SEQ, NAME_SIZE, STATE_RUNNING, STATE_EXITED, \
+    STATE_STOPPED, STATE_NONE
+
+
+def test_life_cycle(tmp_path):
+    with StatusRegistry(str(tmp_path)) as registry:
+        assert registry.available and registry.created
+        assert registry.get('job') is None
+        registry.started('job', 100, daemon=True)
+        record = registry.get('job')
+        assert (record.pid, record.daemon, record.state, record.launches) == (100, True, STATE_RUNNING, 1)
+
+        registry.suppressed('job', 100, 5)
+        registry.exited('job', 999, 1)                  # another run
+        assert registry.get('job').state == STATE_RUNNING
+        registry.exited('job', 100, 3)
+        record = registry.get('job')
+        assert (record.state, record.returncode, record.suppressed) == (STATE_EXITED, 3, 5)
+
+        registry.started('job', 101, daemon=False)
+        registry.stopped('job', 101)
+        record = registry.get('job')
+        assert (record.state, record.launches, record.suppressed) == (STATE_STOPPED, 2, 0)
+
+        registry.remove('job')
+        assert registry.get('job').state == STATE_NONE
+
+
+def test_no_records_for_runs_that_never_started(tmp_path):
+    with StatusRegistry(str(tmp_path)) as registry:
+        assert registry.exited('never', 1, -9) is None
+        assert registry.stopped('never', 1) is None
+        assert registry.suppressed('never', 1, 10) is None
+        assert registry.get('never') is None
+        assert registry.records() == []
+
+
+def test_many_names(tmp_path):
+    # Names that hash to taken slots are probed to the next ones:
+    with StatusRegistry(str(tmp_path)) as registry:
+        for i in range(300):
+            registry.started(f'job{i}', i + 1, daemon=False)
+        assert registry.update('', lambda record: None) is None
+        assert registry.update('x' * (NAME_SIZE + 1), lambda record: None) is None
+    with StatusRegistry(str(tmp_path)) as registry:
+        assert not registry.created
+        assert all(registry.get(f'job{i}').pid == i + 1 for i in range(300))
+        assert len(registry.records()) == 300
+
+
+def test_unavailable(tmp_path):
+    registry = StatusRegistry(str(tmp_path / 'missing'))
+    assert not registry.available
+    assert registry.started('job', 1, daemon=False) is None
+    assert registry.get('job') is None and registry.records() == []
+
+
+def test_odd_sequence_is_not_read(tmp_path):
+    # A record being written (odd sequence) is not returned half written:
+    with StatusRegistry(str(tmp_path)) as registry:
+        registry.started('job', 1, daemon=False)
+        slot, found = registry._find(b'job')
+        offset = registry._offset(slot)
+        seq = SEQ.unpack_from(registry._mm, offset)[0]
+        assert found and seq % 2 == 0
+        SEQ.pack_into(registry._mm, offset, seq + 1)
+        assert registry.get('job') is None
+        SEQ.pack_into(registry._mm, offset, seq + 2)
+        assert registry.get('job').pid == 1
+
+
+def test_concurrent_readers_see_whole_records(tmp_path):
+    # A writer process keeps pid == launches in every record it writes; a reader never sees them differ:
+    pid_dir = str(tmp_path)
+    with StatusRegistry(pid_dir) as registry:
+        registry.started('job', 1, daemon=False)
+
+    child = os.fork()
+    if child == 0:
+        code = 1
+        try:
+            with StatusRegistry(pid_dir) as writer:
+                until = time.monotonic() + 0.5
+                while time.monotonic() < until:
+                    writer.started('job', writer.get('job').launches + 1, daemon=False)
+            code = 0
+        finally:
+            os._exit(code)
+
+    reads = 0
+    with StatusRegistry(pid_dir) as reader:
+        while True:
+            pid, status = os.waitpid(child, os.WNOHANG)
+            if pid:
+                break
+            record = reader.get('job')
+            if record is not None:
+                assert record.pid == record.launches
+                reads += 1
+        record = reader.get('job')
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert reads > 0 and record.launches > 1
+    assert os.path.exists(os.path.join(pid_dir, REGISTRY_FILE))
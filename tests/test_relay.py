@@ -0,0 +1,109 @@
+"""
+AVA Single Unique Process
+© AVA, 2025
+"""
+import io
+import logging
+
+from suproc.utils.logger import Logger
+from suproc.utils.relay import LineSplitter, LogSink
+
+GREY, RESET = Logger.AvaFormatter.COLORS[logging.DEBUG], Logger.AvaFormatter.COLORS['RESET']
+
+
+def _feed(splitter: LineSplitter, chunks: list) -> list:
+    lines = []
+    for chunk in chunks:
+        lines.extend(splitter.feed(chunk))
+    return lines + splitter.flush()
+
+
+def test_splitter_chunks():
+    splitter = LineSplitter()
+    assert splitter.feed(b'one\ntw') == [b'one']
+    assert splitter.feed(b'o\nthr') == [b'two']
+    assert splitter.feed(b'ee') == []
+    assert splitter.feed(b'\n\n') == [b'three', b'']
+    assert splitter.flush() == []
+
+
+def test_splitter_any_chunking():
+    data = b'alpha\nbeta\n\ngamma delta\nlast'
+    expected = [b'alpha', b'beta', b'', b'gamma delta', b'last']
+    for size in range(1, len(data) + 1):
+        chunks = [data[i:i + size] for i in range(0, len(data), size)]
+        assert _feed(LineSplitter(), chunks) == expected
+
+
+def test_splitter_carriage_returns():
+    # Progress updates are collapsed to the last one, also across chunks and at the end of a line:
+    assert _feed(LineSplitter(), [b'10%\r50%\r100%\ndone\r\n']) == [b'100%', b'done']
+    assert _feed(LineSplitter(), [b'10%\r5', b'0%\r', b'100%\n']) == [b'100%']
+    assert _feed(LineSplitter(), [b'a\rb']) == [b'b']
+
+
+def test_splitter_max_line():
+    # An unfinished line is not carried over beyond 'max_line':
+    splitter = LineSplitter(max_line=8)
+    assert splitter.feed(b'1234') == []
+    assert splitter.feed(b'56789') == [b'123456789']
+    assert splitter.feed(b'ab\n') == [b'ab']
+    assert _feed(LineSplitter(max_line=4), [b'12', b'34', b'56\n']) == [b'1234', b'56']
+
+
+class _LinesHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.blocks = []
+
+    def emit_lines(self, lines, t):
+        self.blocks.append((list(lines), t))
+
+
+class _RecordsHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def _logger(name: str, *handlers):
+    logger = logging.getLogger(f'test.relay.{name}')
+    logger.handlers = []
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    for handler in handlers:
+        logger.addHandler(handler)
+    return logger
+
+
+def test_sink_handlers():
+    stream = io.StringIO()
+    bulk = logging.StreamHandler(stream)
+    bulk.setFormatter(Logger.AvaFormatter())
+    lines, records = _LinesHandler(), _RecordsHandler()
+    sink = LogSink(_logger('handlers', bulk, lines, records))
+
+    sink.write([b'first', 'second é'.encode(), b'\xff'])
+    sink.write([])
+    assert stream.getvalue() == f'{GREY}first{RESET}\n{GREY}second é{RESET}\n{GREY}�{RESET}\n'
+    assert lines.blocks == [([b'first', 'second é'.encode(), b'\xff'], None)]
+    assert records.messages == ['first', 'second é', '�']
+    assert sink.file_stream is None
+
+
+def test_sink_levels():
+    # Handlers above DEBUG do not get the output:
+    stream = io.StringIO()
+    bulk = logging.StreamHandler(stream)
+    bulk.setFormatter(Logger.AvaFormatter())
+    bulk.setLevel(logging.INFO)
+    records = _RecordsHandler()
+    logger = _logger('levels', bulk, records)
+    LogSink(logger).write([b'line'])
+    assert stream.getvalue() == '' and records.messages == ['line']
+    logger.setLevel(logging.INFO)
+    LogSink(logger).write([b'line'])
+    assert records.messages == ['line']
@@ -0,0 +1,209 @@
+"""
+AVA Single Unique Process
+© AVA, 2025
+"""
+import os
+from datetime import datetime
+
+import pytest
+
+from suproc.utils import retention
+from suproc.utils.retention import LogInfo, parse_size, format_size, scan_logs, session_offsets, plan_retention, \
+    trim_head, delete_log
+from suproc.utils.timeindex import TimeIndex, FLAG_SESSION
+
+DAY = 86400.0
+T0 = datetime(2025, 6, 1).timestamp()
+
+
+def _session(i: int, lines: int = 3) -> bytes:
+    t = datetime.fromtimestamp(T0 + i * DAY).isoformat(timespec='seconds')
+    header = f'=== PID:{100 + i}, commands:1, time:{t} ===\n'.encode()
+    return header + b''.join(b'session %d line %d\n' % (i, j) for j in range(lines))
+
+
+def _write_log(log_dir, name: str, sessions: int, lines: int = 3) -> str:
+    path = os.path.join(str(log_dir), name + '.log')
+    with open(path, 'wb') as f:
+        for i in range(sessions):
+            f.write(_session(i, lines))
+    return path
+
+
+def _info(path: str, mtime: float = None) -> LogInfo:
+    st = os.stat(path)
+    return LogInfo(os.path.basename(path)[:-4], path, st.st_size, st.st_mtime if mtime is None else mtime)
+
+
+def test_sizes():
+    assert parse_size('500000') == 500000
+    assert parse_size('512K') == 512 * 1024
+    assert parse_size('1.5mb') == int(1.5 * 1024 ** 2)
+    for value in ('', 'ten', '-1'):
+        with pytest.raises(ValueError):
+            parse_size(value)
+    assert format_size(512) == '512B'
+    assert format_size(1536) == '1.5K'
+    assert format_size(3 * 1024 ** 4) == '3.0T'
+
+
+def test_sessions_from_headers_and_index(tmp_path):
+    path = _write_log(tmp_path, 'job', 3)
+    offsets = [offset for offset, _ in session_offsets(path)]
+    assert offsets == [0, len(_session(0)), len(_session(0)) + len(_session(1))]
+    assert [t for _, t in session_offsets(path)] == [T0, T0 + DAY, T0 + 2 * DAY]
+
+    # The session records of the index are used when they cover the whole log:
+    index = TimeIndex(TimeIndex.path_for(path))
+    for i, offset in enumerate(offsets):
+        index.append(T0 + i, offset, FLAG_SESSION)
+    assert session_offsets(path) == [(offsets[0], T0), (offsets[1], T0 + 1), (offsets[2], T0 + 2)]
+
+    (info,) = scan_logs(str(tmp_path))
+    assert (info.name, info.size, info.index_size) == ('job', os.path.getsize(path), 3 * 24)
+
+
+def test_plan_max_sessions(tmp_path):
+    info = _info(_write_log(tmp_path, 'job', 5))
+    ((planned, removed, cut),) = plan_retention([info], max_sessions=2)
+    assert planned is info and removed == 3 and cut == info.sessions[3][0]
+    assert plan_retention([info], max_sessions=5) == []
+    # The last session is always kept:
+    assert plan_retention([info], max_sessions=0)[0][1] == 4
+
+
+def test_plan_max_age(tmp_path):
+    info = _info(_write_log(tmp_path, 'job', 4), mtime=T0 + 4 * DAY)
+    # The sessions that ended (the next one started) before the time are removed:
+    assert plan_retention([info], max_age=T0 + 2 * DAY)[0][1] == 2
+
+    old = _info(_write_log(tmp_path, 'old', 2), mtime=T0)
+    assert plan_retention([old], max_age=T0 + DAY, running=lambda name: False) == [(old, 2, None)]
+    # A log of a running process is never deleted:
+    assert plan_retention([old], max_age=T0 + DAY, running=lambda name: True)[0][2] == old.sessions[1][0]
+
+
+def test_plan_max_bytes(tmp_path):
+    a = _info(_write_log(tmp_path, 'a', 3), mtime=T0 + 10 * DAY)
+    b = _info(_write_log(tmp_path, 'b', 3), mtime=T0 + 10 * DAY)
+    session = len(_session(0))
+    # The oldest sessions of all logs go first:
+    plan = plan_retention([a, b], max_bytes=a.size + b.size - session)
+    assert [(info.name, removed) for info, removed, _ in plan] == [('a', 1)]
+    plan = plan_retention([a, b], max_bytes=a.size + b.size - 3 * session)
+    assert sorted((info.name, removed) for info, removed, _ in plan) == [('a', 2), ('b', 1)]
+
+    # Only the last sessions are left: the logs of stopped processes are deleted, the oldest first:
+    b.mtime = T0
+    plan = plan_retention([a, b], max_bytes=session, running=lambda name: False)
+    assert sorted((info.name, removed, cut) for info, removed, cut in plan) == [('a', 2, 2 * session), ('b', 3, None)]
+    plan = plan_retention([a, b], max_bytes=session)
+    assert all(cut is not None for _, _, cut in plan)
+
+
+def _index(path: str, offsets: list) -> TimeIndex:
+    index = TimeIndex(TimeIndex.path_for(path))
+    for i, offset in enumerate(offsets):
+        index.append(T0 + i, offset, FLAG_SESSION)
+    return index
+
+
+def test_trim_copy_down(tmp_path, monkeypatch):
+    monkeypatch.setattr(retention, '_collapse_range', lambda fd, length: False)
+    path = _write_log(tmp_path, 'job', 3)
+    with open(path, 'rb') as f:
+        data = f.read()
+    info = _info(path)
+    offsets = [offset for offset, _ in info.sessions]
+    index = _index(path, offsets)
+
+    assert trim_head(path, offsets[1]) == offsets[1]
+    with open(path, 'rb') as f:
+        assert f.read() == data[offsets[1]:]
+    assert list(index.records()) == [(T0 + 1, 0, FLAG_SESSION), (T0 + 2, offsets[2] - offsets[1], FLAG_SESSION)]
+
+
+def test_trim_live_log_without_collapse(tmp_path, monkeypatch):
+    # The rest of a log a process is appending to is not copied down, appended data would be lost:
+    monkeypatch.setattr(retention, '_collapse_range', lambda fd, length: False)
+    path = _write_log(tmp_path, 'job', 3)
+    with open(path, 'rb') as f:
+        data = f.read()
+    cut = _info(path).sessions[1][0]
+    index = _index(path, [0, cut])
+    assert trim_head(path, cut, live=True) == 0
+    with open(path, 'rb') as f:
+        assert f.read() == data
+    assert len(list(index.records())) == 2
+
+
+def test_trim_collapse(tmp_path, monkeypatch):
+    # A collapse of whole blocks, the rest of the head is blanked out as one line:
+    def _collapse(fd, length):
+        os.lseek(fd, 0, os.SEEK_SET)
+        data = os.read(fd, os.fstat(fd).st_size)
+        os.ftruncate(fd, 0)
+        os.pwrite(fd, data[length:], 0)
+        return True
+
+    monkeypatch.setattr(retention, '_collapse_range', _collapse)
+    blksize = os.stat(str(tmp_path)).st_blksize
+    path = _write_log(tmp_path, 'job', 3, lines=blksize // 10)
+    with open(path, 'rb') as f:
+        data = f.read()
+    offsets = [offset for offset, _ in _info(path).sessions]
+    index = _index(path, offsets)
+    cut = offsets[1]
+    assert cut > blksize and cut % blksize
+
+    shift = trim_head(path, cut, live=True)
+    assert shift == cut - cut % blksize
+    with open(path, 'rb') as f:
+        trimmed = f.read()
+    rest = cut - shift
+    assert trimmed == b' ' * (rest - 1) + b'\n' + data[cut:]
+    assert [offset for offset, _ in _info(path).sessions] == [rest, offsets[2] - shift]
+    assert [offset for _, offset, _ in index.records()] == [cut - shift, offsets[2] - shift]
+
+
+def test_trim_collapse_file_system(tmp_path):
+    # The real collapse, where the file system supports it:
+    probe = str(tmp_path / 'probe')
+    blksize = os.stat(str(tmp_path)).st_blksize
+    with open(probe, 'wb') as f:
+        f.write(b'x' * 2 * blksize)
+    fd = os.open(probe, os.O_RDWR)
+    try:
+        if not retention._collapse_range(fd, blksize):
+            pytest.skip('The file system cannot collapse ranges')
+    finally:
+        os.close(fd)
+
+    path = _write_log(tmp_path, 'job', 2, lines=blksize // 10)
+    with open(path, 'rb') as f:
+        data = f.read()
+    cut = _info(path).sessions[1][0]
+    shift = trim_head(path, cut, live=True)
+    assert shift == cut - cut % blksize
+    with open(path, 'rb') as f:
+        assert f.read() == b' ' * (cut - shift - 1) + b'\n' + data[cut:]
+
+
+def test_delete_log(tmp_path):
+    path = _write_log(tmp_path, 'job', 1)
+    _index(path, [0])
+    delete_log(path)
+    delete_log(path)
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_rebase_in_place_with_an_open_writer(tmp_path):
+    # The records a writer appends after a rebase follow the kept ones, also if it has the index open:
+    index = TimeIndex(str(tmp_path / 'job.log.idx'))
+    for i in range(5):
+        index.append(T0 + i, i * 100)
+    with open(index.path, 'ab') as writer:
+        index.rebase(200)
+        index.append(T0 + 9, 900)
+        assert os.fstat(writer.fileno()).st_ino == os.stat(index.path).st_ino
+    assert list(index.records()) == [(T0 + 2, 0, 0), (T0 + 3, 100, 0), (T0 + 4, 200, 0), (T0 + 9, 900, 0)]
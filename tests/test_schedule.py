@@ -0,0 +1,221 @@
+"""
+AVA Single Unique Process
+© AVA, 2025
+"""
+import time
+from datetime import datetime
+
+import pytest
+
+import suproc.suproc as sp
+from suproc.utils.schedule import CronExpr, Schedule, parse_interval, save_schedule, schedule_path, \
+    MAX_DST_SHIFT, OVERLAP_QUEUE, OVERLAP_SKIP, CATCH_UP_ALL, CATCH_UP_SKIP
+
+FALL_BACK = 1762065000          # 2025-11-02 01:30 EST, the second 01:30 in New York
+
+
+@pytest.fixture
+def new_york(monkeypatch):
+    monkeypatch.setenv('TZ', 'America/New_York')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def _local(*fields) -> float:
+    return time.mktime(fields + (0,) * (6 - len(fields)) + (0, 0, -1))
+
+
+def _wall(t: float) -> str:
+    return time.strftime('%Y-%m-%d %H:%M %Z', time.localtime(t))
+
+
+def _times(expr: str, t: float, count: int) -> list:
+    cron = CronExpr(expr)
+    times = []
+    for _ in range(count):
+        t = cron.next_after(t)
+        times.append(t)
+    return times
+
+
+def test_parse_interval():
+    assert parse_interval('90') == 90
+    assert parse_interval('5m') == 300
+    assert parse_interval('1.5h') == 5400
+    with pytest.raises(ValueError):
+        parse_interval('5 minutes')
+
+
+@pytest.mark.parametrize('expr', ['* * * *', '60 * * * *', '* 24 * * *', '* * 0 * *', '* * * 13 *', '*/0 * * * *',
+                                  '5-1 * * * *', '* * * foo *', '0 0 30 2 *'])
+def test_cron_invalid(expr):
+    with pytest.raises(ValueError):
+        CronExpr(expr)
+
+
+def test_cron_fields():
+    cron = CronExpr('*/15 9-17/4 1,15 jan-mar mon-fri')
+    assert cron.minutes == {0, 15, 30, 45}
+    assert cron.hours == {9, 13, 17}
+    assert cron.days == {1, 15}
+    assert cron.months == {1, 2, 3}
+    assert cron.weekdays == {1, 2, 3, 4, 5}
+    assert CronExpr('0 0 * * 7').weekdays == {0}
+    assert CronExpr('@hourly').minutes == {0}
+
+
+def test_cron_next_after(new_york):
+    t = _local(2025, 6, 10, 12, 7, 30)
+    assert [_wall(ts) for ts in _times('*/5 * * * *', t, 2)] == ['2025-06-10 12:10 EDT', '2025-06-10 12:15 EDT']
+    assert _wall(CronExpr('0 9 * * *').next_after(t)) == '2025-06-11 09:00 EDT'
+    assert _wall(CronExpr('0 0 1 * *').next_after(t)) == '2025-07-01 00:00 EDT'
+    assert CronExpr('0 12 * * *').next_after(_local(2025, 6, 10, 12)) == _local(2025, 6, 11, 12)
+
+
+def test_cron_day_or_weekday(new_york):
+    # Both days restricted: the 13th or a Friday:
+    t = _local(2025, 6, 1)
+    assert [_wall(ts) for ts in _times('0 0 13 * fri', t, 4)] == [
+        '2025-06-06 00:00 EDT', '2025-06-13 00:00 EDT', '2025-06-20 00:00 EDT', '2025-06-27 00:00 EDT']
+    # One of them restricted: both must match:
+    assert _wall(CronExpr('0 0 13 * *').next_after(t)) == '2025-06-13 00:00 EDT'
+    assert _wall(CronExpr('0 0 * * fri').next_after(t)) == '2025-06-06 00:00 EDT'
+    assert _wall(CronExpr('0 0 13 * fri').next_after(_local(2025, 6, 28))) == '2025-07-04 00:00 EDT'
+
+
+def test_cron_fall_back(new_york):
+    assert _wall(FALL_BACK) == '2025-11-02 01:30 EST'
+    assert CronExpr('*/5 * * * *').next_after(FALL_BACK) == FALL_BACK + 300
+    assert CronExpr('0 * * * *').next_after(FALL_BACK) == FALL_BACK + 1800
+    # The repeated hour runs twice, a restricted hour once:
+    assert [_wall(ts) for ts in _times('30 * * * *', _local(2025, 11, 2), 4)] == [
+        '2025-11-02 00:30 EDT', '2025-11-02 01:30 EDT', '2025-11-02 01:30 EST', '2025-11-02 02:30 EST']
+    assert [_wall(ts) for ts in _times('30 1 * * *', _local(2025, 11, 1, 12), 2)] == [
+        '2025-11-02 01:30 EDT', '2025-11-03 01:30 EST']
+    # Every time is after the previous one:
+    times = _times('* * * * *', _local(2025, 11, 2, 0, 30), 180)
+    assert all(b - a == 60 for a, b in zip(times, times[1:]))
+
+
+def test_cron_spring_forward(new_york):
+    assert [_wall(ts) for ts in _times('*/30 * * * *', _local(2026, 3, 8, 1), 3)] == [
+        '2026-03-08 01:30 EST', '2026-03-08 03:00 EDT', '2026-03-08 03:30 EDT']
+    assert [_wall(ts) for ts in _times('30 2 * * *', _local(2026, 3, 7, 12), 2)] == [
+        '2026-03-08 03:30 EDT', '2026-03-09 02:30 EDT']
+
+
+@pytest.mark.parametrize('expr', ['* * * * *', '*/7 * * * *', '30 1 * * *', '0 2 * * *', '15 */2 * * *'])
+def test_cron_fast_path(new_york, expr):
+    # The next time without the search window around a turn of the clock is the same:
+    cron = CronExpr(expr)
+    for base in (FALL_BACK, _local(2026, 3, 8, 2, 30), _local(2025, 6, 10)):
+        for t in range(int(base) - 4 * 3600, int(base) + 4 * 3600, 7 * 60 + 13):
+            start = datetime.fromtimestamp(t).replace(second=0, microsecond=0)
+            assert cron.next_after(t) == cron._search(start - MAX_DST_SHIFT, t, window=True)
+
+
+def test_schedule_every():
+    schedule = Schedule(every=60)
+    assert schedule.next_after(119.5) == 120
+    assert schedule.next_after(120) == 180
+    assert schedule.count(100, 400, 10) == 5
+    assert schedule.count(100, 400, 3) == 3
+    with pytest.raises(ValueError):
+        Schedule(every=60, cron='* * * * *')
+    with pytest.raises(ValueError):
+        Schedule()
+
+
+def test_schedule_count_cron(new_york):
+    schedule = Schedule(cron='0 * * * *')
+    start = _local(2025, 11, 2)
+    assert schedule.count(start, start + 4 * 3600, 100) == 4       # 01:00 twice, 02:00 and 03:00 (EST)
+
+
+class _Clock:
+    """
+    The time of the scheduler loop: sleep() moves it on, and the loop stops at 'end'.
+    """
+    def __init__(self, now: float, end: float):
+        self.now = now
+        self.end = end
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+        if self.now > self.end:
+            raise KeyboardInterrupt
+
+
+def _run_scheduler(tmp_path, monkeypatch, clock, runs=None, max_runs=200, **spec):
+    runs = [] if runs is None else runs
+
+    def _fork_run(name, spec, pid_dir, log_dir, overlap, coalesce=True):
+        runs.append((clock.now, overlap, coalesce))
+        if len(runs) > max_runs:
+            raise AssertionError('Too many runs')
+        return len(runs)
+
+    monkeypatch.setattr(sp, '_fork_run', _fork_run)
+    monkeypatch.setattr(sp.time, 'time', clock.time)
+    monkeypatch.setattr(sp.time, 'sleep', clock.sleep)
+    monkeypatch.setattr(sp.os, 'waitpid', lambda pid, options: (0, 0))
+    pid_dir = str(tmp_path)
+    path = schedule_path(pid_dir, 'job')
+    save_schedule(path, dict({'every': None, 'cron': None, 'cmds': ['true'], 'shell': False, 'overlap': OVERLAP_SKIP,
+                              'jitter': 0, 'catch_up': CATCH_UP_SKIP, 'timeout': None, 'deadline': None,
+                              'metrics_dir': None, 'last_run': None}, **spec))
+    returncode = sp.run_scheduler('job', pid_dir=pid_dir, log_dir=pid_dir)
+    with open(path) as f:
+        assert f.read()
+    return returncode, runs
+
+
+def test_scheduler_every(tmp_path, monkeypatch):
+    clock = _Clock(1000.5, 1000.5 + 300)
+    returncode, runs = _run_scheduler(tmp_path, monkeypatch, clock, every=60, last_run=1000.5)
+    assert returncode == 0
+    assert [t for t, _, _ in runs] == [1020, 1080, 1140, 1200, 1260]
+
+
+def test_scheduler_fall_back(tmp_path, monkeypatch, new_york):
+    clock = _Clock(FALL_BACK, FALL_BACK + 3600)
+    returncode, runs = _run_scheduler(tmp_path, monkeypatch, clock, cron='*/5 * * * *', catch_up=CATCH_UP_ALL,
+                                      last_run=FALL_BACK)
+    assert returncode == 0
+    assert [t for t, _, _ in runs] == [FALL_BACK + 300 * i for i in range(1, 13)]
+
+
+def test_scheduler_catch_up_all(tmp_path, monkeypatch):
+    # The first run holds the PID file (after a while) before the others are queued:
+    clock = _Clock(10000.0, 10000.0 + 1)
+    runs = []
+    monkeypatch.setattr(sp, '_pidfile_locked', lambda name, pid_dir: bool(runs) and clock.now >= 10000.2)
+    returncode, _ = _run_scheduler(tmp_path, monkeypatch, clock, runs=runs, every=600, catch_up=CATCH_UP_ALL,
+                                   last_run=7000)
+    assert returncode == 0
+    assert [(overlap, coalesce) for _, overlap, coalesce in runs] == \
+           [(OVERLAP_SKIP, False)] + [(OVERLAP_QUEUE, False)] * 4
+    assert runs[0][0] == 10000.0 and all(t >= 10000.2 for t, _, _ in runs[1:])
+    assert sp.load_schedule(schedule_path(str(tmp_path), 'job'))['last_run'] == 10000.0
+
+
+def test_scheduler_stops_on_a_past_time(tmp_path, monkeypatch):
+    clock = _Clock(1000.0, 1000.0 + 300)
+    monkeypatch.setattr(Schedule, 'next_after', lambda self, t: t)
+    returncode, runs = _run_scheduler(tmp_path, monkeypatch, clock, every=60, last_run=1000.0)
+    assert returncode == -4
+    assert runs == []
+
+
+def test_next_after_is_monotonic(new_york):
+    cron = CronExpr('*/7 */3 * * *')
+    t = datetime(2025, 10, 30).timestamp()
+    for _ in range(500):
+        next_t = cron.next_after(t)
+        assert next_t > t
+        t = next_t
@@ -0,0 +1,150 @@
+"""
+AVA Single Unique Process
+© AVA, 2025
+"""
+import os
+import socket
+import struct
+
+import pytest
+
+from suproc.utils.shipping import LogShipper, parse_ship, spill_path, STREAM, DATAGRAM, FORMAT_JSON, BATCH
+
+FRAME = struct.Struct('<I')
+
+
+def _spilled(path: str) -> list:
+    with open(path, 'rb') as f:
+        data = f.read()
+    records, offset = [], 0
+    while offset < len(data):
+        size = FRAME.unpack_from(data, offset)[0]
+        records.append(data[offset + FRAME.size:offset + FRAME.size + size])
+        offset += FRAME.size + size
+    return records
+
+
+def _write_spill(path: str, records: list, tail: bytes = b''):
+    with open(path, 'wb') as f:
+        for record in records:
+            f.write(FRAME.pack(len(record)) + record)
+        f.write(tail)
+
+
+def _records(n: int, prefix: bytes = b'r') -> list:
+    return [prefix + b'%d' % i for i in range(n)]
+
+
+def _receiver(path: str, kind=socket.SOCK_DGRAM) -> socket.socket:
+    sock = socket.socket(socket.AF_UNIX, kind)
+    sock.bind(path)
+    sock.settimeout(5)
+    if kind == socket.SOCK_STREAM:
+        sock.listen(1)
+    return sock
+
+
+def test_parse_ship():
+    config = parse_ship('unix:/run/vector.sock,format=json,batch=512,buffer=1M,facility=local0')
+    assert (config['kind'], config['path'], config['format']) == (STREAM, '/run/vector.sock', FORMAT_JSON)
+    assert (config['batch'], config['buffer'], config['facility']) == (512, 1024 ** 2, 16)
+    config = parse_ship('unixgram:/dev/log, ')
+    assert (config['kind'], config['batch']) == (DATAGRAM, BATCH)
+    for value in ('/dev/log', 'tcp:host', 'unix:', 'unix:/s,format=xml', 'unix:/s,batch=0', 'unix:/s,level=1',
+                  'unix:/s,flush=-1', 'unix:/s,facility=nope'):
+        with pytest.raises(ValueError):
+            parse_ship(value)
+    assert spill_path('/var/log/suproc', 'job') == '/var/log/suproc/job.spill'
+
+
+def test_spill_while_the_collector_is_down(tmp_path):
+    # The records over the memory buffer go to the spill file, all of them stay there in order at close():
+    spill = str(tmp_path / 'job.spill')
+    shipper = LogShipper(parse_ship(f'unixgram:{tmp_path}/none.sock,buffer=10'), spill)
+    shipper.put(_records(10))
+    assert shipper.backlog == 10 and shipper.dropped == 0
+    shipper.close(timeout=0)
+    assert shipper.shipped == 0 and shipper.error is not None
+    assert _spilled(spill) == _records(10)
+
+
+def test_drop_over_the_spill_size(tmp_path):
+    spill = str(tmp_path / 'job.spill')
+    shipper = LogShipper(parse_ship(f'unixgram:{tmp_path}/none.sock,buffer=4,spill=12'), spill)
+    shipper.put(_records(5))
+    assert (shipper.backlog, shipper.dropped) == (4, 1)
+    shipper.close(timeout=0)
+    assert _spilled(spill) == _records(4)
+
+
+def test_partial_frame_is_cut_off(tmp_path):
+    # A crash may leave a partial frame at the end of the spill file:
+    spill = str(tmp_path / 'job.spill')
+    _write_spill(spill, _records(2), tail=FRAME.pack(100) + b'partial')
+    shipper = LogShipper(parse_ship(f'unixgram:{tmp_path}/none.sock'), spill)
+    assert shipper.backlog == 2
+    assert os.path.getsize(spill) == 2 * (FRAME.size + 2)
+    shipper.close(timeout=0)
+    assert _spilled(spill) == _records(2)
+
+
+def test_resend_the_spill_first(tmp_path):
+    # The next session sends the records left in the spill file before its own ones and removes the file:
+    spill, path = str(tmp_path / 'job.spill'), str(tmp_path / 'c.sock')
+    _write_spill(spill, _records(5))
+    receiver = _receiver(path)
+    try:
+        shipper = LogShipper(parse_ship(f'unixgram:{path},batch=2'), spill)
+        shipper.put(_records(3, b'new'))
+        received = [receiver.recv(1024) for _ in range(8)]
+        shipper.close()
+    finally:
+        receiver.close()
+    assert received == _records(5) + _records(3, b'new')
+    assert (shipper.shipped, shipper.backlog, shipper.error) == (8, 0, None)
+    assert not os.path.exists(spill)
+
+
+def test_close_keeps_the_unsent_rest(tmp_path):
+    # The sent records of a partly sent spill file are removed from it at close():
+    spill = str(tmp_path / 'job.spill')
+    _write_spill(spill, _records(4))
+    shipper = LogShipper(parse_ship(f'unixgram:{tmp_path}/none.sock'), spill)
+    with shipper._cond:
+        shipper._done(_records(4), 3, spilled=True)
+    shipper.close(timeout=0)
+    assert _spilled(spill) == [b'r3']
+
+
+def test_stream_framing(tmp_path):
+    # Syslog records over a stream use octet counting, JSON records are newline terminated:
+    for fmt, expected in (('syslog', b'5 <14>a3 b c'), ('json', b'{"a": 1}\n{}\n')):
+        path = str(tmp_path / f'{fmt}.sock')
+        server = _receiver(path, socket.SOCK_STREAM)
+        records = [b'<14>a', b'b c'] if fmt == 'syslog' else [b'{"a": 1}', b'{}']
+        try:
+            shipper = LogShipper(parse_ship(f'unix:{path},format={fmt},flush=0'), str(tmp_path / f'{fmt}.spill'))
+            shipper.put(records)
+            conn, _ = server.accept()
+            conn.settimeout(5)
+            data = b''
+            while len(data) < len(expected):
+                data += conn.recv(1024)
+            shipper.close()
+            conn.close()
+        finally:
+            server.close()
+        assert data == expected
+
+
+def test_json_datagrams_are_packed(tmp_path):
+    path = str(tmp_path / 'c.sock')
+    receiver = _receiver(path)
+    try:
+        shipper = LogShipper(parse_ship(f'unixgram:{path},format=json'), str(tmp_path / 'job.spill'))
+        shipper.put([b'{"a": 1}', b'{"b": 2}'])
+        assert receiver.recv(1024) == b'{"a": 1}\n{"b": 2}'
+        shipper.close()
+    finally:
+        receiver.close()
+    assert shipper.shipped == 2
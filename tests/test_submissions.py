@@ -0,0 +1,103 @@
+"""
+AVA Single Unique Process
+© AVA, 2025
+"""
+import os
+import json
+import fcntl
+
+import suproc.suproc as sp
+from suproc.utils.submissions import SubmissionQueue
+
+
+def _submission(cmd: str) -> dict:
+    return {'cmds': [cmd], 'shell': True, 'timeout': None, 'deadline': None}
+
+
+def test_push_and_take(tmp_path):
+    queue = SubmissionQueue(str(tmp_path), 'job')
+    assert queue.push(_submission('a'), lambda: True) == (1, True)
+    assert queue.push(_submission('b'), lambda: True) == (2, True)
+    assert len(queue) == 2
+
+    first = queue.lock_empty()
+    assert first['cmds'] == ['a'] and first['id'] and first['time']
+    queue.remove(first['id'])
+    second = queue.lock_empty()
+    assert second['cmds'] == ['b']
+    queue.remove(second['id'])
+
+    # The empty queue stays locked and its file is removed on release:
+    assert queue.lock_empty() is None
+    queue.release()
+    assert len(queue) == 0 and not os.path.exists(queue.path)
+
+
+def test_push_not_held(tmp_path):
+    queue = SubmissionQueue(str(tmp_path), 'job')
+    assert queue.push(_submission('a'), lambda: False) == (0, False)
+    assert len(queue) == 0 and not os.path.exists(queue.path)
+
+
+def test_push_full_and_coalesce(tmp_path):
+    queue = SubmissionQueue(str(tmp_path), 'job')
+    assert queue.push(_submission('a'), lambda: True, max_depth=2) == (1, True)
+    assert queue.push(_submission('b'), lambda: True, max_depth=2) == (2, True)
+    assert queue.push(_submission('c'), lambda: True, max_depth=2) == (None, False)
+    # An equal pending submission is not queued again, also when the queue is full:
+    assert queue.push(_submission('b'), lambda: True, max_depth=2, coalesce=True) == (2, False)
+    assert queue.push(_submission('a'), lambda: True, max_depth=3) == (3, True)
+    assert len(queue) == 3
+
+
+def test_push_waits_for_the_holder(tmp_path):
+    # A submitter does not append while the holder keeps the empty queue locked:
+    holder = SubmissionQueue(str(tmp_path), 'job')
+    assert holder.lock_empty() is None
+    submitter = SubmissionQueue(str(tmp_path), 'job')
+    fd = os.open(holder.path, os.O_RDWR)
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            locked = False
+        except BlockingIOError:
+            locked = True
+    finally:
+        os.close(fd)
+    assert locked
+    holder.release()
+    assert submitter.push(_submission('a'), lambda: True) == (1, True)
+
+
+def test_partial_lines_are_skipped(tmp_path):
+    # A crashed submitter may leave a partial line:
+    queue = SubmissionQueue(str(tmp_path), 'job')
+    queue.push(_submission('a'), lambda: True)
+    with open(queue.path, 'ab') as f:
+        f.write(b'{"cmds": ["b"')
+    item = queue.lock_empty()
+    assert item['cmds'] == ['a']
+    queue.remove(item['id'])
+    assert queue.lock_empty() is None
+    queue.release()
+
+
+def _queue_file(path: str, items: list):
+    with open(path, 'w') as f:
+        for i, item in enumerate(items):
+            f.write(json.dumps(dict(item, id=f'id{i}', time=0.0)) + '\n')
+
+
+def test_holder_runs_the_queue(tmp_path):
+    # The holder runs the queued submissions after its session; one that cannot be launched does not stop the
+    # submissions after it and does not stay in the queue:
+    pid_dir, out = str(tmp_path), str(tmp_path / 'out')
+    queue = SubmissionQueue(pid_dir, 'job')
+    failing = dict(_submission('/nonexistent/command'), shell=False)
+    _queue_file(queue.path, [_submission('echo second >> ' + out), failing, _submission('echo third >> ' + out)])
+    returncode = sp.run_single_instance_proc('job', cmds=['echo own >> ' + out], shell=True, pid_dir=pid_dir,
+                                             log_dir=pid_dir)
+    assert returncode == 0
+    assert not os.path.exists(queue.path)
+    with open(out) as f:
+        assert f.read().split() == ['own', 'second', 'third']